@@ -0,0 +1,140 @@
+"""
+api_client.py
+
+Python client for the route optimization API (app.py / asgi_app.py), used by
+streamlit_app.py:
+ - one requests.Session with a keep-alive connection pool (pool_size),
+   retrying idempotent GETs on connection errors, 429 and 503
+ - warehouses() keeps the last /warehouses list with its ETag and revalidates
+   with If-None-Match, so an unchanged snapshot costs a 304 instead of the
+   full list
+ - optimize_with_warehouses() sends /optimize and the warehouse revalidation
+   concurrently
+
+   with RouteOptimClient("http://127.0.0.1:5000") as api:
+       result, warehouses = api.optimize_with_warehouses(order, top_k=10)
+
+Non-2xx answers raise ApiError with the status and the decoded error body.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_BASE_URL = "http://127.0.0.1:5000"
+
+class ApiError(Exception):
+    def __init__(self, status: int, payload):
+        self.status = status
+        self.payload = payload
+        message = payload.get("error") if isinstance(payload, dict) else None
+        super().__init__(f"HTTP {status}: {message or payload}")
+
+class RouteOptimClient:
+    def __init__(self,
+                 base_url: str = DEFAULT_BASE_URL,
+                 timeout: float = 10.0,
+                 pool_size: int = 8,
+                 retries: int = 2,
+                 session: Optional[requests.Session] = None):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=1, pool_maxsize=pool_size,
+                max_retries=Retry(total=retries, backoff_factor=0.1,
+                                  status_forcelist=(429, 503), allowed_methods={"GET"},
+                                  raise_on_status=False))
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        self.session = session
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="api-client")
+        self._lock = threading.Lock()
+        self._warehouses: Optional[List[Dict]] = None
+        self._warehouses_etag: Optional[str] = None
+        self.warehouse_hits = 0
+        self.warehouse_misses = 0
+
+    def _url(self, path: str) -> str:
+        return self.base_url + path
+
+    @staticmethod
+    def _decode(resp) -> object:
+        try:
+            return resp.json()
+        except ValueError:
+            return resp.text
+
+    def _check(self, resp):
+        if resp.status_code >= 400:
+            raise ApiError(resp.status_code, self._decode(resp))
+        return resp
+
+    def optimize(self, order: Dict, **options) -> Dict:
+        """
+        POST /optimize with the order fields plus options (top_k, best_only,
+        route_format, allow_split, ...).
+        """
+        resp = self.session.post(self._url("/optimize"), json=dict(order, **options),
+                                 timeout=self.timeout)
+        return self._check(resp).json()
+
+    def warehouses(self, refresh: bool = False) -> List[Dict]:
+        """
+        The /warehouses list, revalidated against the server's snapshot ETag
+        (refresh=True drops the cached copy first).
+        """
+        with self._lock:
+            etag = None if refresh else self._warehouses_etag
+            cached = self._warehouses
+        headers = {"If-None-Match": etag} if etag else {}
+        resp = self.session.get(self._url("/warehouses"), headers=headers, timeout=self.timeout)
+        if resp.status_code == 304 and cached is not None:
+            with self._lock:
+                self.warehouse_hits += 1
+            return cached
+        rows = self._check(resp).json()
+        with self._lock:
+            self.warehouse_misses += 1
+            self._warehouses = rows
+            self._warehouses_etag = resp.headers.get("ETag")
+        return rows
+
+    @property
+    def warehouses_etag(self) -> Optional[str]:
+        """
+        ETag of the cached warehouse list; changes whenever the list does.
+        """
+        return self._warehouses_etag
+
+    def optimize_with_warehouses(self, order: Dict, **options) -> Tuple[Dict, List[Dict]]:
+        """
+        optimize() and warehouses() in parallel over the pooled session.
+        """
+        warehouses = self._executor.submit(self.warehouses)
+        result = self.optimize(order, **options)
+        return result, warehouses.result()
+
+    def ready(self) -> bool:
+        resp = self.session.get(self._url("/ready"), timeout=self.timeout)
+        return resp.status_code == 200
+
+    def stats(self) -> Dict:
+        return {"warehouse_hits": self.warehouse_hits,
+                "warehouse_misses": self.warehouse_misses,
+                "warehouses_etag": self._warehouses_etag}
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+        self.session.close()
+
+    def __enter__(self) -> "RouteOptimClient":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -1,151 +1,239 @@
 """
 app.py
 
-Flask server:
- - DB init & random warehouses
- - Train 6D model (distance, time_window_start, time_window_end, traffic, inv, requested_qty)
- - /optimize => returns best route + all routes
- - /warehouses => returns warehouse info
+Flask server (asgi_app.py serves the same endpoints over ASGI). Importing this
+module has no side effects; create_app() runs the startup phases (startup.py):
+ - DB init & random warehouses (only if the table is empty; STARTUP_SEED / RESEED_WAREHOUSES)
+ - Load the 6D model artifact for COST_MODEL_BACKEND (distance, time_window_start, time_window_end, traffic, inv, requested_qty),
+   training and saving one first if none exists (STARTUP_MODEL=load never trains; see model_store.py)
+ - Warm the warehouse snapshot, spatial index and scoring path (STARTUP_WARM)
+`app` is created on first access (`from app import app`, gunicorn app:app).
+ - /optimize => returns best route + all routes ("reserve": true also decrements inventory atomically;
+   "best_only" / "top_k" / "route_format": "columnar" shrink the response, and
+   Accept: application/msgpack returns MessagePack when msgpack is installed)
+ - /optimize/batch => best route per order for many orders in one call
+ - /optimize/stream => NDJSON/CSV orders in, results streamed out chunk by chunk
+ - /vrp => multi-stop vehicle routes for a set of orders
+ - /warehouses => returns warehouse info (served from the in-memory snapshot;
+   ETag = snapshot version, If-None-Match => 304)
+ - /warehouses/cache => warehouse snapshot hit/miss/refresh counters
+ - /warehouses/bulk => CSV/JSON warehouse & inventory feed, upserted in one transaction
+ - /optimize/cache => /optimize result cache hit rate, entries and memory
+ - /reservations/stats => reservation attempt/conflict/retry counters
+ - /db/pool => connection pool checkout latency & saturation
+ - /model => manifest of the live model (artifact backend/version/latency + online revision)
+ - /feedback => observed delivery costs; updates the live model online (online_learning.py)
+ - /feedback/stats => online update throughput, staleness and error of the live model
+ - /ready => 200 once startup has finished, 503 (with the phase timings) before
+ - /metrics => Prometheus per-stage latency histograms + cache/pool/reservation gauges
+   (SERVER_TIMING=1 adds a Server-Timing header to /optimize and /warehouses)
 """
 
+import json
 import logging
-import random
-from flask import Flask, request, jsonify
-from pydantic import ValidationError
-
-from database import init_db, SessionLocal
-from models import Warehouse
-from training import train_regression_model
-from route_optimizer import Order, generate_candidate_routes, predict_cost
-from schemas import OptimizeRequest
+import threading
+from typing import Optional
+from flask import Blueprint, Flask, Response, current_app, request, jsonify, stream_with_context
+
+from database import pool_stats
+from distance import distance_service
+from inventory import reservation_stats
+from metrics import SERVER_TIMING, RequestTimer, render_prometheus
+from online_learning import model_slot, online_learner
+from result_cache import result_cache
+from warehouse_cache import warehouse_cache
+from service import (
+    MSGPACK_MEDIA_TYPE, encode_msgpack, etag_matches, feedback_request, optimize_request,
+    optimize_batch_request, vrp_request, wants_msgpack, warehouse_upsert_request
+)
+from startup import Readiness, StartupConfig, start
+from streaming import StreamJob, media_type, stream_optimize, stream_options
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
-MODEL = None
-
-def populate_random_warehouses(num_warehouses: int = 3) -> None:
-    session = SessionLocal()
-    try:
-        session.query(Warehouse).delete()
-        session.commit()
-
-        for i in range(num_warehouses):
-            lat = 48.137 + random.uniform(-0.1, 0.1)
-            lon = 11.576 + random.uniform(-0.1, 0.1)
-            inv = random.uniform(0, 500)
-            wh = Warehouse(
-                name=f"Warehouse_{i+1}",
-                latitude=lat,
-                longitude=lon,
-                inventory=inv
-            )
-            session.add(wh)
-        session.commit()
-        logger.info("Populated %d random warehouses.", num_warehouses)
-    finally:
-        session.close()
-
-def startup():
-    global MODEL
-    logger.info("Initializing DB...")
-    init_db()
-    populate_random_warehouses(num_warehouses=3)
-
-    logger.info("Training 6D regression model (with time_window_{start,end}) penalty approach.")
-    MODEL = train_regression_model(samples=2000)
-    logger.info("Model training complete.")
-
-with app.app_context():
-    startup()
-
-@app.route("/")
+api = Blueprint("api", __name__)
+
+# answered while startup is still running
+_ALWAYS_OPEN = {"api.index", "api.ready", "api.metrics"}
+
+def create_app(config: Optional[StartupConfig] = None) -> Flask:
+    """
+    Builds the Flask app and runs startup (see startup.py), inline or in a
+    background thread with config.background.
+    """
+    config = config or StartupConfig.from_env()
+    flask_app = Flask(__name__)
+    flask_app.register_blueprint(api)
+    readiness = Readiness()
+    flask_app.extensions["readiness"] = readiness
+    flask_app.extensions["startup_thread"] = start(warehouse_cache, model_slot, config, readiness)
+    return flask_app
+
+@api.before_app_request
+def require_ready():
+    if request.endpoint in _ALWAYS_OPEN:
+        return None
+    readiness = current_app.extensions["readiness"]
+    if not readiness.ready:
+        resp = jsonify({"error": "Service is starting.", "readiness": readiness.as_dict()})
+        resp.headers["Retry-After"] = "1"
+        return resp, 503
+    return None
+
+@api.route("/ready")
+def ready():
+    readiness = current_app.extensions["readiness"]
+    return jsonify(readiness.as_dict()), 200 if readiness.ready else 503
+
+@api.route("/")
 def index():
     return "Route Optimization – using time_window_start/time_window_end & inventory constraints."
 
-@app.route("/warehouses", methods=["GET"])
+def _finish(timer: RequestTimer, resp, status: int = 200):
+    timer.mark("jsonify")
+    timer.finish(status)
+    if SERVER_TIMING:
+        resp.headers["Server-Timing"] = timer.server_timing()
+    return resp, status
+
+@api.route("/warehouses", methods=["GET"])
 def list_warehouses():
-    session = SessionLocal()
-    try:
-        whs = session.query(Warehouse).all()
-        data = []
-        for w in whs:
-            data.append({
-                "id": w.id,
-                "name": w.name,
-                "latitude": w.latitude,
-                "longitude": w.longitude,
-                "inventory": w.inventory
-            })
-        return jsonify(data)
-    finally:
-        session.close()
-
-@app.route("/optimize", methods=["POST"])
+    timer = RequestTimer("warehouses")
+    snapshot = warehouse_cache.get()
+    timer.mark("snapshot")
+    if etag_matches(request.headers.get("If-None-Match"), snapshot.etag):
+        resp, status = Response(status=304), 304
+    else:
+        rows = snapshot.to_dicts()
+        timer.mark("serialize")
+        resp, status = jsonify(rows), 200
+    resp.headers["ETag"] = snapshot.etag
+    return _finish(timer, resp, status)
+
+@api.route("/warehouses/bulk", methods=["POST"])
+def upsert_warehouses():
+    """
+    Upserts warehouse rows (name, latitude, longitude, inventory | inventory_delta)
+    from a JSON array or CSV body; see warehouse_upsert.py.
+    """
+    payload, status = warehouse_upsert_request(request.content_type, request.get_data(),
+                                               warehouse_cache)
+    return jsonify(payload), status
+
+@api.route("/warehouses/cache", methods=["GET"])
+def warehouse_cache_stats():
+    return jsonify(warehouse_cache.stats())
+
+@api.route("/optimize/cache", methods=["GET"])
+def result_cache_stats():
+    return jsonify(result_cache.stats())
+
+@api.route("/reservations/stats", methods=["GET"])
+def reservations_stats():
+    return jsonify(reservation_stats.as_dict())
+
+@api.route("/db/pool", methods=["GET"])
+def db_pool_stats():
+    return jsonify(pool_stats())
+
+@api.route("/model", methods=["GET"])
+def model_info():
+    return jsonify(model_slot.live.manifest)
+
+@api.route("/optimize", methods=["POST"])
 def optimize():
-    raw_data = request.get_json()
-    if not raw_data:
-        return jsonify({"error":"No JSON body provided"}), 400
-
-    try:
-        req_model = OptimizeRequest(**raw_data)
-    except ValidationError as e:
-        return jsonify({"validation_error": e.errors()}), 400
-
-    order = Order(
-        lat=req_model.latitude,
-        lon=req_model.longitude,
-        time_window_start=req_model.time_window_start,
-        time_window_end=req_model.time_window_end,
-        quantity=req_model.quantity
-    )
-
-    session = SessionLocal()
+    timer = RequestTimer("optimize")
+    raw_data = request.get_json(silent=True)
+    timer.mark("parse")
+    live = model_slot.live
+    payload, status = optimize_request(raw_data, live.model, warehouse_cache, timer=timer,
+                                       results=result_cache, model_version=live.version)
+    if wants_msgpack(request.headers.get("Accept")):
+        body = encode_msgpack(payload)
+        if body is not None:
+            return _finish(timer, Response(body, mimetype=MSGPACK_MEDIA_TYPE), status)
+    return _finish(timer, jsonify(payload), status)
+
+@api.route("/metrics", methods=["GET"])
+def metrics():
+    text = render_prometheus(extra={
+        "warehouse_cache": warehouse_cache.stats,
+        "distance_cache": distance_service.stats,
+        "result_cache": result_cache.stats,
+        "db_pool": pool_stats,
+        "reservations": reservation_stats.as_dict,
+        "online": online_learner.stats
+    })
+    return Response(text, mimetype="text/plain; version=0.0.4")
+
+@api.route("/optimize/batch", methods=["POST"])
+def optimize_batch():
+    """
+    Accepts a JSON array of orders (or {"orders": [...]}), each shaped like the
+    /optimize body. Returns {"results": [...]} in input order, one entry per
+    order with either "best_route" or an inline "validation_error"/"error".
+    """
+    payload, status = optimize_batch_request(request.get_json(silent=True), model_slot.live.model,
+                                             warehouse_cache)
+    return jsonify(payload), status
+
+@api.route("/optimize/stream", methods=["POST"])
+def optimize_stream():
+    """
+    Streams orders in (NDJSON, or CSV with Content-Type: text/csv) and results
+    out as each chunk is scored. NDJSON output ends with a {"summary": ...} line.
+    """
     try:
-        whs = session.query(Warehouse).all()
-
-        if all(w.inventory < order.quantity for w in whs):
-            return jsonify({"error":"Not enough inventory in all warehouses."}), 400
-
-        all_routes_info = []
-        best_route = None
-        best_cost = float('inf')
-
-        for w in whs:
-            wh_routes = generate_candidate_routes(
-                order=order,
-                warehouse_id=w.id,
-                warehouse_lat=w.latitude,
-                warehouse_lon=w.longitude,
-                warehouse_inventory=w.inventory,
-                num_routes=5
-            )
-            for r in wh_routes:
-                c = predict_cost(MODEL, r, order)
-                route_data = {
-                    "route_id": r["route_id"],
-                    "warehouse_id": r["warehouse_id"],
-                    "distance": round(r["distance"],3),
-                    "traffic": round(r["traffic"],2),
-                    "inventory": round(r["warehouse_inventory"],2),
-                    "predicted_cost": round(c,3)
-                }
-                all_routes_info.append(route_data)
-                if c < best_cost:
-                    best_cost = c
-                    best_route = route_data
-
-        if best_cost >= 999999:
-            return jsonify({"error":"All routes penalized; none feasible."}), 400
-
-        response = {
-            "best_route": best_route,
-            "all_routes": all_routes_info
-        }
-        return jsonify(response)
-    finally:
-        session.close()
+        input_format, output_format, chunk_size = stream_options(request.content_type, request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    job = StreamJob(model_slot.live.model, warehouse_cache, output_format=output_format)
+    lines = (line.decode("utf-8") for line in request.stream)
+
+    def generate():
+        yield from stream_optimize(lines, job, input_format, chunk_size)
+        summary = job.summary()
+        logger.info("Stream finished: %s", summary)
+        if output_format == "ndjson":
+            yield json.dumps({"summary": summary}) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype=media_type(output_format))
+
+@api.route("/feedback", methods=["POST"])
+def feedback():
+    """
+    Observed delivery costs for returned routes; see online_learning.py.
+    """
+    payload, status = feedback_request(request.get_json(silent=True), online_learner)
+    return jsonify(payload), status
+
+@api.route("/feedback/stats", methods=["GET"])
+def feedback_stats():
+    return jsonify(online_learner.stats())
+
+@api.route("/vrp", methods=["POST"])
+def solve_vrp():
+    """
+    Batches a set of orders onto multi-stop vehicle routes out of the warehouses.
+    Order indices in the response refer to positions in the request's "orders".
+    """
+    payload, status = vrp_request(request.get_json(silent=True), warehouse_cache)
+    return jsonify(payload), status
+
+_app: Optional[Flask] = None
+_app_lock = threading.Lock()
+
+def __getattr__(name):
+    # `app` is built on first access, so importing this module stays cheap
+    global _app
+    if name != "app":
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    with _app_lock:
+        if _app is None:
+            _app = create_app()
+    return _app
 
 if __name__ == "__main__":
-    app.run(port=5000, debug=True)
+    create_app().run(port=5000, debug=True)
@@ -0,0 +1,360 @@
+"""
+asgi_app.py
+
+ASGI (Starlette) variant of the API with the same response contract as app.py:
+ - GET  /, /warehouses, /warehouses/cache, /optimize/cache, /reservations/stats,
+        /db/pool, /model, /metrics
+ - GET  /feedback/stats, /ready
+ - POST /optimize, /optimize/batch, /optimize/stream, /vrp, /feedback, /warehouses/bulk
+
+Differences from the Flask server:
+ - warehouse snapshots are read with an async DB driver
+   (ASYNC_DATABASE_URL, derived from DATABASE_URL by default:
+    sqlite -> sqlite+aiosqlite, postgresql -> postgresql+asyncpg)
+ - CPU-bound scoring runs in a thread pool (ASGI_WORKERS threads)
+ - at most ASGI_MAX_CONCURRENCY requests are in flight; the rest get
+   429 + Retry-After immediately instead of queueing
+ - startup (startup.py, STARTUP_* env vars) runs in the lifespan handler;
+   with STARTUP_BACKGROUND=1 the server answers /ready with 503 until it's done
+
+Run with:
+   uvicorn asgi_app:app --port 5000
+"""
+
+import asyncio
+import functools
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, Response
+from starlette.routing import Route
+
+from database import DATABASE_URL, SessionLocal, pool_stats
+from distance import distance_service
+from inventory import reservation_stats
+from metrics import SERVER_TIMING, RequestTimer, render_prometheus
+from online_learning import ModelSlot, OnlineLearner
+from result_cache import result_cache
+from models import Warehouse
+from warehouse_cache import WarehouseCache, WarehouseSnapshot
+from service import (
+    MSGPACK_MEDIA_TYPE, encode_msgpack, etag_matches, feedback_request, optimize_request,
+    optimize_batch_request, vrp_request, wants_msgpack, warehouse_upsert_request
+)
+from startup import Readiness, StartupConfig, run_startup
+from streaming import RecordParser, StreamJob, media_type, stream_options
+
+logger = logging.getLogger(__name__)
+
+ASGI_WORKERS = int(os.environ.get("ASGI_WORKERS", str(min(32, (os.cpu_count() or 1) + 4))))
+ASGI_MAX_CONCURRENCY = int(os.environ.get("ASGI_MAX_CONCURRENCY", "64"))
+
+def async_database_url(url: str) -> str:
+    """
+    Maps a sync SQLAlchemy URL onto its async driver.
+    """
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url[len("sqlite://"):]
+    for prefix in ("postgresql+psycopg2://", "postgresql+psycopg://", "postgresql://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
+    return url
+
+ASYNC_DATABASE_URL = os.environ.get("ASYNC_DATABASE_URL", async_database_url(DATABASE_URL))
+
+class AsyncWarehouseCache(WarehouseCache):
+    """
+    WarehouseCache whose reloads go through an async session (aget());
+    invalidation, apply_inventory() and the spatial index are inherited.
+    """
+    def __init__(self, async_session_factory, ttl_seconds: Optional[float] = None):
+        super().__init__(session_factory=SessionLocal, ttl_seconds=ttl_seconds)
+        self.async_session_factory = async_session_factory
+        self._reload_lock: Optional[asyncio.Lock] = None
+
+    async def aget(self) -> WarehouseSnapshot:
+        snap = self._snapshot
+        if self._is_fresh(snap):
+            self.hits += 1
+            return snap
+        self.misses += 1
+        if self._reload_lock is None:
+            self._reload_lock = asyncio.Lock()
+        async with self._reload_lock:
+            snap = self._snapshot
+            if self._is_fresh(snap):
+                return snap
+            stmt = (select(Warehouse.id, Warehouse.name, Warehouse.latitude,
+                           Warehouse.longitude, Warehouse.inventory)
+                    .order_by(Warehouse.id))
+            generation = self._generation
+            async with self.async_session_factory() as session:
+                rows = (await session.execute(stmt)).all()
+            with self._lock:
+                return self._install_locked(rows, generation)
+
+class BackpressureMiddleware:
+    """
+    Rejects HTTP requests with 429 once `limit` are already in flight.
+    """
+    def __init__(self, app, limit: int):
+        self.app = app
+        self.limit = limit
+        self.in_flight = 0
+        self.rejected = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if self.in_flight >= self.limit:
+            self.rejected += 1
+            response = JSONResponse({"error": "Server busy, retry later."},
+                                    status_code=429, headers={"Retry-After": "1"})
+            await response(scope, receive, send)
+            return
+        self.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
+
+class ReadinessGate:
+    """
+    Answers 503 + Retry-After until app.state.readiness is ready, except on open_paths.
+    """
+    def __init__(self, app, open_paths=("/", "/ready", "/metrics")):
+        self.app = app
+        self.open_paths = set(open_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] not in self.open_paths:
+            readiness = getattr(scope["app"].state, "readiness", None)
+            if readiness is None or not readiness.ready:
+                response = JSONResponse(
+                    {"error": "Service is starting.",
+                     "readiness": readiness.as_dict() if readiness else None},
+                    status_code=503, headers={"Retry-After": "1"})
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+async_engine = create_async_engine(ASYNC_DATABASE_URL)
+cache = AsyncWarehouseCache(async_sessionmaker(async_engine, expire_on_commit=False))
+executor = ThreadPoolExecutor(max_workers=ASGI_WORKERS, thread_name_prefix="scoring")
+model_slot = ModelSlot()
+online_learner = OnlineLearner(model_slot)
+
+async def _json_body(request: Request):
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+async def _run(fn, *args) -> JSONResponse:
+    loop = asyncio.get_running_loop()
+    payload, status = await loop.run_in_executor(executor, functools.partial(fn, *args))
+    return JSONResponse(payload, status_code=status)
+
+async def ready(request: Request):
+    readiness = getattr(request.app.state, "readiness", None)
+    if readiness is None:
+        return JSONResponse({"ready": False}, status_code=503)
+    return JSONResponse(readiness.as_dict(), status_code=200 if readiness.ready else 503)
+
+async def index(request: Request):
+    return PlainTextResponse("Route Optimization – using time_window_start/time_window_end & inventory constraints.")
+
+def _finish(timer: RequestTimer, payload, status: int = 200, accept: Optional[str] = None) -> Response:
+    body = encode_msgpack(payload) if wants_msgpack(accept) else None
+    if body is not None:
+        response = Response(body, status_code=status, media_type=MSGPACK_MEDIA_TYPE)
+    else:
+        response = JSONResponse(payload, status_code=status)
+    timer.mark("jsonify")
+    timer.finish(status)
+    if SERVER_TIMING:
+        response.headers["Server-Timing"] = timer.server_timing()
+    return response
+
+async def list_warehouses(request: Request):
+    timer = RequestTimer("warehouses")
+    snapshot = await cache.aget()
+    timer.mark("snapshot")
+    if etag_matches(request.headers.get("if-none-match"), snapshot.etag):
+        response = Response(status_code=304)
+        timer.mark("jsonify")
+        timer.finish(304)
+    else:
+        rows = snapshot.to_dicts()
+        timer.mark("serialize")
+        response = _finish(timer, rows)
+    response.headers["ETag"] = snapshot.etag
+    return response
+
+async def upsert_warehouses(request: Request):
+    return await _run(warehouse_upsert_request, request.headers.get("content-type"),
+                      await request.body(), cache)
+
+async def warehouse_cache_stats(request: Request):
+    return JSONResponse(cache.stats())
+
+async def result_cache_stats(request: Request):
+    return JSONResponse(result_cache.stats())
+
+async def reservations_stats(request: Request):
+    return JSONResponse(reservation_stats.as_dict())
+
+async def db_pool_stats(request: Request):
+    return JSONResponse(pool_stats())
+
+async def model_info(request: Request):
+    return JSONResponse(model_slot.live.manifest)
+
+async def optimize(request: Request):
+    timer = RequestTimer("optimize")
+    body = await _json_body(request)
+    timer.mark("parse")
+    snapshot = await cache.aget()
+    timer.mark("snapshot")
+    live = model_slot.live
+    loop = asyncio.get_running_loop()
+    payload, status = await loop.run_in_executor(executor, functools.partial(
+        optimize_request, body, live.model, cache, snapshot, timer=timer,
+        results=result_cache, model_version=live.version))
+    return _finish(timer, payload, status, accept=request.headers.get("accept"))
+
+async def metrics(request: Request):
+    text = render_prometheus(extra={
+        "warehouse_cache": cache.stats,
+        "distance_cache": distance_service.stats,
+        "result_cache": result_cache.stats,
+        "db_pool": pool_stats,
+        "reservations": reservation_stats.as_dict,
+        "online": online_learner.stats
+    })
+    return Response(text, media_type="text/plain; version=0.0.4")
+
+async def optimize_batch(request: Request):
+    body = await _json_body(request)
+    return await _run(optimize_batch_request, body, model_slot.live.model, cache, await cache.aget())
+
+class StreamEndpoint:
+    """
+    Raw ASGI endpoint for /optimize/stream (same contract as the Flask one).
+    It owns receive(): body messages are split into lines, every full chunk
+    is scored in the thread pool and written out before more of the body is
+    read, so only one chunk is in memory and nothing else competes for the
+    request stream (as StreamingResponse's disconnect listener would).
+    """
+    async def __call__(self, scope, receive, send):
+        request = Request(scope)
+        try:
+            input_format, output_format, chunk_size = stream_options(
+                request.headers.get("content-type"), request.query_params)
+        except ValueError as e:
+            await JSONResponse({"error": str(e)}, status_code=400)(scope, receive, send)
+            return
+
+        job = StreamJob(model_slot.live.model, cache, output_format=output_format)
+        parser = RecordParser(input_format)
+        loop = asyncio.get_running_loop()
+
+        async def write(text: str):
+            if text:
+                await send({"type": "http.response.body",
+                            "body": text.encode("utf-8"), "more_body": True})
+
+        async def flush(chunk):
+            text = await loop.run_in_executor(executor, job.process, chunk, await cache.aget())
+            await write(text)
+
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", media_type(output_format).encode())]})
+        await write(job.header())
+
+        chunk, pending, more_body = [], b"", True
+        while more_body:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            more_body = message.get("more_body", False)
+            *lines, pending = (pending + message.get("body", b"")).split(b"\n")
+            if not more_body:
+                lines.append(pending)
+            for line in lines:
+                rec = parser.parse(line.decode("utf-8"))
+                if rec is not None:
+                    chunk.append(rec)
+                if len(chunk) >= chunk_size:
+                    await flush(chunk)
+                    chunk = []
+        if chunk:
+            await flush(chunk)
+
+        summary = job.summary()
+        logger.info("Stream finished: %s", summary)
+        if output_format == "ndjson":
+            await write(json.dumps({"summary": summary}) + "\n")
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+optimize_stream = StreamEndpoint()
+
+async def solve_vrp(request: Request):
+    body = await _json_body(request)
+    return await _run(vrp_request, body, cache, await cache.aget())
+
+async def feedback(request: Request):
+    return await _run(feedback_request, await _json_body(request), online_learner)
+
+async def feedback_stats(request: Request):
+    return JSONResponse(online_learner.stats())
+
+@asynccontextmanager
+async def lifespan(app):
+    config = StartupConfig.from_env()
+    app.state.readiness = readiness = Readiness()
+    loop = asyncio.get_running_loop()
+    startup = loop.run_in_executor(executor, run_startup, cache, model_slot, config, readiness)
+    if config.background:
+        # failures are recorded on readiness and logged by run_startup
+        startup.add_done_callback(lambda f: f.cancelled() or f.exception())
+    else:
+        await startup
+    yield
+    if not startup.done():
+        logger.warning("Shutting down before startup finished.")
+    await async_engine.dispose()
+
+starlette_app = Starlette(
+    routes=[
+        Route("/", index),
+        Route("/ready", ready, methods=["GET"]),
+        Route("/warehouses", list_warehouses, methods=["GET"]),
+        Route("/warehouses/cache", warehouse_cache_stats, methods=["GET"]),
+        Route("/warehouses/bulk", upsert_warehouses, methods=["POST"]),
+        Route("/optimize/cache", result_cache_stats, methods=["GET"]),
+        Route("/reservations/stats", reservations_stats, methods=["GET"]),
+        Route("/db/pool", db_pool_stats, methods=["GET"]),
+        Route("/model", model_info, methods=["GET"]),
+        Route("/metrics", metrics, methods=["GET"]),
+        Route("/optimize", optimize, methods=["POST"]),
+        Route("/optimize/batch", optimize_batch, methods=["POST"]),
+        Route("/optimize/stream", optimize_stream, methods=["POST"]),
+        Route("/vrp", solve_vrp, methods=["POST"]),
+        Route("/feedback", feedback, methods=["POST"]),
+        Route("/feedback/stats", feedback_stats, methods=["GET"]),
+    ],
+    middleware=[Middleware(ReadinessGate)],
+    lifespan=lifespan,
+)
+app = BackpressureMiddleware(starlette_app, limit=ASGI_MAX_CONCURRENCY)
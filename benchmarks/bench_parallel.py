@@ -0,0 +1,103 @@
+"""
+benchmarks/bench_parallel.py
+
+Scaling of process-pool batch scoring (parallel.ParallelScorer) with the
+number of worker processes, against in-process route_optimizer.score_orders.
+
+   python benchmarks/bench_parallel.py [--orders 20000] [--warehouses 2000] [--workers 1 2 4]
+
+Prints one JSON object for the serial baseline and one per worker count
+(orders/sec, speedup over serial). Timings exclude pool start-up: every
+pool scores one warm-up batch first.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from cost_models import train_cost_model
+from parallel import PARALLEL_CHUNK_SIZE, ParallelScorer
+from route_optimizer import Order, score_orders
+from warehouse_cache import WarehouseSnapshot
+
+def _make_inputs(orders: int, warehouses: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    snapshot = WarehouseSnapshot(
+        ids=np.arange(1, warehouses + 1, dtype=np.int64),
+        names=[f"W{i}" for i in range(warehouses)],
+        latitudes=48.137 + rng.uniform(-0.5, 0.5, warehouses),
+        longitudes=11.576 + rng.uniform(-0.5, 0.5, warehouses),
+        inventories=rng.uniform(0, 500, warehouses),
+        version=1,
+        loaded_at=time.time()
+    )
+    start = rng.uniform(0, 12, orders)
+    batch = [Order(lat, lon, s, s + w, q) for lat, lon, s, w, q in zip(
+        (48.137 + rng.uniform(-0.5, 0.5, orders)).tolist(),
+        (11.576 + rng.uniform(-0.5, 0.5, orders)).tolist(),
+        start.tolist(),
+        rng.uniform(1, 8, orders).tolist(),
+        rng.uniform(1, 100, orders).tolist())]
+    return snapshot, batch
+
+def run_serial(snapshot, orders, model, chunk_size: int) -> dict:
+    t0 = time.perf_counter()
+    for s in range(0, len(orders), chunk_size):
+        score_orders(orders[s:s + chunk_size], snapshot.ids, snapshot.latitudes,
+                     snapshot.longitudes, snapshot.inventories, model)
+    elapsed = time.perf_counter() - t0
+    return {
+        "benchmark": "parallel_scoring",
+        "mode": "serial",
+        "workers": 0,
+        "orders": len(orders),
+        "warehouses": len(snapshot),
+        "seconds": round(elapsed, 4),
+        "orders_per_sec": round(len(orders) / elapsed, 1)
+    }
+
+def run_parallel(snapshot, orders, model, workers: int, chunk_size: int) -> dict:
+    with ParallelScorer(workers, chunk_size=chunk_size) as scorer:
+        scorer.score(orders[:workers * chunk_size], snapshot, model)  # start + attach
+        t0 = time.perf_counter()
+        scorer.score(orders, snapshot, model)
+        elapsed = time.perf_counter() - t0
+    return {
+        "benchmark": "parallel_scoring",
+        "mode": "process_pool",
+        "workers": workers,
+        "chunk_size": chunk_size,
+        "orders": len(orders),
+        "warehouses": len(snapshot),
+        "seconds": round(elapsed, 4),
+        "orders_per_sec": round(len(orders) / elapsed, 1)
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--orders", type=int, default=20000)
+    parser.add_argument("--warehouses", type=int, default=2000)
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=list(range(1, (os.cpu_count() or 1) + 1)))
+    parser.add_argument("--chunk-size", type=int, default=PARALLEL_CHUNK_SIZE)
+    parser.add_argument("--backend", default="linear")
+    args = parser.parse_args(argv)
+
+    snapshot, orders = _make_inputs(args.orders, args.warehouses)
+    model = train_cost_model(args.backend, samples=2000, seed=0)
+
+    serial = run_serial(snapshot, orders, model, args.chunk_size)
+    print(json.dumps(serial))
+    for workers in args.workers:
+        result = run_parallel(snapshot, orders, model, workers, args.chunk_size)
+        result["speedup"] = round(serial["seconds"] / result["seconds"], 2)
+        print(json.dumps(result))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+benchmarks/bench_reservation.py
+
+Throughput of atomic inventory reservations (inventory.reserve_inventory)
+at 1 / 8 / 32 concurrent clients against a scratch SQLite database in WAL mode.
+
+   python benchmarks/bench_reservation.py [--clients 1 8 32] [--ops 200]
+
+Each client thread issues --ops reservations of 1 unit at random warehouses.
+Prints one JSON object per client count and checks that reserved units
+never exceed the stock that was available.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, make_engine, pool_stats
+from models import Warehouse
+from inventory import ReservationStats, reserve_inventory
+
+def _make_db(path: str, warehouses: int, stock: float):
+    engine = make_engine(f"sqlite:///{path}", pool_size=64, max_overflow=0,
+                         journal_mode="WAL", synchronous="NORMAL")
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+    session = factory()
+    session.add_all([Warehouse(name=f"W{i}", latitude=48.0, longitude=11.0, inventory=stock)
+                     for i in range(warehouses)])
+    session.commit()
+    session.close()
+    return engine, factory
+
+def run(clients: int, ops: int, warehouses: int, stock: float) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, factory = _make_db(os.path.join(tmp, "bench.db"), warehouses, stock)
+        stats = ReservationStats()
+        wins = [0] * clients
+
+        def worker(k):
+            rnd = random.Random(k)
+            for _ in range(ops):
+                ok, _ = reserve_inventory(rnd.randint(1, warehouses), 1.0, factory,
+                                          max_retries=100, stats=stats)
+                wins[k] += ok
+
+        threads = [threading.Thread(target=worker, args=(k,)) for k in range(clients)]
+        t0 = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - t0
+
+        session = factory()
+        remaining = session.query(func.sum(Warehouse.inventory)).scalar()
+        session.close()
+        pool = pool_stats(engine)
+        engine.dispose()
+
+    reserved = sum(wins)
+    assert reserved == warehouses * stock - remaining, "oversold inventory"
+    return {
+        "benchmark": "reservation",
+        "clients": clients,
+        "ops": clients * ops,
+        "seconds": round(elapsed, 4),
+        "ops_per_sec": round(clients * ops / elapsed, 1),
+        **stats.as_dict(),
+        "pool_checkout_ms_p95": round(pool["checkout_ms_p95"], 4),
+        "pool_max_checked_out": pool["max_checked_out"]
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--ops", type=int, default=200, help="reservations per client")
+    parser.add_argument("--warehouses", type=int, default=10)
+    parser.add_argument("--stock", type=float, default=500.0,
+                        help="initial units per warehouse (low values force conflicts)")
+    args = parser.parse_args(argv)
+    for clients in args.clients:
+        print(json.dumps(run(clients, args.ops, args.warehouses, args.stock)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+benchmarks/bench_split.py
+
+Solve time of split-shipment fulfillment (split_shipment.solve_split) vs
+warehouse count, on random networks where no single warehouse holds the
+order quantity.
+
+   python benchmarks/bench_split.py [--warehouses 10 100 300 1000] [--quantity 300] [--repeats 50]
+
+Inventories are uniform in [0, --max-inventory), so every order has to be
+split. Prints one JSON object per warehouse count with median / p95 ms for
+candidate generation and for the solve, plus the shipments and model rows
+scored per solve.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from cost_models import train_cost_model
+from route_optimizer import Order, generate_candidates
+from split_shipment import solve_split
+
+def run(warehouses: int, quantity: float, max_inventory: float, repeats: int, model) -> dict:
+    rng = np.random.default_rng(warehouses)
+    ids = np.arange(1, warehouses + 1)
+    lats = 48.137 + rng.uniform(-0.5, 0.5, warehouses)
+    lons = 11.576 + rng.uniform(-0.5, 0.5, warehouses)
+    inventories = rng.uniform(0, max_inventory, warehouses)
+
+    candidates_ms, solve_ms, shipments, evaluations = [], [], [], []
+    for i in range(repeats + 1):
+        order = Order(48.137 + rng.uniform(-0.5, 0.5), 11.576 + rng.uniform(-0.5, 0.5),
+                      2.0, 6.0, quantity)
+        t0 = time.perf_counter()
+        cands = generate_candidates(order, ids, lats, lons, inventories, rng=rng)
+        t1 = time.perf_counter()
+        plan = solve_split(model, order, cands)
+        t2 = time.perf_counter()
+        if i == 0:
+            continue  # warm-up
+        candidates_ms.append((t1 - t0) * 1000.0)
+        solve_ms.append((t2 - t1) * 1000.0)
+        if plan is not None:
+            shipments.append(len(plan.shipments))
+            evaluations.append(plan.evaluations)
+
+    return {
+        "benchmark": "split_shipment",
+        "warehouses": warehouses,
+        "quantity": quantity,
+        "repeats": repeats,
+        "solved": len(shipments),
+        "candidates_ms_median": round(float(np.median(candidates_ms)), 4),
+        "solve_ms_median": round(float(np.median(solve_ms)), 4),
+        "solve_ms_p95": round(float(np.percentile(solve_ms, 95)), 4),
+        "shipments_mean": round(float(np.mean(shipments)), 2) if shipments else None,
+        "rows_scored_mean": round(float(np.mean(evaluations)), 1) if evaluations else None
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--warehouses", type=int, nargs="+", default=[10, 100, 300, 1000])
+    parser.add_argument("--quantity", type=float, default=300.0)
+    parser.add_argument("--max-inventory", type=float, default=150.0)
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--backend", default="linear")
+    args = parser.parse_args(argv)
+    model = train_cost_model(args.backend, samples=2000, seed=0)
+    for n in args.warehouses:
+        print(json.dumps(run(n, args.quantity, args.max_inventory, args.repeats, model)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+benchmarks/bench_startup.py
+
+Import time and cold start of the Flask server, each sample in a fresh
+interpreter with a scratch database and artifact directory:
+
+  import_s        `import app`
+  startup_s       create_app() (db, seed, model, warm phases)
+  first_request_s the first POST /optimize after startup
+  sklearn         whether scikit-learn got imported
+
+Scenarios: train (no artifact yet), load (artifact present), and load without
+warm-up (STARTUP_WARM=0).
+
+   python benchmarks/bench_startup.py [--repeat 5] [--src DIR]
+
+--src points at another checkout (e.g. a `git worktree` of an older commit) to
+compare against. Trees without create_app() do all their startup while `app`
+is imported, so there import_s is the whole startup and startup_s is 0.
+Prints one JSON object per scenario with the median of --repeat runs.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = r"""
+import json, sys, time
+t0 = time.perf_counter()
+import app as server
+t1 = time.perf_counter()
+if hasattr(server, "create_app"):
+    flask_app = server.create_app()
+else:
+    flask_app = server.app
+t2 = time.perf_counter()
+resp = flask_app.test_client().post("/optimize", json={
+    "latitude": 48.137, "longitude": 11.576,
+    "time_window_start": 2, "time_window_end": 6, "quantity": 1})
+t3 = time.perf_counter()
+print(json.dumps({"import_s": t1 - t0, "startup_s": t2 - t1, "first_request_s": t3 - t2,
+                  "status": resp.status_code,
+                  "sklearn": any(m.startswith("sklearn") for m in sys.modules)}))
+"""
+
+SCENARIOS = {
+    "train": {"STARTUP_WARM": "1"},
+    "load": {"STARTUP_WARM": "1"},
+    "load_no_warm": {"STARTUP_WARM": "0"},
+}
+
+def probe(src: str, env: dict) -> dict:
+    out = subprocess.run([sys.executable, "-c", PROBE], cwd=src, env=env,
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def run(src: str, repeat: int) -> list:
+    results = []
+    for scenario, extra in SCENARIOS.items():
+        samples = []
+        for _ in range(repeat):
+            with tempfile.TemporaryDirectory() as tmp:
+                env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'w.db')}",
+                           MODEL_ARTIFACT_DIR=os.path.join(tmp, "artifacts"), **extra)
+                if scenario != "train":
+                    probe(src, env)  # leaves a trained artifact and a seeded DB behind
+                samples.append(probe(src, env))
+        result = {"scenario": scenario, "repeat": repeat}
+        for field in ("import_s", "startup_s", "first_request_s"):
+            result[field] = round(statistics.median(s[field] for s in samples), 4)
+        result["total_s"] = round(result["import_s"] + result["startup_s"]
+                                  + result["first_request_s"], 4)
+        result["sklearn"] = any(s["sklearn"] for s in samples)
+        result["statuses"] = sorted({s["status"] for s in samples})
+        results.append(result)
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--src", default=ROOT)
+    args = parser.parse_args(argv)
+    for result in run(os.path.abspath(args.src), args.repeat):
+        print(json.dumps(result))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+benchmarks/bench_upsert.py
+
+Rows/sec of bulk warehouse feeds (warehouse_upsert.upsert_warehouses) against
+the per-row ORM path (one SELECT by name + session.add / attribute set per row,
+like populate_random_warehouses), on a scratch SQLite database in WAL mode:
+
+  load    N new warehouses into an empty table
+  feed    inventory deltas for all N warehouses
+  set     absolute inventories for all N warehouses, 10% of them changed
+
+   python benchmarks/bench_upsert.py [--rows 1000 10000 100000] [--orm-max-rows 20000]
+
+The ORM path is skipped above --orm-max-rows (it needs one query per row).
+Prints one JSON object per (rows, scenario, path).
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, make_engine
+from models import Warehouse
+from warehouse_cache import WarehouseCache
+from warehouse_upsert import upsert_warehouses
+
+def _feeds(n: int, seed: int = 0) -> dict:
+    rnd = random.Random(seed)
+    load = [{"name": f"W{i}", "latitude": 48.137 + rnd.uniform(-0.5, 0.5),
+             "longitude": 11.576 + rnd.uniform(-0.5, 0.5), "inventory": rnd.uniform(0, 500)}
+            for i in range(n)]
+    feed = [{"name": f"W{i}", "inventory_delta": rnd.uniform(-20, 20)} for i in range(n)]
+    changed = set(rnd.sample(range(n), max(n // 10, 1)))
+    return {"load": load, "feed": feed, "changed": changed}
+
+def orm_upsert(rows: list, factory) -> None:
+    session = factory()
+    try:
+        for row in rows:
+            wh = session.query(Warehouse).filter(Warehouse.name == row["name"]).first()
+            if wh is None:
+                session.add(Warehouse(name=row["name"], latitude=row["latitude"],
+                                      longitude=row["longitude"], inventory=row["inventory"]))
+                continue
+            if "latitude" in row:
+                wh.latitude, wh.longitude = row["latitude"], row["longitude"]
+            if "inventory" in row:
+                wh.inventory = row["inventory"]
+            elif "inventory_delta" in row:
+                wh.inventory = max((wh.inventory or 0.0) + row["inventory_delta"], 0.0)
+        session.commit()
+    finally:
+        session.close()
+
+def run(n: int, orm_max_rows: int) -> list:
+    feeds = _feeds(n)
+    results = []
+    for kind in ("bulk", "orm"):
+        if kind == "orm" and n > orm_max_rows:
+            continue
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = make_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+                                 journal_mode="WAL", synchronous="NORMAL")
+            Base.metadata.create_all(bind=engine)
+            factory = sessionmaker(bind=engine)
+            cache = WarehouseCache(session_factory=factory, ttl_seconds=3600)
+            current = {r["name"]: r["inventory"] for r in feeds["load"]}
+            for scenario in ("load", "feed", "set"):
+                if scenario == "set":
+                    # the current inventories, +1 on the `changed` rows
+                    rows = [{"name": name, "inventory": inv + (1.0 if i in feeds["changed"] else 0.0)}
+                            for i, (name, inv) in enumerate(current.items())]
+                else:
+                    rows = feeds[scenario]
+                cache.get()
+                t0 = time.perf_counter()
+                if kind == "bulk":
+                    upsert_warehouses(rows, session_factory=factory, cache=cache)
+                else:
+                    orm_upsert(rows, factory)
+                    cache.invalidate()
+                elapsed = time.perf_counter() - t0
+                if scenario == "feed":
+                    session = factory()
+                    current = dict(session.query(Warehouse.name, Warehouse.inventory).all())
+                    session.close()
+                results.append({"rows": n, "scenario": scenario, "path": kind,
+                                "seconds": round(elapsed, 4),
+                                "rows_per_sec": round(n / elapsed, 1)})
+            engine.dispose()
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--orm-max-rows", type=int, default=20000)
+    args = parser.parse_args(argv)
+    for n in args.rows:
+        for result in run(n, args.orm_max_rows):
+            print(json.dumps(result))
+
+if __name__ == "__main__":
+    main()
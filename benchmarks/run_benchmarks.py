@@ -0,0 +1,250 @@
+"""
+benchmarks/run_benchmarks.py
+
+Benchmark suite for the optimize pipeline and training, on synthetic
+warehouse networks (--warehouses 3 100 10000) and --routes 5 50:
+
+  candidates_columnar   generate_candidates (one order x all warehouses)
+  candidates_dict       generate_candidate_routes per warehouse (<= 1000 warehouses)
+  scoring_single        predict_cost per route dict: one feature row per call,
+                        evaluated as X @ coef_ + intercept_ (timed on up to 1000
+                        routes, reported per route and extrapolated to the full set)
+  scoring_single_predict  model.predict on a one-row matrix per route, i.e. the
+                        per-route sklearn path predict_cost no longer takes
+                        (same sampling and extrapolation)
+  scoring_batch         score_candidates over the whole feature matrix
+  optimize_request      POST /optimize through the Flask test client
+                        (num_routes is fixed at 5 by the endpoint; every call
+                        uses a new location, so none is a result-cache hit)
+  training              train_regression_model vs --samples
+
+   python benchmarks/run_benchmarks.py [--output results.json]
+   python benchmarks/run_benchmarks.py --baseline results.json [--threshold 0.2]
+
+Every result carries median / p95 wall time in ms. With --baseline, results
+are matched on (name, params) and any median slower than baseline by more
+than --threshold (a fraction) is reported; the exit status is 1 if so.
+The Flask app runs against a scratch SQLite database and artifact directory.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_SCRATCH = tempfile.mkdtemp(prefix="route_optim_bench_")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_SCRATCH, 'bench.db')}")
+os.environ.setdefault("MODEL_ARTIFACT_DIR", os.path.join(_SCRATCH, "model_artifacts"))
+
+import numpy as np
+
+from route_optimizer import (
+    Order, build_feature_matrix, generate_candidate_routes, generate_candidates,
+    predict_cost, score_candidates
+)
+from training import train_regression_model
+
+SINGLE_ROUTE_SAMPLE = 1000
+DICT_VIEW_MAX_WAREHOUSES = 1000
+
+def _timings(fn, repeats: int, warmup: int = 1) -> list:
+    for _ in range(warmup):
+        fn()
+    out = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        out.append((time.perf_counter() - t0) * 1000.0)
+    return out
+
+def _result(name: str, params: dict, timings_ms: list, **extra) -> dict:
+    return {
+        "name": name,
+        "params": params,
+        "repeats": len(timings_ms),
+        "median_ms": round(float(np.median(timings_ms)), 4),
+        "p95_ms": round(float(np.percentile(timings_ms, 95)), 4),
+        **extra
+    }
+
+def _network(n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    return (np.arange(1, n + 1),
+            48.137 + rng.uniform(-0.5, 0.5, n),
+            11.576 + rng.uniform(-0.5, 0.5, n),
+            rng.uniform(0, 500, n))
+
+def _order() -> Order:
+    return Order(lat=48.14, lon=11.58, time_window_start=2.0, time_window_end=6.0, quantity=50.0)
+
+def bench_pipeline(warehouses: list, routes: list, repeats: int) -> list:
+    model = train_regression_model(samples=2000, seed=0)
+    order = _order()
+    results = []
+    for n in warehouses:
+        ids, lats, lons, invs = _network(n)
+        for num_routes in routes:
+            params = {"warehouses": n, "num_routes": num_routes}
+            rng = np.random.default_rng(0)
+
+            results.append(_result("candidates_columnar", params, _timings(
+                lambda: generate_candidates(order, ids, lats, lons, invs,
+                                            num_routes=num_routes, rng=rng), repeats)))
+
+            if n <= DICT_VIEW_MAX_WAREHOUSES:
+                def dict_view():
+                    for wid, lat, lon, inv in zip(ids, lats, lons, invs):
+                        generate_candidate_routes(order, int(wid), lat, lon, inv,
+                                                  num_routes=num_routes, rng=rng)
+                results.append(_result("candidates_dict", params, _timings(dict_view, repeats)))
+
+            cands = generate_candidates(order, ids, lats, lons, invs, num_routes=num_routes, rng=rng)
+            sample = [cands.route_dict(i, order) for i in range(min(len(cands), SINGLE_ROUTE_SAMPLE))]
+            per_route = _timings(lambda: [predict_cost(model, r, order) for r in sample], repeats)
+            per_route = [t / len(sample) for t in per_route]
+            results.append(_result("scoring_single", params, [t * len(cands) for t in per_route],
+                                   per_route_us=round(float(np.median(per_route)) * 1000.0, 3),
+                                   timed_routes=len(sample)))
+
+            rows = [build_feature_matrix([r], order) for r in sample]
+            per_route = _timings(lambda: [model.predict(row) for row in rows], repeats)
+            per_route = [t / len(sample) for t in per_route]
+            results.append(_result("scoring_single_predict", params, [t * len(cands) for t in per_route],
+                                   per_route_us=round(float(np.median(per_route)) * 1000.0, 3),
+                                   timed_routes=len(sample)))
+
+            X = cands.feature_matrix(order)
+            results.append(_result("scoring_batch", params, _timings(
+                lambda: score_candidates(model, X), repeats), routes=len(cands)))
+
+            # the dict path for the same routes, to keep build_feature_matrix in view
+            results.append(_result("feature_matrix_from_dicts", params, _timings(
+                lambda: build_feature_matrix(sample, order), repeats), routes=len(sample)))
+    return results
+
+def _seed_warehouses(n: int) -> None:
+    from database import SessionLocal
+    from models import Warehouse
+    _, lats, lons, invs = _network(n)
+    session = SessionLocal()
+    try:
+        session.query(Warehouse).delete()
+        session.bulk_insert_mappings(Warehouse, [
+            {"name": f"W{i}", "latitude": float(la), "longitude": float(lo), "inventory": float(iv)}
+            for i, (la, lo, iv) in enumerate(zip(lats, lons, invs))
+        ])
+        session.commit()
+    finally:
+        session.close()
+
+def bench_optimize_request(warehouses: list, repeats: int) -> list:
+    from app import app
+    from warehouse_cache import warehouse_cache
+
+    client = app.test_client()
+    results = []
+    for n in warehouses:
+        _seed_warehouses(n)
+        warehouse_cache.invalidate()
+        statuses = []
+        calls = iter(range(10 ** 9))
+
+        def call():
+            # a new location per call (1e-3 deg apart, beyond the result cache's
+            # 4-decimal quantization) so every call is a cache miss
+            body = json.dumps({"latitude": 48.14 + next(calls) * 1e-3, "longitude": 11.58,
+                               "time_window_start": 2.0, "time_window_end": 6.0,
+                               "quantity": 50})
+            resp = client.post("/optimize", data=body, content_type="application/json")
+            statuses.append(resp.status_code)
+
+        timings = _timings(call, repeats)
+        results.append(_result("optimize_request", {"warehouses": n, "num_routes": 5}, timings,
+                               ok=statuses.count(200), status_codes=sorted(set(statuses))))
+    return results
+
+def bench_training(samples: list, repeats: int) -> list:
+    return [_result("training", {"samples": s},
+                    _timings(lambda: train_regression_model(samples=s, seed=0), repeats, warmup=0))
+            for s in samples]
+
+def _key(result: dict) -> str:
+    return result["name"] + json.dumps(result["params"], sort_keys=True)
+
+def compare(results: list, baseline: list, threshold: float) -> list:
+    """
+    Results whose median is more than `threshold` slower than the baseline's.
+    """
+    base = {_key(r): r for r in baseline}
+    regressions = []
+    for r in results:
+        b = base.get(_key(r))
+        if b is None or b["median_ms"] <= 0:
+            continue
+        ratio = r["median_ms"] / b["median_ms"]
+        r["baseline_median_ms"] = b["median_ms"]
+        r["ratio"] = round(ratio, 3)
+        if ratio > 1.0 + threshold:
+            regressions.append({"name": r["name"], "params": r["params"],
+                                "median_ms": r["median_ms"],
+                                "baseline_median_ms": b["median_ms"],
+                                "ratio": round(ratio, 3)})
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--warehouses", type=int, nargs="+", default=[3, 100, 10000])
+    parser.add_argument("--routes", type=int, nargs="+", default=[5, 50])
+    parser.add_argument("--samples", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--only", nargs="+", choices=["pipeline", "optimize", "training"],
+                        default=["pipeline", "optimize", "training"])
+    parser.add_argument("--output", help="write the JSON report here (default: stdout)")
+    parser.add_argument("--baseline", help="JSON report to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed slowdown vs baseline as a fraction (default 0.2)")
+    args = parser.parse_args(argv)
+
+    results = []
+    if "pipeline" in args.only:
+        results += bench_pipeline(args.warehouses, args.routes, args.repeats)
+    if "optimize" in args.only:
+        results += bench_optimize_request(args.warehouses, args.repeats)
+    if "training" in args.only:
+        results += bench_training(args.samples, max(1, args.repeats // 5))
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "created_at": time.time()
+        },
+        "results": results
+    }
+    status = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["regressions"] = compare(results, json.load(f)["results"], args.threshold)
+        report["threshold"] = args.threshold
+        status = 1 if report["regressions"] else 0
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if status:
+        print(f"{len(report['regressions'])} benchmark(s) regressed by more than "
+              f"{args.threshold:.0%}", file=sys.stderr)
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
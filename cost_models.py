@@ -0,0 +1,169 @@
+"""
+cost_models.py
+
+Pluggable cost-model backends. Every backend takes the same 6 raw features
+   [distance, time_window_start, time_window_end, traffic, inv, requested_qty]
+and exposes fit(X, y) / predict(X):
+
+ - linear      -> least squares on the raw features (the original model)
+ - engineered  -> least squares on raw + distance*traffic, traffic/available_time
+                  and an inventory-shortfall indicator, which together express
+                  the time-window and 999999 penalties of _true_cost_function
+ - tree        -> sklearn HistGradientBoostingRegressor on the raw features
+
+measure_inference_latency() reports ms per 1k rows so a deployment can pick
+its accuracy/latency trade-off (see `python training.py --compare-backends`).
+"""
+
+import time
+import numpy as np
+from typing import Dict, List, Optional, Type
+
+from route_optimizer import FEATURE_NAMES
+from training import LinearSufficientStats, iter_synthetic_training_batches
+
+class CostModel:
+    """
+    Base interface; subclasses set name and implement fit/predict.
+    """
+    name = "base"
+
+    def fit(self, X: np.ndarray, y: np.ndarray) -> "CostModel":
+        raise NotImplementedError
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+class LinearCostModel(CostModel):
+    """
+    cost = transform(X) @ coef_ + intercept_
+    """
+    name = "linear"
+
+    def __init__(self, coef: Optional[np.ndarray] = None, intercept: float = 0.0):
+        self.coef_ = coef
+        self.intercept_ = intercept
+
+    @property
+    def feature_names(self) -> List[str]:
+        return list(FEATURE_NAMES)
+
+    def transform(self, X: np.ndarray) -> np.ndarray:
+        return X
+
+    def new_stats(self) -> LinearSufficientStats:
+        return LinearSufficientStats(n_features=len(self.feature_names))
+
+    def fit(self, X: np.ndarray, y: np.ndarray) -> "LinearCostModel":
+        stats = self.new_stats()
+        stats.update(self.transform(np.asarray(X, dtype=float)), y)
+        return self.fit_stats(stats)
+
+    def fit_stats(self, stats: LinearSufficientStats) -> "LinearCostModel":
+        """
+        Sets the parameters from accumulated sufficient statistics of transform(X).
+        """
+        params = stats.params()
+        self.coef_ = params[1:]
+        self.intercept_ = float(params[0])
+        return self
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return self.transform(np.asarray(X, dtype=float)) @ self.coef_ + self.intercept_
+
+    def params(self) -> np.ndarray:
+        """
+        [intercept, coef...] as stored in model artifacts.
+        """
+        return np.concatenate([[float(self.intercept_)], np.asarray(self.coef_, dtype=float)])
+
+    @classmethod
+    def from_params(cls, params: np.ndarray) -> "LinearCostModel":
+        return cls(coef=params[1:], intercept=float(params[0]))
+
+class EngineeredCostModel(LinearCostModel):
+    """
+    Linear model over the raw features plus
+      distance*traffic, traffic/available_time, 1[inventory < requested_qty]
+    """
+    name = "engineered"
+
+    @property
+    def feature_names(self) -> List[str]:
+        return list(FEATURE_NAMES) + ["distance_x_traffic",
+                                      "traffic_per_available_time",
+                                      "inventory_shortfall"]
+
+    def transform(self, X: np.ndarray) -> np.ndarray:
+        out = np.empty((X.shape[0], 9), dtype=float)
+        out[:, :6] = X
+        out[:, 6] = X[:, 0] * X[:, 3]
+        out[:, 7] = X[:, 3] / np.maximum(X[:, 2] - X[:, 1], 1e-6)
+        out[:, 8] = X[:, 4] < X[:, 5]
+        return out
+
+class TreeEnsembleCostModel(CostModel):
+    """
+    Gradient-boosted trees on the raw features; captures the step penalty
+    without feature engineering at a higher inference cost.
+    """
+    name = "tree"
+
+    def __init__(self, estimator=None, max_iter: int = 200):
+        self.estimator = estimator
+        self.max_iter = max_iter
+
+    def fit(self, X: np.ndarray, y: np.ndarray) -> "TreeEnsembleCostModel":
+        from sklearn.ensemble import HistGradientBoostingRegressor
+        self.estimator = HistGradientBoostingRegressor(max_iter=self.max_iter)
+        self.estimator.fit(X, y)
+        return self
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return np.asarray(self.estimator.predict(X), dtype=float)
+
+BACKENDS: Dict[str, Type[CostModel]] = {
+    LinearCostModel.name: LinearCostModel,
+    EngineeredCostModel.name: EngineeredCostModel,
+    TreeEnsembleCostModel.name: TreeEnsembleCostModel,
+}
+
+def make_backend(name: str) -> CostModel:
+    try:
+        return BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown cost model backend {name!r}; choose from {sorted(BACKENDS)}")
+
+def train_cost_model(backend: str = "linear",
+                     samples: int = 2000,
+                     seed: Optional[int] = None,
+                     batch_size: Optional[int] = None) -> CostModel:
+    """
+    Trains the named backend on synthetic data. Linear backends can be
+    fitted in chunks (batch_size); the tree backend needs all rows in memory.
+    """
+    model = make_backend(backend)
+    if batch_size is not None and isinstance(model, LinearCostModel):
+        stats = model.new_stats()
+        for X, y in iter_synthetic_training_batches(samples, batch_size=batch_size, seed=seed):
+            stats.update(model.transform(X), y)
+        return model.fit_stats(stats)
+
+    X, y = next(iter_synthetic_training_batches(samples, batch_size=samples, seed=seed))
+    return model.fit(X, y)
+
+def measure_inference_latency(model: CostModel,
+                              rows: int = 1000,
+                              repeats: int = 20,
+                              seed: int = 0) -> float:
+    """
+    Median wall time of one predict() over `rows` rows, in ms per 1k rows.
+    """
+    X, _ = next(iter_synthetic_training_batches(rows, batch_size=rows, seed=seed))
+    model.predict(X)  # warm-up
+    timings = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        model.predict(X)
+        timings.append(time.perf_counter() - t0)
+    return float(np.median(timings)) * 1000.0 * (1000.0 / rows)
@@ -2,21 +2,147 @@
 database.py
 
 Sets up the SQLAlchemy engine, session factory, and a function to initialize the DB.
+
+The engine is configured from the environment:
+  DATABASE_URL          default sqlite:///./demo_warehouses.db
+                        (e.g. postgresql+psycopg://user:pw@host/db; the models are dialect-neutral)
+  DB_POOL_SIZE          default 5
+  DB_MAX_OVERFLOW       default 10
+  DB_POOL_TIMEOUT       seconds to wait for a free connection, default 30
+  DB_POOL_PRE_PING      1/0, default 1
+  SQLITE_JOURNAL_MODE   default WAL
+  SQLITE_SYNCHRONOUS    default NORMAL
+  SQLITE_MMAP_SIZE      bytes, default 268435456 (256 MiB)
+  SQLITE_BUSY_TIMEOUT   seconds a writer waits on a lock, default 30
+
+Pool checkout latency and saturation are recorded by InstrumentedQueuePool
+and reported by pool_stats().
 """
 
 import logging
-from sqlalchemy import create_engine
+import os
+import threading
+import time
+import numpy as np
+from typing import Dict, Optional
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import QueuePool
 
 # Configure logger for this module
 logger = logging.getLogger(__name__)
 
-DATABASE_URL = "sqlite:///./demo_warehouses.db"
+DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./demo_warehouses.db")
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "30"))
+DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "1") == "1"
+SQLITE_JOURNAL_MODE = os.environ.get("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_BUSY_TIMEOUT = float(os.environ.get("SQLITE_BUSY_TIMEOUT", "30"))
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool that times every checkout (including time spent waiting for a
+    free connection) into a ring buffer of the last `window` latencies.
+    """
+    window = 2048
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._latencies = np.zeros(self.window)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.max_checked_out = 0
+
+    def _do_get(self):
+        t0 = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            elapsed = time.perf_counter() - t0
+            with self._stats_lock:
+                self._latencies[self.checkouts % self.window] = elapsed
+                self.checkouts += 1
+                self.max_checked_out = max(self.max_checked_out, self.checkedout())
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            recent = self._latencies[:min(self.checkouts, self.window)].copy()
+            checkouts = self.checkouts
+            max_checked_out = self.max_checked_out
+        capacity = self.size() + self._max_overflow
+        p50, p95, p99 = (np.percentile(recent, [50, 95, 99]) * 1000.0).tolist() if len(recent) else (0.0, 0.0, 0.0)
+        return {
+            "pool_size": self.size(),
+            "max_overflow": self._max_overflow,
+            "checked_out": self.checkedout(),
+            "overflow": self.overflow(),
+            "max_checked_out": max_checked_out,
+            "saturation": self.checkedout() / capacity if capacity > 0 else 0.0,
+            "checkouts": checkouts,
+            "checkout_ms_p50": p50,
+            "checkout_ms_p95": p95,
+            "checkout_ms_p99": p99,
+            "checkout_ms_max": float(recent.max() * 1000.0) if len(recent) else 0.0
+        }
+
+def _is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
 
-engine = create_engine(DATABASE_URL, echo=False)
+def _is_sqlite_memory(url: str) -> bool:
+    return url in ("sqlite://", "sqlite:///:memory:") or ":memory:" in url
+
+def make_engine(url: Optional[str] = None,
+                pool_size: int = DB_POOL_SIZE,
+                max_overflow: int = DB_MAX_OVERFLOW,
+                pool_timeout: float = DB_POOL_TIMEOUT,
+                pool_pre_ping: bool = DB_POOL_PRE_PING,
+                journal_mode: str = SQLITE_JOURNAL_MODE,
+                synchronous: str = SQLITE_SYNCHRONOUS,
+                mmap_size: int = SQLITE_MMAP_SIZE) -> Engine:
+    """
+    Engine with a sized, instrumented connection pool. File-backed SQLite
+    connections get the journal_mode / synchronous / mmap_size pragmas.
+    """
+    url = url or DATABASE_URL
+    kwargs = {"echo": False}
+    if _is_sqlite(url):
+        kwargs["connect_args"] = {"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT}
+    if not _is_sqlite_memory(url):
+        kwargs.update(poolclass=InstrumentedQueuePool,
+                      pool_size=pool_size,
+                      max_overflow=max_overflow,
+                      pool_timeout=pool_timeout,
+                      pool_pre_ping=pool_pre_ping)
+    eng = create_engine(url, **kwargs)
+
+    if _is_sqlite(url) and not _is_sqlite_memory(url):
+        @event.listens_for(eng, "connect")
+        def _sqlite_pragmas(dbapi_conn, _record):
+            cursor = dbapi_conn.cursor()
+            cursor.execute(f"PRAGMA journal_mode={journal_mode}")
+            cursor.execute(f"PRAGMA synchronous={synchronous}")
+            cursor.execute(f"PRAGMA mmap_size={int(mmap_size)}")
+            cursor.close()
+
+    return eng
+
+engine = make_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+def pool_stats(eng: Optional[Engine] = None) -> Dict:
+    """
+    Checkout latency percentiles (ms) and saturation of the engine's pool.
+    """
+    pool = (eng or engine).pool
+    if isinstance(pool, InstrumentedQueuePool):
+        return pool.stats()
+    return {"pool_class": type(pool).__name__}
+
 def init_db():
     """
     Create all tables in the database (if not exist).
@@ -0,0 +1,222 @@
+"""
+distance.py
+
+Distances in km between (lat, lon) points:
+ - haversine()            great-circle distance, broadcasting like NumPy
+ - HaversineBackend       full matrices in one vectorized call
+ - RoadNetworkBackend     shortest paths over a local road graph file
+ - DistanceService        LRU cache of matrix rows keyed on rounded coordinates
+
+The road graph is a JSON file:
+   {"nodes": [[node_id, lat, lon], ...], "edges": [[from_id, to_id, km], ...]}
+Edges are treated as undirected. Points are snapped to their nearest node
+(the snap distance is added on both ends); pairs with no path fall back to
+haversine.
+
+The module-level `distance_service` is configured from the environment:
+   DISTANCE_BACKEND=haversine|road, ROAD_GRAPH_PATH=..., DISTANCE_CACHE_SIZE=100000,
+   DISTANCE_CACHE_BYTES=67108864 (rows are len(targets) floats, so the byte cap
+   is what bounds memory against large warehouse sets)
+"""
+
+import json
+import logging
+import os
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = np.pi * EARTH_RADIUS_KM / 180.0
+
+def haversine(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance in km; array arguments broadcast.
+    """
+    lat1 = np.radians(lat1)
+    lat2 = np.radians(lat2)
+    dlat = lat2 - lat1
+    dlon = np.radians(lon2) - np.radians(lon1)
+    a = np.sin(dlat / 2.0)**2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2.0)**2
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+class HaversineBackend:
+    name = "haversine"
+
+    def matrix(self, lats_a: np.ndarray, lons_a: np.ndarray,
+               lats_b: np.ndarray, lons_b: np.ndarray) -> np.ndarray:
+        """
+        (len(a), len(b)) distances in km.
+        """
+        return haversine(np.asarray(lats_a, dtype=float)[:, None],
+                         np.asarray(lons_a, dtype=float)[:, None],
+                         np.asarray(lats_b, dtype=float)[None, :],
+                         np.asarray(lons_b, dtype=float)[None, :])
+
+class RoadNetworkBackend:
+    """
+    Shortest-path distances over a road graph loaded from a JSON file
+    (format in the module docstring). Requires scipy.
+    """
+    name = "road"
+
+    def __init__(self, graph_path: str):
+        from scipy.sparse import csr_matrix
+
+        with open(graph_path) as f:
+            graph = json.load(f)
+        node_ids = [n[0] for n in graph["nodes"]]
+        index = {nid: i for i, nid in enumerate(node_ids)}
+        self.node_lats = np.array([n[1] for n in graph["nodes"]], dtype=float)
+        self.node_lons = np.array([n[2] for n in graph["nodes"]], dtype=float)
+
+        rows = [index[e[0]] for e in graph["edges"]]
+        cols = [index[e[1]] for e in graph["edges"]]
+        weights = [float(e[2]) for e in graph["edges"]]
+        n = len(node_ids)
+        self.graph = csr_matrix((weights, (rows, cols)), shape=(n, n))
+        self._fallback = HaversineBackend()
+        logger.info("Loaded road graph %s (%d nodes, %d edges).", graph_path, n, len(weights))
+
+    def _snap(self, lats: np.ndarray, lons: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        d = self._fallback.matrix(lats, lons, self.node_lats, self.node_lons)
+        nearest = d.argmin(axis=1)
+        return nearest, d[np.arange(len(nearest)), nearest]
+
+    def matrix(self, lats_a: np.ndarray, lons_a: np.ndarray,
+               lats_b: np.ndarray, lons_b: np.ndarray) -> np.ndarray:
+        from scipy.sparse.csgraph import dijkstra
+
+        src, src_snap = self._snap(lats_a, lons_a)
+        dst, dst_snap = self._snap(lats_b, lons_b)
+        sources, inverse = np.unique(src, return_inverse=True)
+        paths = dijkstra(self.graph, directed=False, indices=sources)
+        out = paths[inverse][:, dst] + src_snap[:, None] + dst_snap[None, :]
+        unreachable = ~np.isfinite(out)
+        if unreachable.any():
+            direct = self._fallback.matrix(lats_a, lons_a, lats_b, lons_b)
+            out[unreachable] = direct[unreachable]
+        return out
+
+class DistanceService:
+    """
+    Computes distance matrices through a backend and caches each row
+    (one source point against one set of targets) in an LRU keyed on
+    (targets_key, round(lat, precision), round(lon, precision)).
+    precision=4 is ~11 m, so repeated delivery addresses share a row.
+    Distances are computed from the rounded coordinates, so cached and
+    fresh results are identical. The LRU is bounded by both max_entries rows
+    and max_bytes of row data.
+    """
+    def __init__(self, backend=None, max_entries: int = 100_000, precision: int = 4,
+                 max_bytes: int = 64 * 1024 * 1024):
+        self.backend = backend or HaversineBackend()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.precision = precision
+        self._rows: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def targets_key(lats: np.ndarray, lons: np.ndarray) -> int:
+        return hash((np.asarray(lats, dtype=float).tobytes(),
+                     np.asarray(lons, dtype=float).tobytes()))
+
+    def matrix(self,
+               lats_a: np.ndarray, lons_a: np.ndarray,
+               lats_b: np.ndarray, lons_b: np.ndarray,
+               targets_key: Optional[int] = None) -> np.ndarray:
+        """
+        (len(a), len(b)) distances in km. Pass targets_key when the same
+        target set is reused (e.g. a warehouse snapshot version) to skip hashing it.
+        """
+        lats_a = np.round(np.asarray(lats_a, dtype=float), self.precision)
+        lons_a = np.round(np.asarray(lons_a, dtype=float), self.precision)
+        lats_b = np.asarray(lats_b, dtype=float)
+        lons_b = np.asarray(lons_b, dtype=float)
+        if targets_key is None:
+            targets_key = self.targets_key(lats_b, lons_b)
+
+        out = np.empty((len(lats_a), len(lats_b)), dtype=float)
+        missing: Dict[tuple, list] = {}
+        with self._lock:
+            for i, key in enumerate(zip(lats_a.tolist(), lons_a.tolist())):
+                row = self._rows.get((targets_key,) + key)
+                if row is not None:
+                    self._rows.move_to_end((targets_key,) + key)
+                    out[i] = row
+                    self.hits += 1
+                else:
+                    missing.setdefault(key, []).append(i)
+                    self.misses += 1
+
+        if missing:
+            keys = list(missing)
+            rows = self.backend.matrix(np.array([k[0] for k in keys]),
+                                       np.array([k[1] for k in keys]),
+                                       lats_b, lons_b)
+            with self._lock:
+                for key, row in zip(keys, rows):
+                    out[missing[key]] = row
+                    if row.nbytes > self.max_bytes:
+                        continue
+                    # copy: a view would pin the whole batch matrix until every row is evicted
+                    old = self._rows.pop((targets_key,) + key, None)
+                    if old is not None:
+                        self._bytes -= old.nbytes
+                    self._rows[(targets_key,) + key] = row.copy()
+                    self._bytes += row.nbytes
+                while self._rows and (len(self._rows) > self.max_entries
+                                      or self._bytes > self.max_bytes):
+                    _, evicted = self._rows.popitem(last=False)
+                    self._bytes -= evicted.nbytes
+                    self.evictions += 1
+        return out
+
+    def square_matrix(self, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+        """
+        (n, n) distances between all given points (e.g. order x order).
+        """
+        lats = np.round(np.asarray(lats, dtype=float), self.precision)
+        lons = np.round(np.asarray(lons, dtype=float), self.precision)
+        return self.backend.matrix(lats, lons, lats, lons)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._rows.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.backend.name,
+            "entries": len(self._rows),
+            "max_entries": self.max_entries,
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0
+        }
+
+def _service_from_env() -> DistanceService:
+    backend_name = os.environ.get("DISTANCE_BACKEND", "haversine")
+    if backend_name == "road":
+        backend = RoadNetworkBackend(os.environ["ROAD_GRAPH_PATH"])
+    elif backend_name == "haversine":
+        backend = HaversineBackend()
+    else:
+        raise ValueError(f"Unknown DISTANCE_BACKEND {backend_name!r}")
+    return DistanceService(backend,
+                           max_entries=int(os.environ.get("DISTANCE_CACHE_SIZE", "100000")),
+                           max_bytes=int(os.environ.get("DISTANCE_CACHE_BYTES", str(64 * 1024 * 1024))))
+
+distance_service = _service_from_env()
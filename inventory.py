@@ -0,0 +1,123 @@
+"""
+inventory.py
+
+Atomic inventory reservation for chosen routes. A reservation is one
+conditional statement:
+
+   UPDATE warehouses SET inventory = inventory - :qty
+   WHERE id = :id AND inventory >= :qty
+   RETURNING inventory
+
+so two workers can never both take the last stock: the database applies the
+check and the decrement together, and a loser simply sees zero rows updated.
+Transient lock errors ("database is locked" on SQLite) are retried with backoff.
+
+Counters (ReservationStats):
+  attempts  -> conditional UPDATEs issued
+  reserved  -> reservations that succeeded
+  conflicts -> UPDATEs that matched no row (stock already taken)
+  retries   -> UPDATEs re-run after a lock/serialization error
+  failed    -> reserve_first() calls where no warehouse could be reserved
+"""
+
+import logging
+import random
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import OperationalError
+
+from database import SessionLocal
+from models import Warehouse
+
+logger = logging.getLogger(__name__)
+
+class ReservationStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.attempts = 0
+        self.reserved = 0
+        self.conflicts = 0
+        self.retries = 0
+        self.failed = 0
+
+    def add(self, **deltas) -> None:
+        with self._lock:
+            for name, delta in deltas.items():
+                setattr(self, name, getattr(self, name) + delta)
+
+    def as_dict(self) -> Dict:
+        with self._lock:
+            return {
+                "attempts": self.attempts,
+                "reserved": self.reserved,
+                "conflicts": self.conflicts,
+                "retries": self.retries,
+                "failed": self.failed
+            }
+
+reservation_stats = ReservationStats()
+
+def reserve_inventory(warehouse_id: int,
+                      quantity: float,
+                      session_factory=SessionLocal,
+                      max_retries: int = 5,
+                      stats: ReservationStats = reservation_stats
+) -> Tuple[bool, Optional[float]]:
+    """
+    Decrements one warehouse's inventory by quantity if it has enough.
+    Returns (reserved, inventory_after); inventory_after is the current
+    inventory when the reservation lost (None if the row doesn't exist).
+    """
+    stmt = (update(Warehouse)
+            .where(Warehouse.id == warehouse_id, Warehouse.inventory >= quantity)
+            .values(inventory=Warehouse.inventory - quantity)
+            .returning(Warehouse.inventory))
+    for attempt in range(max_retries + 1):
+        session = session_factory()
+        try:
+            stats.add(attempts=1)
+            remaining = session.execute(stmt).scalar_one_or_none()
+            if remaining is not None:
+                session.commit()
+                stats.add(reserved=1)
+                return True, remaining
+            session.rollback()
+            stats.add(conflicts=1)
+            current = session.execute(
+                select(Warehouse.inventory).where(Warehouse.id == warehouse_id)
+            ).scalar_one_or_none()
+            return False, current
+        except OperationalError:
+            session.rollback()
+            if attempt == max_retries:
+                raise
+            stats.add(retries=1)
+            time.sleep(0.001 * (2 ** attempt) * (1 + random.random()))
+        finally:
+            session.close()
+    return False, None
+
+def reserve_first(warehouse_ids: List[int],
+                  quantity: float,
+                  session_factory=SessionLocal,
+                  on_update=None,
+                  stats: ReservationStats = reservation_stats
+) -> Tuple[Optional[int], Optional[float], int]:
+    """
+    Tries warehouse_ids in order (e.g. cheapest route first) and reserves
+    quantity at the first one that still has stock.
+    on_update(warehouse_id, inventory) is called with every inventory value
+    learned along the way, so callers can keep an in-memory view current.
+    Returns (warehouse_id or None, inventory_after, attempts).
+    """
+    for n, wid in enumerate(warehouse_ids, start=1):
+        ok, inventory_after = reserve_inventory(wid, quantity, session_factory, stats=stats)
+        if inventory_after is not None and on_update is not None:
+            on_update(wid, inventory_after)
+        if ok:
+            return wid, inventory_after, n
+    stats.add(failed=1)
+    return None, None, len(warehouse_ids)
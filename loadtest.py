@@ -0,0 +1,482 @@
+"""
+loadtest.py
+
+Load generator for /optimize and /warehouses, in-process through the Flask
+test client or over HTTP against a running server (app.py or asgi_app.py).
+
+Orders come from a configurable mix (--mix kind=weight ...):
+  uniform         anywhere in the warehouses' bounding box, quantity 1..100,
+                  1-8 h time windows
+  near_inventory  quantity within ±10% of a random warehouse's inventory, so
+                  a share of orders is only feasible at a few warehouses or none
+  tight_window    time windows of 3-30 minutes (large time penalties)
+  clustered       normally distributed around --clusters hotspots
+                  (--cluster-km standard deviation), like repeated delivery areas
+The pool of --orders orders is generated and JSON-encoded before the clock
+starts and is cycled through; --warehouses-fraction of the requests are
+GET /warehouses instead of POST /optimize. A cycled order repeats its
+quantized result-cache key, so after the first pass it is a cache hit;
+--unique-orders shifts every later pass by one quantization step
+(UNIQUE_STEP_DEG of latitude) so that each request scores a new order.
+
+Load models:
+  closed  --concurrency workers each send the next request as soon as the
+          previous one returned (plus --think-ms)
+  open    requests are scheduled at --rate per second (poisson or constant
+          arrivals) and served by up to --concurrency workers; latency is
+          measured from the scheduled time, so queueing behind a saturated
+          server shows up in the percentiles instead of lowering the rate
+
+   python loadtest.py --concurrency 1 4 16 --duration 10
+   python loadtest.py --url http://127.0.0.1:5000 --mode open --rate 50 100 200
+   python loadtest.py --mix near_inventory=1 tight_window=1 --output runs.json
+
+One JSON report per concurrency (closed) or rate (open) is printed: throughput,
+latency percentiles, error rate (transport errors, 429 and 5xx) and rejection
+rate (other 4xx, e.g. not enough inventory), overall, per endpoint and per
+order kind, plus the change in GET /optimize/cache hits and misses during
+the run (result_cache; it includes any other traffic to the server). In-process runs use DATABASE_URL / MODEL_ARTIFACT_DIR like the
+server and share its GIL with the load generator, so they measure the
+request path rather than server capacity.
+"""
+
+import argparse
+import http.client
+import json
+import logging
+import math
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MIX_KINDS = ("uniform", "near_inventory", "tight_window", "clustered")
+DEFAULT_MIX = {"uniform": 0.55, "near_inventory": 0.15, "tight_window": 0.15, "clustered": 0.15}
+KM_PER_DEGREE = 111.0
+# one step of result_cache's 4-decimal coordinate quantization
+UNIQUE_STEP_DEG = 1e-4
+
+# (endpoint, order kind, method, path, body)
+PlannedRequest = Tuple[str, str, str, str, Optional[bytes]]
+
+class OrderMix:
+    """
+    Random /optimize bodies drawn from the MIX_KINDS generators by weight,
+    around the given warehouses (dicts with latitude, longitude, inventory).
+    """
+    def __init__(self, warehouses: Sequence[Dict],
+                 weights: Optional[Dict[str, float]] = None,
+                 clusters: int = 5,
+                 cluster_km: float = 2.0,
+                 seed: Optional[int] = None):
+        if not warehouses:
+            raise ValueError("OrderMix needs at least one warehouse")
+        weights = dict(DEFAULT_MIX if weights is None else weights)
+        unknown = set(weights) - set(MIX_KINDS)
+        if unknown:
+            raise ValueError(f"Unknown order kinds {sorted(unknown)}; choose from {MIX_KINDS}")
+        total = sum(weights.values())
+        if total <= 0 or min(weights.values()) < 0:
+            raise ValueError("Mix weights must be non-negative and not all zero")
+
+        self.kinds = list(weights)
+        self.probs = np.array([weights[k] for k in self.kinds], dtype=float) / total
+        self.rng = np.random.default_rng(seed)
+        self.lats = np.array([float(w["latitude"]) for w in warehouses])
+        self.lons = np.array([float(w["longitude"]) for w in warehouses])
+        self.inventories = np.array([float(w["inventory"]) for w in warehouses])
+        # a little beyond the outermost warehouses, at least ~10 km across
+        pad = 0.05
+        self.lat_range = (self.lats.min() - pad, self.lats.max() + pad)
+        self.lon_range = (self.lons.min() - pad, self.lons.max() + pad)
+        self.centers = np.column_stack([self.rng.uniform(*self.lat_range, clusters),
+                                        self.rng.uniform(*self.lon_range, clusters)])
+        self.cluster_deg = cluster_km / KM_PER_DEGREE
+
+    def _location(self, kind: str) -> Tuple[float, float]:
+        if kind == "clustered":
+            lat, lon = self.centers[self.rng.integers(len(self.centers))]
+            lat += self.rng.normal(0.0, self.cluster_deg)
+            lon += self.rng.normal(0.0, self.cluster_deg / max(math.cos(math.radians(lat)), 0.01))
+            return float(lat), float(lon)
+        return float(self.rng.uniform(*self.lat_range)), float(self.rng.uniform(*self.lon_range))
+
+    def order(self) -> Tuple[str, Dict]:
+        """
+        (kind, /optimize body) for one random order.
+        """
+        kind = self.kinds[self.rng.choice(len(self.kinds), p=self.probs)]
+        lat, lon = self._location(kind)
+        start = float(self.rng.uniform(0.0, 8.0))
+        if kind == "tight_window":
+            length = float(self.rng.uniform(0.05, 0.5))
+        else:
+            length = float(self.rng.uniform(1.0, 8.0))
+        if kind == "near_inventory":
+            inventory = self.inventories[self.rng.integers(len(self.inventories))]
+            quantity = max(1.0, round(float(inventory * self.rng.uniform(0.9, 1.1))))
+        else:
+            quantity = float(self.rng.integers(1, 101))
+        return kind, {"latitude": round(lat, 6), "longitude": round(lon, 6),
+                      "time_window_start": round(start, 3),
+                      "time_window_end": round(start + length, 3),
+                      "quantity": quantity}
+
+    def orders(self, n: int) -> List[Tuple[str, Dict]]:
+        return [self.order() for _ in range(n)]
+
+def plan_requests(mix: OrderMix, n: int, warehouses_fraction: float = 0.0,
+                  options: Optional[Dict] = None,
+                  seed: Optional[int] = None) -> List[PlannedRequest]:
+    """
+    n pre-encoded requests; options (e.g. {"best_only": true}) are merged into
+    every /optimize body.
+    """
+    rng = np.random.default_rng(seed)
+    planned = []
+    for kind, body in mix.orders(n):
+        if rng.random() < warehouses_fraction:
+            planned.append(("/warehouses", "-", "GET", "/warehouses", None))
+        else:
+            body.update(options or {})
+            planned.append(("/optimize", kind, "POST", "/optimize", json.dumps(body).encode()))
+    return planned
+
+class FlaskTarget:
+    """
+    In-process target; every worker gets its own test client.
+    """
+    def __init__(self, flask_app):
+        self.app = flask_app
+        self.name = "flask"
+
+    def client(self) -> Callable:
+        test_client = self.app.test_client()
+
+        def send(method: str, path: str, body: Optional[bytes]) -> Tuple[int, bytes]:
+            resp = test_client.open(path, method=method, data=body,
+                                    content_type="application/json" if body else None)
+            return resp.status_code, resp.get_data()
+        return send
+
+class HttpTarget:
+    """
+    A running server; every worker keeps one keep-alive connection and
+    reconnects after a transport error.
+    """
+    def __init__(self, base_url: str, timeout: float = 30.0):
+        parts = urlsplit(base_url)
+        if parts.scheme not in ("http", "https"):
+            raise ValueError(f"Unsupported URL {base_url!r}; use http:// or https://")
+        self.scheme = parts.scheme
+        self.netloc = parts.netloc
+        self.prefix = parts.path.rstrip("/")
+        self.timeout = timeout
+        self.name = base_url
+
+    def _connect(self):
+        cls = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+        return cls(self.netloc, timeout=self.timeout)
+
+    def client(self) -> Callable:
+        conn = [self._connect()]
+
+        def send(method: str, path: str, body: Optional[bytes]) -> Tuple[int, bytes]:
+            headers = {"Content-Type": "application/json"} if body else {}
+            try:
+                conn[0].request(method, self.prefix + path, body=body, headers=headers)
+                resp = conn[0].getresponse()
+                return resp.status, resp.read()
+            except (OSError, http.client.HTTPException):
+                conn[0].close()
+                conn[0] = self._connect()
+                raise
+        return send
+
+def planned_request(planned: List[PlannedRequest], i: int,
+                    unique: bool = False) -> PlannedRequest:
+    """
+    The i-th request of a run over the cycled pool. With unique, pass p > 0
+    moves each /optimize order p * UNIQUE_STEP_DEG north.
+    """
+    req = planned[i % len(planned)]
+    passes = i // len(planned)
+    if not unique or not passes or req[0] != "/optimize":
+        return req
+    body = json.loads(req[4])
+    body["latitude"] = round(body["latitude"] + passes * UNIQUE_STEP_DEG, 6)
+    return req[:4] + (json.dumps(body).encode(),)
+
+def fetch_warehouses(target) -> List[Dict]:
+    status, body = target.client()("GET", "/warehouses", None)
+    if status != 200:
+        raise RuntimeError(f"GET /warehouses returned {status}")
+    return json.loads(body)
+
+class Recorder:
+    """
+    One (endpoint, kind, status, latency_s) sample per request; status is
+    None for transport errors.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples: List[Tuple[str, str, Optional[int], float]] = []
+        self.lags: List[float] = []
+
+    def record(self, endpoint: str, kind: str, status: Optional[int], latency: float,
+               lag: Optional[float] = None) -> None:
+        with self._lock:
+            self.samples.append((endpoint, kind, status, latency))
+            if lag is not None:
+                self.lags.append(lag)
+
+def fetch_cache_stats(target) -> Optional[Dict]:
+    """
+    GET /optimize/cache, or None if the target doesn't answer it.
+    """
+    try:
+        status, body = target.client()("GET", "/optimize/cache", None)
+        stats = json.loads(body) if status == 200 else None
+    except Exception:
+        return None
+    return stats if isinstance(stats, dict) and "hits" in stats else None
+
+def cache_delta(before: Optional[Dict], after: Optional[Dict]) -> Optional[Dict]:
+    """
+    Result-cache hits, misses and hit rate between two /optimize/cache reads.
+    """
+    if before is None or after is None:
+        return None
+    hits = after["hits"] - before["hits"]
+    misses = after["misses"] - before["misses"]
+    lookups = hits + misses
+    return {"hits": hits, "misses": misses,
+            "hit_rate": round(hits / lookups, 4) if lookups > 0 else 0.0}
+
+def _is_error(status: Optional[int]) -> bool:
+    return status is None or status == 429 or status >= 500
+
+def _summary(samples: List[Tuple], seconds: float) -> Dict:
+    n = len(samples)
+    statuses: Dict[str, int] = {}
+    errors = rejected = 0
+    for _, _, status, _ in samples:
+        key = "error" if status is None else str(status)
+        statuses[key] = statuses.get(key, 0) + 1
+        if _is_error(status):
+            errors += 1
+        elif status >= 400:
+            rejected += 1
+    out = {
+        "requests": n,
+        "throughput_rps": round(n / seconds, 2) if seconds > 0 else 0.0,
+        "error_rate": round(errors / n, 4) if n else 0.0,
+        "rejection_rate": round(rejected / n, 4) if n else 0.0,
+        "status_counts": dict(sorted(statuses.items())),
+    }
+    if n:
+        ms = np.array([s[3] for s in samples]) * 1000.0
+        p50, p90, p95, p99 = np.percentile(ms, [50, 90, 95, 99]).tolist()
+        out["latency_ms"] = {"mean": round(float(ms.mean()), 3), "p50": round(p50, 3),
+                             "p90": round(p90, 3), "p95": round(p95, 3),
+                             "p99": round(p99, 3), "max": round(float(ms.max()), 3)}
+    return out
+
+def report(recorder: Recorder, seconds: float, **config) -> Dict:
+    """
+    Overall summary plus breakdowns by endpoint and by order kind.
+    """
+    samples = recorder.samples
+    out = dict(config, seconds=round(seconds, 3), **_summary(samples, seconds))
+    for field, pos in (("endpoints", 0), ("kinds", 1)):
+        groups: Dict[str, List] = {}
+        for s in samples:
+            groups.setdefault(s[pos], []).append(s)
+        out[field] = {k: _summary(v, seconds) for k, v in sorted(groups.items())}
+    if recorder.lags:
+        lags = np.array(recorder.lags) * 1000.0
+        out["schedule_lag_ms"] = {"p50": round(float(np.percentile(lags, 50)), 3),
+                                  "p99": round(float(np.percentile(lags, 99)), 3),
+                                  "max": round(float(lags.max()), 3)}
+    return out
+
+def _send(send: Callable, req: PlannedRequest, recorder: Recorder,
+          t0: float, lag: Optional[float] = None) -> None:
+    endpoint, kind, method, path, body = req
+    try:
+        status, _ = send(method, path, body)
+    except Exception:
+        status = None
+    recorder.record(endpoint, kind, status, time.perf_counter() - t0, lag)
+
+def _run_workers(workers: int, fn: Callable) -> float:
+    threads = [threading.Thread(target=fn, args=(k,), daemon=True) for k in range(workers)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - t0
+
+def run_closed(target, planned: List[PlannedRequest], concurrency: int,
+               duration: Optional[float] = None, requests: Optional[int] = None,
+               think_ms: float = 0.0, unique: bool = False) -> Dict:
+    """
+    Closed loop: each of `concurrency` workers sends back to back until
+    `duration` seconds have passed or `requests` have been sent in total.
+    """
+    if duration is None and requests is None:
+        raise ValueError("run_closed needs duration or requests")
+    recorder = Recorder()
+    counter = iter(range(requests if requests is not None else 2 ** 62))
+    counter_lock = threading.Lock()
+    before = fetch_cache_stats(target)
+    deadline = time.perf_counter() + duration if duration is not None else None
+
+    def worker(k):
+        send = target.client()
+        while True:
+            with counter_lock:
+                i = next(counter, None)
+            if i is None or (deadline is not None and time.perf_counter() >= deadline):
+                return
+            req = planned_request(planned, i, unique)
+            _send(send, req, recorder, time.perf_counter())
+            if think_ms:
+                time.sleep(think_ms / 1000.0)
+
+    seconds = _run_workers(concurrency, worker)
+    return report(recorder, seconds, mode="closed", target=target.name,
+                  concurrency=concurrency, think_ms=think_ms, unique_orders=unique,
+                  result_cache=cache_delta(before, fetch_cache_stats(target)))
+
+def arrival_offsets(rate: float, duration: float, arrival: str = "poisson",
+                    seed: Optional[int] = None) -> np.ndarray:
+    """
+    Send times (seconds from start) of an open-loop run.
+    """
+    if rate <= 0:
+        raise ValueError("rate must be positive")
+    if arrival == "constant":
+        return np.arange(int(rate * duration)) / rate
+    if arrival != "poisson":
+        raise ValueError(f"Unknown arrival process {arrival!r}; choose poisson or constant")
+    rng = np.random.default_rng(seed)
+    # enough exponential gaps to cover the duration with overwhelming probability
+    n = int(rate * duration + 10 * math.sqrt(rate * duration) + 10)
+    offsets = np.cumsum(rng.exponential(1.0 / rate, n))
+    return offsets[offsets < duration]
+
+def run_open(target, planned: List[PlannedRequest], rate: float, duration: float,
+             concurrency: int, arrival: str = "poisson", seed: Optional[int] = None,
+             unique: bool = False) -> Dict:
+    """
+    Open loop: requests fire at the scheduled offsets whether or not earlier
+    ones have returned (as long as a worker is free). Latency is measured
+    from the scheduled time; schedule_lag_ms is how late workers got to it.
+    """
+    offsets = arrival_offsets(rate, duration, arrival, seed)
+    recorder = Recorder()
+    counter = iter(range(len(offsets)))
+    counter_lock = threading.Lock()
+    before = fetch_cache_stats(target)
+    start = time.perf_counter() + 0.05
+
+    def worker(k):
+        send = target.client()
+        while True:
+            with counter_lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            req = planned_request(planned, i, unique)
+            scheduled = start + offsets[i]
+            now = time.perf_counter()
+            if scheduled > now:
+                time.sleep(scheduled - now)
+            _send(send, req, recorder, scheduled,
+                  lag=max(0.0, time.perf_counter() - scheduled))
+
+    seconds = _run_workers(concurrency, worker) - 0.05
+    return report(recorder, max(seconds, duration), mode="open", target=target.name,
+                  concurrency=concurrency, rate=rate, arrival=arrival,
+                  scheduled=len(offsets), unique_orders=unique,
+                  result_cache=cache_delta(before, fetch_cache_stats(target)))
+
+def _parse_mix(items: Optional[List[str]]) -> Optional[Dict[str, float]]:
+    if not items:
+        return None
+    weights = {}
+    for item in items:
+        kind, _, weight = item.partition("=")
+        weights[kind] = float(weight) if weight else 1.0
+    return weights
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--url", help="server to load (default: in-process Flask test client)")
+    parser.add_argument("--mode", choices=("closed", "open"), default="closed")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[8],
+                        help="workers; one run per value in closed mode")
+    parser.add_argument("--rate", type=float, nargs="+", default=[50.0],
+                        help="requests/sec; one run per value in open mode")
+    parser.add_argument("--arrival", choices=("poisson", "constant"), default="poisson")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per run")
+    parser.add_argument("--requests", type=int, help="closed mode: stop after this many instead")
+    parser.add_argument("--think-ms", type=float, default=0.0)
+    parser.add_argument("--mix", nargs="+", metavar="KIND=WEIGHT",
+                        help=f"order kinds {MIX_KINDS} (default {DEFAULT_MIX})")
+    parser.add_argument("--clusters", type=int, default=5)
+    parser.add_argument("--cluster-km", type=float, default=2.0)
+    parser.add_argument("--orders", type=int, default=5000, help="size of the order pool")
+    parser.add_argument("--unique-orders", action="store_true",
+                        help="make every request's order unique instead of repeating the pool")
+    parser.add_argument("--warehouses-fraction", type=float, default=0.0)
+    parser.add_argument("--best-only", action="store_true", help="send best_only on /optimize")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--output", help="also write all reports to this file as a JSON list")
+    args = parser.parse_args(argv)
+
+    if args.url:
+        target = HttpTarget(args.url, timeout=args.timeout)
+    else:
+        from app import create_app
+        target = FlaskTarget(create_app())
+
+    mix = OrderMix(fetch_warehouses(target), _parse_mix(args.mix), clusters=args.clusters,
+                   cluster_km=args.cluster_km, seed=args.seed)
+    planned = plan_requests(mix, args.orders, args.warehouses_fraction,
+                            options={"best_only": True} if args.best_only else None,
+                            seed=args.seed)
+    config = {"mix": dict(zip(mix.kinds, mix.probs.round(4).tolist())),
+              "warehouses_fraction": args.warehouses_fraction, "best_only": args.best_only}
+
+    reports = []
+    if args.mode == "closed":
+        for concurrency in args.concurrency:
+            result = run_closed(target, planned, concurrency,
+                                duration=None if args.requests else args.duration,
+                                requests=args.requests, think_ms=args.think_ms,
+                                unique=args.unique_orders)
+            reports.append(dict(result, **config))
+            print(json.dumps(reports[-1]), flush=True)
+    else:
+        for rate in args.rate:
+            result = run_open(target, planned, rate, args.duration, max(args.concurrency),
+                              arrival=args.arrival, seed=args.seed,
+                              unique=args.unique_orders)
+            reports.append(dict(result, **config))
+            print(json.dumps(reports[-1]), flush=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(reports, f, indent=2)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,184 @@
+"""
+metrics.py
+
+Hot-path stage timing for the API. A RequestTimer is created per request and
+mark(stage) records the time since the previous mark, so one perf_counter()
+call and one histogram update (a few microseconds) per stage:
+
+   /optimize:    parse -> validate -> snapshot -> shortlist -> candidates
+                 -> inference -> serialize [-> reserve] -> jsonify
+   /warehouses:  snapshot -> serialize -> jsonify
+
+Each (endpoint, stage) feeds a StageHistogram: cumulative Prometheus buckets
+plus a ring buffer of recent samples for p50/p95/p99. render_prometheus()
+produces the text exposition served on GET /metrics, together with the
+warehouse cache, DB pool and reservation counters. With SERVER_TIMING=1
+responses also carry a Server-Timing header with that request's stages.
+"""
+
+import bisect
+import os
+import threading
+import time
+import numpy as np
+from typing import Callable, Dict, List, Optional, Tuple
+
+SERVER_TIMING = os.environ.get("SERVER_TIMING", "0") == "1"
+
+# seconds; the CPU stages sit well below 1 ms, DB reloads and big batches above
+BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025,
+           0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+class StageHistogram:
+    """
+    Cumulative bucket counts + sum for Prometheus, and the last `window`
+    samples for percentiles.
+    """
+    window = 2048
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.n = 0
+        self._recent = np.zeros(self.window)
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self._recent[self.n % self.window] = seconds
+        self.total += seconds
+        self.n += 1
+
+    def percentiles(self) -> Tuple[float, float, float]:
+        recent = self._recent[:min(self.n, self.window)]
+        if not len(recent):
+            return 0.0, 0.0, 0.0
+        return tuple(np.percentile(recent, [50, 95, 99]).tolist())
+
+class StageMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms: Dict[Tuple[str, str], StageHistogram] = {}
+        self.requests: Dict[Tuple[str, int], int] = {}
+
+    def observe(self, endpoint: str, stage: str, seconds: float) -> None:
+        with self._lock:
+            hist = self.histograms.get((endpoint, stage))
+            if hist is None:
+                hist = self.histograms[(endpoint, stage)] = StageHistogram()
+            hist.observe(seconds)
+
+    def count_request(self, endpoint: str, status: int) -> None:
+        with self._lock:
+            self.requests[(endpoint, status)] = self.requests.get((endpoint, status), 0) + 1
+
+    def summary(self) -> Dict:
+        """
+        {endpoint: {stage: {count, p50_ms, p95_ms, p99_ms}}}
+        """
+        out: Dict = {}
+        with self._lock:
+            for (endpoint, stage), hist in sorted(self.histograms.items()):
+                p50, p95, p99 = hist.percentiles()
+                out.setdefault(endpoint, {})[stage] = {
+                    "count": hist.n,
+                    "p50_ms": p50 * 1000.0,
+                    "p95_ms": p95 * 1000.0,
+                    "p99_ms": p99 * 1000.0
+                }
+        return out
+
+    def reset(self) -> None:
+        with self._lock:
+            self.histograms.clear()
+            self.requests.clear()
+
+stage_metrics = StageMetrics()
+
+class RequestTimer:
+    """
+    Per-request stage clock; mark(stage) closes the stage that just ran.
+    """
+    __slots__ = ("metrics", "endpoint", "stages", "_last", "_start")
+
+    def __init__(self, endpoint: str, metrics: StageMetrics = stage_metrics):
+        self.metrics = metrics
+        self.endpoint = endpoint
+        self.stages: List[Tuple[str, float]] = []
+        self._start = self._last = time.perf_counter()
+
+    def mark(self, stage: str) -> None:
+        now = time.perf_counter()
+        elapsed = now - self._last
+        self._last = now
+        self.stages.append((stage, elapsed))
+        self.metrics.observe(self.endpoint, stage, elapsed)
+
+    def finish(self, status: int) -> None:
+        self.metrics.observe(self.endpoint, "total", time.perf_counter() - self._start)
+        self.metrics.count_request(self.endpoint, status)
+
+    def server_timing(self) -> str:
+        return ", ".join(f"{stage};dur={seconds * 1000.0:.3f}" for stage, seconds in self.stages)
+
+class _NullTimer:
+    """
+    Stand-in for callers that don't time (tests, CLI, batch helpers).
+    """
+    __slots__ = ()
+
+    def mark(self, stage: str) -> None:
+        pass
+
+NULL_TIMER = _NullTimer()
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels.items()) + "}"
+
+def _number(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(int(value))
+
+def render_prometheus(metrics: StageMetrics = stage_metrics,
+                      extra: Optional[Dict[str, Callable[[], Dict]]] = None) -> str:
+    """
+    Prometheus text format. extra maps a metric prefix to a stats() callable
+    whose numeric values are exported as gauges (e.g. "warehouse_cache").
+    """
+    lines = [
+        "# HELP route_optim_stage_seconds Time spent per request stage.",
+        "# TYPE route_optim_stage_seconds histogram",
+    ]
+    with metrics._lock:
+        items = sorted((k, (list(h.counts), h.total, h.n, h.percentiles()))
+                       for k, h in metrics.histograms.items())
+        requests = sorted(metrics.requests.items())
+
+    for (endpoint, stage), (counts, total, n, _) in items:
+        cumulative = 0
+        for le, count in zip(list(BUCKETS) + ["+Inf"], counts):
+            cumulative += count
+            lines.append("route_optim_stage_seconds_bucket"
+                         f"{_labels(endpoint=endpoint, stage=stage, le=le)} {cumulative}")
+        lines.append(f"route_optim_stage_seconds_sum{_labels(endpoint=endpoint, stage=stage)} {total!r}")
+        lines.append(f"route_optim_stage_seconds_count{_labels(endpoint=endpoint, stage=stage)} {n}")
+
+    lines += ["# HELP route_optim_stage_recent_seconds Percentiles over the last "
+              f"{StageHistogram.window} samples per stage.",
+              "# TYPE route_optim_stage_recent_seconds gauge"]
+    for (endpoint, stage), (_, _, _, pcts) in items:
+        for q, value in zip(("0.5", "0.95", "0.99"), pcts):
+            lines.append("route_optim_stage_recent_seconds"
+                         f"{_labels(endpoint=endpoint, stage=stage, quantile=q)} {value!r}")
+
+    lines += ["# HELP route_optim_requests_total Requests by endpoint and status.",
+              "# TYPE route_optim_requests_total counter"]
+    for (endpoint, status), count in requests:
+        lines.append(f"route_optim_requests_total{_labels(endpoint=endpoint, status=status)} {count}")
+
+    for prefix, stats_fn in (extra or {}).items():
+        for name, value in sorted(stats_fn().items()):
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            metric = f"route_optim_{prefix}_{name}"
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric} {_number(value)}")
+    return "\n".join(lines) + "\n"
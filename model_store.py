@@ -0,0 +1,200 @@
+"""
+model_store.py
+
+Versioned on-disk model artifacts, so the server loads a trained model instead
+of retraining on every boot. Each version N is a pair of files in
+MODEL_ARTIFACT_DIR (default ./model_artifacts):
+
+  model_vN.npy     linear/engineered backends: float64 [intercept, coef...]
+  model_vN.joblib  tree backend: the fitted estimator
+  model_vN.json    manifest: version, backend, feature_names, sha256 of the params file, ...
+
+Params are opened with mmap_mode="r", so every worker process on a host
+shares the same page-cache copy. Writers (save_model, first-time training in
+load_or_train_model) hold an exclusive lock on MODEL_ARTIFACT_DIR/.lock, so
+workers that boot together never pick the same version, and every file is
+written to a temp name and renamed into place.
+"""
+
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+import numpy as np
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Dict, Optional, Tuple, Union
+
+from route_optimizer import FEATURE_NAMES, is_linear_regression
+from cost_models import (
+    CostModel, LinearCostModel, TreeEnsembleCostModel, BACKENDS,
+    measure_inference_latency, train_cost_model
+)
+
+if TYPE_CHECKING:
+    from sklearn.linear_model import LinearRegression
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_DIR = os.environ.get("MODEL_ARTIFACT_DIR", "./model_artifacts")
+
+_MANIFEST_RE = re.compile(r"^model_v(\d+)\.json$")
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+@contextmanager
+def _artifact_lock(directory: str):
+    """
+    Exclusive inter-process lock on the artifact directory.
+    """
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, ".lock"), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def _write_atomic(path: str, write) -> None:
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            write(f)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def list_versions(directory: Optional[str] = None) -> list:
+    directory = directory or ARTIFACT_DIR
+    if not os.path.isdir(directory):
+        return []
+    versions = []
+    for name in os.listdir(directory):
+        m = _MANIFEST_RE.match(name)
+        if m:
+            versions.append(int(m.group(1)))
+    return sorted(versions)
+
+def save_model(model: Union[CostModel, "LinearRegression"],
+               directory: Optional[str] = None,
+               metadata: Optional[Dict] = None) -> Dict:
+    """
+    Writes the next artifact version and returns its manifest.
+    A plain sklearn LinearRegression is stored as the "linear" backend.
+    The manifest is written last, so a half-written version is never picked up.
+    """
+    directory = directory or ARTIFACT_DIR
+    with _artifact_lock(directory):
+        return _save_model_locked(model, directory, metadata)
+
+def _save_model_locked(model: Union[CostModel, "LinearRegression"],
+                       directory: str,
+                       metadata: Optional[Dict]) -> Dict:
+    if is_linear_regression(model):
+        model = LinearCostModel(coef=model.coef_, intercept=model.intercept_)
+
+    versions = list_versions(directory)
+    version = (versions[-1] + 1) if versions else 1
+
+    if isinstance(model, LinearCostModel):
+        params_path = os.path.join(directory, f"model_v{version}.npy")
+        params = model.params()
+        _write_atomic(params_path, lambda f: np.save(f, params))
+        model_features = model.feature_names
+    else:
+        import joblib
+        params_path = os.path.join(directory, f"model_v{version}.joblib")
+        _write_atomic(params_path, lambda f: joblib.dump(model.estimator, f))
+        model_features = list(FEATURE_NAMES)
+
+    manifest = {
+        "version": version,
+        "backend": model.name,
+        "feature_names": list(FEATURE_NAMES),
+        "model_features": model_features,
+        "params_file": os.path.basename(params_path),
+        "sha256": _sha256(params_path),
+        "inference_ms_per_1k": measure_inference_latency(model),
+        "created_at": time.time()
+    }
+    manifest.update(metadata or {})
+    manifest_path = os.path.join(directory, f"model_v{version}.json")
+    _write_atomic(manifest_path, lambda f: f.write(json.dumps(manifest, indent=2).encode()))
+    logger.info("Saved %s model artifact v%d to %s", model.name, version, directory)
+    return manifest
+
+def _read_manifest(directory: str, version: int) -> Dict:
+    with open(os.path.join(directory, f"model_v{version}.json")) as f:
+        return json.load(f)
+
+def load_model(directory: Optional[str] = None,
+               version: Optional[int] = None,
+               mmap: bool = True,
+               backend: Optional[str] = None) -> Tuple[CostModel, Dict]:
+    """
+    Loads an artifact and returns (model, manifest). Defaults to the latest
+    version, or the latest version of `backend` if given.
+    Raises FileNotFoundError if none exists and ValueError if the checksum
+    or feature schema doesn't match.
+    """
+    directory = directory or ARTIFACT_DIR
+    if version is None:
+        versions = list_versions(directory)
+        if backend is not None:
+            versions = [v for v in versions
+                        if _read_manifest(directory, v).get("backend", "linear") == backend]
+        if not versions:
+            kind = f"{backend} model" if backend else "model"
+            raise FileNotFoundError(f"No {kind} artifact in {directory}")
+        version = versions[-1]
+
+    manifest = _read_manifest(directory, version)
+
+    if manifest.get("feature_names") != list(FEATURE_NAMES):
+        raise ValueError(f"Model artifact v{version} has feature schema "
+                         f"{manifest.get('feature_names')}, expected {FEATURE_NAMES}")
+
+    params_path = os.path.join(directory, manifest["params_file"])
+    if _sha256(params_path) != manifest["sha256"]:
+        raise ValueError(f"Checksum mismatch for model artifact v{version} ({params_path})")
+
+    backend_cls = BACKENDS.get(manifest.get("backend", "linear"))
+    if backend_cls is None:
+        raise ValueError(f"Model artifact v{version} uses unknown backend {manifest['backend']!r}")
+    if issubclass(backend_cls, LinearCostModel):
+        params = np.load(params_path, mmap_mode="r" if mmap else None)
+        model = backend_cls.from_params(params)
+    else:
+        import joblib
+        model = TreeEnsembleCostModel(estimator=joblib.load(params_path,
+                                                            mmap_mode="r" if mmap else None))
+    return model, manifest
+
+def load_or_train_model(samples: int = 2000,
+                        directory: Optional[str] = None,
+                        backend: str = "linear") -> Tuple[CostModel, Dict]:
+    """
+    Latest artifact of `backend` if there is one, otherwise trains, saves and loads it.
+    Only one process trains: the others wait on the artifact lock and load its result.
+    """
+    directory = directory or ARTIFACT_DIR
+    try:
+        return load_model(directory, backend=backend)
+    except FileNotFoundError:
+        pass
+    with _artifact_lock(directory):
+        try:
+            return load_model(directory, backend=backend)
+        except FileNotFoundError:
+            logger.info("No %s model artifact found; training on %d samples.", backend, samples)
+        model = train_cost_model(backend=backend, samples=samples)
+        manifest = _save_model_locked(model, directory, metadata={"samples": samples})
+    return load_model(directory, version=manifest["version"])
@@ -0,0 +1,191 @@
+"""
+online_learning.py
+
+Online updates of the cost model from observed delivery costs (POST /feedback).
+
+Each observation is the feature row of a route the API returned
+   [distance, time_window_start, time_window_end, traffic, inventory, requested_qty]
+plus the cost the delivery actually had. For the linear backends the learner
+keeps the least-squares sufficient statistics (X^T X, X^T y, see
+training.LinearSufficientStats) and re-solves them after each batch, which is
+exact and costs microseconds, so there is no retraining.
+
+The statistics start from a prior that is centred on the serving model:
+  X^T X = w * G,  X^T y = w * G @ params
+where G is the mean Gram matrix of the synthetic training distribution and w
+(ONLINE_PRIOR_WEIGHT, default 2000) is how many observations the prior is
+worth. Before any feedback the solution is exactly the loaded model. As real
+observations accumulate they outweigh the prior.
+
+Serving code reads the model from a ModelSlot. The slot holds one immutable
+(model, manifest, version) tuple and replaces it with a single reference
+assignment, so an in-flight request keeps the model it started with and never
+sees a model from one version paired with the manifest of another. A new model
+is published once ONLINE_PUBLISH_MIN observations (default 1) are pending.
+Each publish bumps the slot version, and that version is part of the
+/optimize result-cache key.
+
+The tree backend can't be updated incrementally. Feedback is rejected for it.
+Updates live in the serving process only. To persist them, save the live
+model with model_store.save_model.
+"""
+
+import logging
+import os
+import threading
+import time
+import numpy as np
+from typing import Dict, NamedTuple, Optional
+
+from cost_models import LinearCostModel
+from training import iter_synthetic_training_batches
+
+logger = logging.getLogger(__name__)
+
+ONLINE_PRIOR_WEIGHT = float(os.environ.get("ONLINE_PRIOR_WEIGHT", "2000"))
+ONLINE_PUBLISH_MIN = int(os.environ.get("ONLINE_PUBLISH_MIN", "1"))
+PRIOR_SAMPLES = 20_000
+
+class LiveModel(NamedTuple):
+    model: object
+    manifest: Dict
+    version: int
+    published_at: float
+
+class ModelSlot:
+    """
+    The serving model; publish() swaps (model, manifest) as one reference.
+    """
+    def __init__(self):
+        self._live: Optional[LiveModel] = None
+        self._lock = threading.Lock()
+
+    @property
+    def live(self) -> LiveModel:
+        return self._live
+
+    def publish(self, model, manifest: Dict) -> LiveModel:
+        with self._lock:
+            version = self._live.version + 1 if self._live is not None else 1
+            self._live = LiveModel(model, manifest, version, time.time())
+            return self._live
+
+class OnlineUnsupported(Exception):
+    """
+    The serving model's backend has no incremental update.
+    """
+
+def _prior_gram(model: LinearCostModel) -> np.ndarray:
+    X, _ = next(iter_synthetic_training_batches(PRIOR_SAMPLES, batch_size=PRIOR_SAMPLES, seed=0))
+    stats = model.new_stats()
+    stats.update(model.transform(X), np.zeros(len(X)))
+    return stats.xtx / stats.n
+
+class OnlineLearner:
+    """
+    Sufficient-statistics updates for the model in `slot`. The learner
+    restarts from the slot's model whenever something else publishes one,
+    e.g. a reload from a new artifact.
+    """
+    def __init__(self, slot: ModelSlot,
+                 prior_weight: float = ONLINE_PRIOR_WEIGHT,
+                 publish_min: int = ONLINE_PUBLISH_MIN):
+        self.slot = slot
+        self.prior_weight = prior_weight
+        self.publish_min = publish_min
+        self._lock = threading.Lock()
+        self._stats = None
+        self._base: Optional[LiveModel] = None
+        self._own: Optional[LiveModel] = None
+        self._t0 = time.perf_counter()
+        self.observations = 0
+        self.batches = 0
+        self.publishes = 0
+        self.pending = 0
+        self.pending_since: Optional[float] = None
+        self.abs_error_sum = 0.0
+        self.last_batch_mae = None
+        self.last_update_ms = None
+
+    def _start_locked(self, live: LiveModel) -> None:
+        model = live.model
+        if not isinstance(model, LinearCostModel):
+            raise OnlineUnsupported(
+                f"Online updates need a linear cost model backend, "
+                f"not {getattr(model, 'name', type(model).__name__)!r}")
+        gram = _prior_gram(model)
+        stats = model.new_stats()
+        stats.xtx = self.prior_weight * gram
+        stats.xty = self.prior_weight * gram @ model.params()
+        self._stats = stats
+        self._base = self._own = live
+        self.pending = 0
+        self.pending_since = None
+
+    def ingest(self, X: np.ndarray, y: np.ndarray) -> Dict:
+        """
+        Adds observed costs y for raw feature rows X and publishes a new model
+        once enough are pending. Raises OnlineUnsupported for non-linear models.
+        """
+        t0 = time.perf_counter()
+        with self._lock:
+            live = self.slot.live
+            if live is not self._own:
+                self._start_locked(live)
+            errors = np.abs(live.model.predict(X) - y)
+            self._stats.update(live.model.transform(X), y)
+            self.observations += len(y)
+            self.batches += 1
+            self.abs_error_sum += float(errors.sum())
+            self.last_batch_mae = float(errors.mean())
+            if self.pending_since is None:
+                self.pending_since = time.time()
+            self.pending += len(y)
+            published = self.pending >= self.publish_min
+            if published:
+                self._publish_locked()
+            self.last_update_ms = (time.perf_counter() - t0) * 1000.0
+            return {
+                "accepted": len(y),
+                "published": published,
+                "model_version": self.slot.live.version,
+                "pending": self.pending,
+                "batch_mae": round(self.last_batch_mae, 4)
+            }
+
+    def _publish_locked(self) -> None:
+        base_model = self._base.model
+        model = type(base_model)().fit_stats(self._stats)
+        self.publishes += 1
+        manifest = dict(self._base.manifest,
+                        online_revision=self.publishes,
+                        online_observations=self.observations,
+                        online_updated_at=time.time())
+        self._own = self.slot.publish(model, manifest)
+        self.pending = 0
+        self.pending_since = None
+        logger.info("Published online model revision %d (%d observations).",
+                    self.publishes, self.observations)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            live = self.slot.live
+            now = time.time()
+            elapsed = time.perf_counter() - self._t0
+            return {
+                "model_version": live.version if live is not None else None,
+                "observations": self.observations,
+                "batches": self.batches,
+                "publishes": self.publishes,
+                "pending": self.pending,
+                # how far the live model lags behind the feedback received
+                "model_age_seconds": round(now - live.published_at, 3) if live is not None else None,
+                "pending_age_seconds": round(now - self.pending_since, 3) if self.pending_since else 0.0,
+                "observations_per_sec": round(self.observations / elapsed, 3) if elapsed > 0 else 0.0,
+                "mae": self.abs_error_sum / self.observations if self.observations else None,
+                "last_batch_mae": self.last_batch_mae,
+                "last_update_ms": self.last_update_ms
+            }
+
+model_slot = ModelSlot()
+online_learner = OnlineLearner(model_slot)
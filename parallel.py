@@ -0,0 +1,210 @@
+"""
+parallel.py
+
+Process-pool scoring for very large /optimize/batch requests. Orders are split
+into chunks of PARALLEL_CHUNK_SIZE and scored with route_optimizer.score_orders
+in PARALLEL_WORKERS processes; the per-chunk RouteSelections are merged back in
+input order.
+
+Workers never get the warehouse arrays or the model pickled per task. The
+scorer publishes them once per (snapshot, model) pair into shared memory:
+  - warehouse block: (4, W) float64 rows [id, latitude, longitude, inventory]
+  - model block:     [intercept, coef...] for linear backends, or the pickled
+                     model for anything else (e.g. the tree backend)
+Tasks only carry a small descriptor (segment names + shapes) and their chunk
+of orders; each worker attaches to a published block the first time it sees
+it and keeps the attachment until a newer one is published.
+
+Configured from the environment:
+  PARALLEL_WORKERS       processes; 0 (default) keeps batches in-process
+  PARALLEL_CHUNK_SIZE    orders per task, default 256
+  PARALLEL_MIN_ORDERS    smaller batches are scored in-process, default 2000
+"""
+
+import logging
+import os
+import pickle
+import threading
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+from cost_models import BACKENDS, LinearCostModel
+from route_optimizer import Order, RouteSelection, is_linear_regression, score_orders
+
+logger = logging.getLogger(__name__)
+
+PARALLEL_WORKERS = int(os.environ.get("PARALLEL_WORKERS", "0"))
+PARALLEL_CHUNK_SIZE = int(os.environ.get("PARALLEL_CHUNK_SIZE", "256"))
+PARALLEL_MIN_ORDERS = int(os.environ.get("PARALLEL_MIN_ORDERS", "2000"))
+
+def orders_to_table(orders: List[Order]) -> np.ndarray:
+    """
+    (n, 5) float64 [lat, lon, time_window_start, time_window_end, quantity].
+    """
+    return np.array([[o.latitude, o.longitude, o.time_window_start,
+                      o.time_window_end, o.quantity] for o in orders],
+                    dtype=float).reshape(len(orders), 5)
+
+def orders_from_table(table: np.ndarray) -> List[Order]:
+    return [Order(*row) for row in table.tolist()]
+
+def _linear_params(model) -> Optional[Tuple[str, np.ndarray]]:
+    """
+    (backend name, params) for models that are fully described by coefficients.
+    """
+    if isinstance(model, LinearCostModel):
+        return model.name, model.params()
+    if is_linear_regression(model):
+        return LinearCostModel.name, LinearCostModel(model.coef_, model.intercept_).params()
+    return None
+
+def _share(array: np.ndarray) -> Tuple[shared_memory.SharedMemory, Tuple]:
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+    return block, (block.name, array.shape, array.dtype.str)
+
+def _attach(desc: Tuple) -> Tuple[shared_memory.SharedMemory, np.ndarray]:
+    name, shape, dtype = desc
+    block = shared_memory.SharedMemory(name=name)
+    return block, np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+
+# --- worker side ----------------------------------------------------------
+
+_worker_state: Dict = {"key": None, "blocks": [], "warehouses": None, "model": None}
+
+def _load_published(desc: Dict):
+    """
+    Warehouse arrays + model for desc, attaching to its segments on first use.
+    """
+    state = _worker_state
+    if state["key"] != desc["key"]:
+        for block in state["blocks"]:
+            block.close()
+        wh_block, wh = _attach(desc["warehouses"])
+        model_block, raw = _attach(desc["model"])
+        if desc["backend"] is None:
+            model = pickle.loads(raw.tobytes())
+        else:
+            model = BACKENDS[desc["backend"]].from_params(raw.copy())
+        state.update(key=desc["key"], blocks=[wh_block, model_block],
+                     warehouses=(wh[0].astype(np.int64), wh[1], wh[2], wh[3]),
+                     model=model)
+    return state["warehouses"], state["model"]
+
+def _score_chunk(desc: Dict, table: np.ndarray, num_routes: int,
+                 seed: Optional[Tuple[int, int]]) -> RouteSelection:
+    (ids, lats, lons, invs), model = _load_published(desc)
+    rng = np.random.default_rng(seed) if seed is not None else None
+    return score_orders(orders_from_table(table), ids, lats, lons, invs, model,
+                        num_routes=num_routes, rng=rng)
+
+# --- parent side ----------------------------------------------------------
+
+class ParallelScorer:
+    """
+    Long-lived process pool plus the currently published shared-memory blocks.
+    score() calls are serialized; one batch already keeps every worker busy.
+    """
+    def __init__(self, workers: int, chunk_size: int = PARALLEL_CHUNK_SIZE,
+                 mp_context=None):
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self._executor = ProcessPoolExecutor(max_workers=workers, mp_context=mp_context)
+        self._lock = threading.Lock()
+        self._blocks: List[shared_memory.SharedMemory] = []
+        self._published_for = None
+        self._desc: Optional[Dict] = None
+        self.publishes = 0
+        self.batches = 0
+        self.chunks = 0
+
+    def _publish_locked(self, snapshot, model) -> Dict:
+        # strong references compared with `is`: an id() of a collected
+        # snapshot or model can be reused by the next one
+        published = self._published_for
+        if published is not None and published[0] is snapshot and published[1] is model:
+            return self._desc
+        wh = np.vstack([snapshot.ids.astype(float), snapshot.latitudes,
+                        snapshot.longitudes, snapshot.inventories])
+        linear = _linear_params(model)
+        if linear is not None:
+            backend, params = linear
+        else:
+            backend, params = None, np.frombuffer(pickle.dumps(model), dtype=np.uint8)
+        wh_block, wh_desc = _share(wh)
+        model_block, model_desc = _share(params)
+
+        # workers that still hold the old segments keep their mapping until they switch
+        self._release_locked()
+        self._blocks = [wh_block, model_block]
+        self.publishes += 1
+        self._published_for = (snapshot, model)
+        self._desc = {"key": (os.getpid(), self.publishes), "warehouses": wh_desc,
+                      "model": model_desc, "backend": backend}
+        return self._desc
+
+    def _release_locked(self) -> None:
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+    def score(self, orders: List[Order], snapshot, model,
+              num_routes: int = 5, seed: Optional[int] = None) -> RouteSelection:
+        """
+        Best route per order, in input order. With seed, chunk i draws from
+        default_rng([seed, i]), so results don't depend on the worker count.
+        """
+        table = orders_to_table(orders)
+        starts = range(0, len(table), self.chunk_size)
+        with self._lock:
+            desc = self._publish_locked(snapshot, model)
+            futures = [
+                self._executor.submit(_score_chunk, desc, table[s:s + self.chunk_size],
+                                      num_routes, None if seed is None else (seed, i))
+                for i, s in enumerate(starts)
+            ]
+            parts = [f.result() for f in futures]
+            self.batches += 1
+            self.chunks += len(parts)
+        return RouteSelection.concatenate(parts)
+
+    def stats(self) -> Dict:
+        return {
+            "workers": self.workers,
+            "chunk_size": self.chunk_size,
+            "publishes": self.publishes,
+            "batches": self.batches,
+            "chunks": self.chunks
+        }
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            self._release_locked()
+            self._published_for = None
+
+    def __enter__(self) -> "ParallelScorer":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+_scorer: Optional[ParallelScorer] = None
+_scorer_lock = threading.Lock()
+
+def parallel_scorer() -> Optional[ParallelScorer]:
+    """
+    Process-wide scorer, started on first use; None when PARALLEL_WORKERS is 0.
+    """
+    global _scorer
+    if PARALLEL_WORKERS <= 0:
+        return None
+    with _scorer_lock:
+        if _scorer is None:
+            logger.info("Starting %d scoring processes (chunk size %d).",
+                        PARALLEL_WORKERS, PARALLEL_CHUNK_SIZE)
+            _scorer = ParallelScorer(PARALLEL_WORKERS, PARALLEL_CHUNK_SIZE)
+        return _scorer
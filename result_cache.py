@@ -0,0 +1,166 @@
+"""
+result_cache.py
+
+Response cache for /optimize. Locations and time windows are quantized before
+anything is computed, so every request in a band with the same quantity gets
+exactly the same answer, cached or fresh:
+  latitude / longitude   rounded to RESULT_CACHE_COORD_DECIMALS (default 4, ~11 m)
+  time windows           widened to RESULT_CACHE_TIME_STEP (default 0.1): start
+                         floored, end ceiled, so a window never collapses
+  quantity               rounded up to RESULT_CACHE_QTY_STEP (default 1) for the
+                         seed only; requested_qty is a model feature and decides
+                         feasibility, so orders are scored with, and cache
+                         entries keyed on, the exact requested quantity
+Candidate generation is seeded from the quantized order (order_seed), so the
+random route variations are reproducible too.
+
+Entries are keyed on (warehouse snapshot version, model version, quantized
+order, exact quantity, shortlist and response-shape options). A lookup under a newer snapshot or model version
+drops every older entry at once, so inventory updates, reloads and model
+swaps invalidate the cache without explicit hooks. Eviction is LRU, bounded by
+RESULT_CACHE_SIZE entries (0 disables the cache) and RESULT_CACHE_BYTES of
+estimated payload size, and entries expire after RESULT_CACHE_TTL seconds.
+"""
+
+import hashlib
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional, Tuple
+
+from route_optimizer import Order
+
+RESULT_CACHE_SIZE = int(os.environ.get("RESULT_CACHE_SIZE", "10000"))
+RESULT_CACHE_TTL = float(os.environ.get("RESULT_CACHE_TTL", "60"))
+RESULT_CACHE_BYTES = int(os.environ.get("RESULT_CACHE_BYTES", str(64 * 1024 * 1024)))
+COORD_DECIMALS = int(os.environ.get("RESULT_CACHE_COORD_DECIMALS", "4"))
+TIME_STEP = float(os.environ.get("RESULT_CACHE_TIME_STEP", "0.1"))
+QTY_STEP = float(os.environ.get("RESULT_CACHE_QTY_STEP", "1"))
+
+# rough in-memory size of one route in a cached payload: a dict + 6 values, or
+# 6 list slots + values in a columnar listing
+_ROUTE_BYTES = 700
+_COLUMNAR_ROUTE_BYTES = 250
+
+def quantize_order(order: Order) -> Order:
+    return Order(
+        lat=round(order.latitude, COORD_DECIMALS),
+        lon=round(order.longitude, COORD_DECIMALS),
+        time_window_start=round(math.floor(order.time_window_start / TIME_STEP + 1e-9) * TIME_STEP, 6),
+        time_window_end=round(math.ceil(order.time_window_end / TIME_STEP - 1e-9) * TIME_STEP, 6),
+        quantity=round(math.ceil(order.quantity / QTY_STEP - 1e-9) * QTY_STEP, 6)
+    )
+
+def order_key(order: Order, *options) -> Tuple:
+    """
+    Hashable identity of a (quantized) order plus any request options.
+    """
+    return (order.latitude, order.longitude, order.time_window_start,
+            order.time_window_end, order.quantity) + options
+
+def order_seed(key: Tuple) -> int:
+    """
+    Stable across processes (unlike hash()), so every worker draws the same routes.
+    """
+    return int.from_bytes(hashlib.blake2b(repr(key).encode(), digest_size=8).digest(), "little")
+
+def payload_bytes(payload: Dict) -> int:
+    routes = payload.get("all_routes", payload.get("top_routes", ()))
+    if isinstance(routes, dict):
+        return 256 + _ROUTE_BYTES + _COLUMNAR_ROUTE_BYTES * len(routes.get("route_id", ()))
+    return 256 + _ROUTE_BYTES * (len(routes) + 1)
+
+class ResultCache:
+    """
+    key -> (payload, expires_at, size); the OrderedDict keeps LRU order.
+    """
+    def __init__(self,
+                 max_entries: int = RESULT_CACHE_SIZE,
+                 ttl_seconds: float = RESULT_CACHE_TTL,
+                 max_bytes: int = RESULT_CACHE_BYTES):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, Tuple[Dict, float, int]]" = OrderedDict()
+        self._versions: Optional[Tuple] = None
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def _sync_versions_locked(self, versions: Tuple) -> None:
+        if versions != self._versions:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._bytes = 0
+            self._versions = versions
+
+    def get(self, versions: Tuple, key: Hashable) -> Optional[Dict]:
+        with self._lock:
+            self._sync_versions_locked(versions)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            payload, expires_at, size = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                self._bytes -= size
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return payload
+
+    def put(self, versions: Tuple, key: Hashable, payload: Dict) -> None:
+        size = payload_bytes(payload)
+        if not self.enabled or size > self.max_bytes:
+            return
+        with self._lock:
+            self._sync_versions_locked(versions)
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._entries[key] = (payload, time.monotonic() + self.ttl_seconds, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.invalidations += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations
+            }
+
+result_cache = ResultCache()
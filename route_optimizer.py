@@ -4,13 +4,31 @@ route_optimizer.py
 We keep time_window_start & time_window_end, then compute a big penalty if available_time is small.
 The model is trained with 6 features:
    [distance, time_window_start, time_window_end, traffic, inv, requested_qty]
+Distances are in km; candidate generation takes them from distance.distance_service.
+sklearn is not imported here (it is the slowest import of the service); fitted
+sklearn LinearRegressions are recognized through is_linear_regression().
 """
 
-import math
-import random
+import sys
 import numpy as np
-from typing import List, Dict
-from sklearn.linear_model import LinearRegression
+from typing import TYPE_CHECKING, List, Dict, Optional, Tuple
+
+if TYPE_CHECKING:
+    from sklearn.linear_model import LinearRegression
+
+from distance import DistanceService, distance_service, haversine
+
+FEATURE_NAMES = [
+    "distance",
+    "time_window_start",
+    "time_window_end",
+    "traffic",
+    "warehouse_inventory",
+    "requested_qty",
+]
+
+# candidate rows materialized at once by score_orders (~14 float/int columns each)
+MAX_BLOCK_ROWS = 250_000
 
 class Order:
     """
@@ -29,50 +47,322 @@ class Order:
         self.quantity = quantity
 
 def _compute_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    return math.sqrt((lat1 - lat2)**2 + (lon1 - lon2)**2)
+    """
+    Haversine distance in km.
+    """
+    return float(haversine(lat1, lon1, lat2, lon2))
+
+def _compute_distances(lat1: np.ndarray, lon1: np.ndarray,
+                       lat2, lon2) -> np.ndarray:
+    """
+    Vectorized _compute_distance; arguments broadcast like NumPy arrays.
+    """
+    return haversine(lat1, lon1, lat2, lon2)
+
+class CandidateRoutes:
+    """
+    Columnar candidate routes, warehouse-major:
+    rows [i*num_routes, (i+1)*num_routes) belong to warehouse_ids[i].
+      warehouse_idx, distance, traffic, inventory -> one entry per route
+
+    For multi-order batches the layout above repeats once per order and
+    order_idx / order_table ([time_window_start, time_window_end, quantity]
+    per order) carry the order-level features.
+    """
+    def __init__(self,
+                 warehouse_ids: np.ndarray,
+                 warehouse_idx: np.ndarray,
+                 distance: np.ndarray,
+                 traffic: np.ndarray,
+                 inventory: np.ndarray,
+                 num_routes: int,
+                 order_idx: Optional[np.ndarray] = None,
+                 order_table: Optional[np.ndarray] = None):
+        self.warehouse_ids = warehouse_ids
+        self.warehouse_idx = warehouse_idx
+        self.distance = distance
+        self.traffic = traffic
+        self.inventory = inventory
+        self.num_routes = num_routes
+        self.order_idx = order_idx
+        self.order_table = order_table
+
+    def __len__(self) -> int:
+        return len(self.distance)
+
+    @property
+    def routes_per_order(self) -> int:
+        return len(self.warehouse_ids) * self.num_routes
+
+    def feature_matrix(self, order: Optional[Order] = None) -> np.ndarray:
+        """
+        (n_routes, 6) matrix in FEATURE_NAMES order.
+        order may be omitted for batches built by generate_candidates_for_orders.
+        """
+        X = np.empty((len(self), len(FEATURE_NAMES)), dtype=float)
+        X[:, 0] = self.distance
+        X[:, 3] = self.traffic
+        X[:, 4] = self.inventory
+        if order is not None:
+            X[:, 1] = order.time_window_start
+            X[:, 2] = order.time_window_end
+            X[:, 5] = order.quantity
+        else:
+            per_row = self.order_table[self.order_idx]
+            X[:, 1] = per_row[:, 0]
+            X[:, 2] = per_row[:, 1]
+            X[:, 5] = per_row[:, 2]
+        return X
+
+    def route_id(self, i: int) -> str:
+        wid = int(self.warehouse_ids[self.warehouse_idx[i]])
+        return f"{wid}_{i % self.num_routes + 1}"
+
+    def route_dict(self, i: int, order: Order) -> Dict[str, float]:
+        """
+        Materializes row i in the dict layout of generate_candidate_routes.
+        """
+        return {
+            "route_id": self.route_id(i),
+            "warehouse_id": int(self.warehouse_ids[self.warehouse_idx[i]]),
+            "distance": float(self.distance[i]),
+            "time_window_start": order.time_window_start,
+            "time_window_end": order.time_window_end,
+            "traffic": float(self.traffic[i]),
+            "warehouse_inventory": float(self.inventory[i])
+        }
+
+    def select(self, costs: np.ndarray, rows: np.ndarray) -> "RouteSelection":
+        """
+        Copies the given rows (e.g. best_idx from score_candidates) out of the batch.
+        """
+        rows = np.asarray(rows)
+        return RouteSelection(
+            warehouse_idx=self.warehouse_idx[rows],
+            route_num=rows % self.num_routes + 1,
+            distance=self.distance[rows],
+            traffic=self.traffic[rows],
+            inventory=self.inventory[rows],
+            cost=np.asarray(costs)[rows]
+        )
+
+class RouteSelection:
+    """
+    A handful of routes picked out of CandidateRoutes, columnar:
+      warehouse_idx, route_num (1-based), distance, traffic, inventory, cost
+    Small enough to ship between processes and concatenate in order.
+    """
+    def __init__(self,
+                 warehouse_idx: np.ndarray,
+                 route_num: np.ndarray,
+                 distance: np.ndarray,
+                 traffic: np.ndarray,
+                 inventory: np.ndarray,
+                 cost: np.ndarray):
+        self.warehouse_idx = warehouse_idx
+        self.route_num = route_num
+        self.distance = distance
+        self.traffic = traffic
+        self.inventory = inventory
+        self.cost = cost
+
+    def __len__(self) -> int:
+        return len(self.cost)
+
+    @classmethod
+    def concatenate(cls, parts: List["RouteSelection"]) -> "RouteSelection":
+        return cls(*(np.concatenate([getattr(p, name) for p in parts])
+                     for name in ("warehouse_idx", "route_num", "distance",
+                                  "traffic", "inventory", "cost")))
+
+def generate_candidates(order: Order,
+                        warehouse_ids: np.ndarray,
+                        warehouse_lats: np.ndarray,
+                        warehouse_lons: np.ndarray,
+                        warehouse_inventories: np.ndarray,
+                        num_routes: int = 5,
+                        rng: Optional[np.random.Generator] = None,
+                        distances: Optional[DistanceService] = None
+) -> CandidateRoutes:
+    """
+    Creates num_routes variations for every warehouse in one shot,
+    randomizing distance (+-20%) & traffic (1..3) like generate_candidate_routes.
+    Baseline distances come from `distances` (default: distance.distance_service).
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    if distances is None:
+        distances = distance_service
+    warehouse_ids = np.asarray(warehouse_ids)
+    n_wh = len(warehouse_ids)
+    n = n_wh * num_routes
+
+    baseline = distances.matrix([order.latitude], [order.longitude],
+                                warehouse_lats, warehouse_lons)[0]
+    warehouse_idx = np.repeat(np.arange(n_wh), num_routes)
+    baseline = baseline[warehouse_idx]
+    distance = np.abs(baseline * (1.0 + rng.uniform(-0.2, 0.2, size=n)))
+    traffic = rng.uniform(1.0, 3.0, size=n)
+    inventory = np.asarray(warehouse_inventories, dtype=float)[warehouse_idx]
+
+    return CandidateRoutes(warehouse_ids, warehouse_idx, distance,
+                           traffic, inventory, num_routes)
+
+def generate_candidates_for_orders(orders: List[Order],
+                                   warehouse_ids: np.ndarray,
+                                   warehouse_lats: np.ndarray,
+                                   warehouse_lons: np.ndarray,
+                                   warehouse_inventories: np.ndarray,
+                                   num_routes: int = 5,
+                                   rng: Optional[np.random.Generator] = None,
+                                   distances: Optional[DistanceService] = None
+) -> CandidateRoutes:
+    """
+    generate_candidates for many orders at once: every order x warehouse x route
+    in one set of arrays, order-major (one block of routes_per_order rows per order).
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    if distances is None:
+        distances = distance_service
+    warehouse_ids = np.asarray(warehouse_ids)
+    n_orders = len(orders)
+    n_wh = len(warehouse_ids)
+    per_order = n_wh * num_routes
+    n = n_orders * per_order
+
+    order_lats = np.array([o.latitude for o in orders], dtype=float)
+    order_lons = np.array([o.longitude for o in orders], dtype=float)
+    order_table = np.array([[o.time_window_start, o.time_window_end, o.quantity]
+                            for o in orders], dtype=float).reshape(n_orders, 3)
+
+    # (n_orders, n_wh) -> repeat each warehouse num_routes times -> flatten
+    baseline = distances.matrix(order_lats, order_lons, warehouse_lats, warehouse_lons)
+    baseline = np.repeat(baseline, num_routes, axis=1).ravel()
+    distance = np.abs(baseline * (1.0 + rng.uniform(-0.2, 0.2, size=n)))
+    traffic = rng.uniform(1.0, 3.0, size=n)
+    warehouse_idx = np.tile(np.repeat(np.arange(n_wh), num_routes), n_orders)
+    inventory = np.asarray(warehouse_inventories, dtype=float)[warehouse_idx]
+    order_idx = np.repeat(np.arange(n_orders), per_order)
+
+    return CandidateRoutes(warehouse_ids, warehouse_idx, distance, traffic,
+                           inventory, num_routes,
+                           order_idx=order_idx, order_table=order_table)
 
 def generate_candidate_routes(order: Order,
                               warehouse_id: int,
                               warehouse_lat: float,
                               warehouse_lon: float,
                               warehouse_inventory: float,
-                              num_routes: int = 5
+                              num_routes: int = 5,
+                              rng: Optional[np.random.Generator] = None
 ) -> List[Dict[str, float]]:
     """
     Creates route variations, randomizing distance & traffic a bit.
+    Dict view over generate_candidates for a single warehouse.
     """
-    baseline_dist = _compute_distance(warehouse_lat, warehouse_lon,
-                                      order.latitude, order.longitude)
-    candidates = []
-    for i in range(num_routes):
-        dist_var = baseline_dist * random.uniform(-0.2, 0.2)
-        distance = abs(baseline_dist + dist_var)
-        traffic = random.uniform(1.0, 3.0)
-
-        r = {
-            "route_id": f"{warehouse_id}_{i+1}",
-            "warehouse_id": warehouse_id,
-            "distance": distance,
-            "time_window_start": order.time_window_start,
-            "time_window_end": order.time_window_end,
-            "traffic": traffic,
-            "warehouse_inventory": warehouse_inventory
-        }
-        candidates.append(r)
-    return candidates
+    cands = generate_candidates(order,
+                                np.array([warehouse_id]),
+                                np.array([warehouse_lat]),
+                                np.array([warehouse_lon]),
+                                np.array([warehouse_inventory]),
+                                num_routes=num_routes,
+                                rng=rng)
+    return [cands.route_dict(i, order) for i in range(len(cands))]
 
-def predict_cost(model: LinearRegression, route: Dict[str, float], order: Order) -> float:
+def build_feature_matrix(routes: List[Dict[str, float]], order: Order) -> np.ndarray:
+    """
+    Stacks candidate routes into one (n_routes, 6) matrix in FEATURE_NAMES order.
+    """
+    X = np.empty((len(routes), len(FEATURE_NAMES)), dtype=float)
+    for i, r in enumerate(routes):
+        X[i, 0] = r["distance"]
+        X[i, 1] = r["time_window_start"]
+        X[i, 2] = r["time_window_end"]
+        X[i, 3] = r["traffic"]
+        X[i, 4] = r["warehouse_inventory"]
+    X[:, 5] = order.quantity
+    return X
+
+def is_linear_regression(model) -> bool:
+    """
+    isinstance(model, fitted LinearRegression) without importing sklearn:
+    if sklearn.linear_model isn't loaded, model can't be one.
+    """
+    linear_model = sys.modules.get("sklearn.linear_model")
+    return (linear_model is not None and isinstance(model, linear_model.LinearRegression)
+            and hasattr(model, "coef_"))
+
+def predict_costs(model: "LinearRegression", features: np.ndarray) -> np.ndarray:
+    """
+    Vectorized inference over an (n, 6) feature matrix, one cost per row.
+    A fitted LinearRegression is evaluated as a plain matrix product, which
+    skips sklearn's per-call input validation.
+    """
+    X = np.asarray(features, dtype=float)
+    if X.shape[0] == 0:
+        return np.empty(0, dtype=float)
+    if is_linear_regression(model):
+        return X @ model.coef_ + model.intercept_
+    return np.asarray(model.predict(X), dtype=float)
+
+def score_candidates(model: "LinearRegression",
+                     features: np.ndarray,
+                     routes_per_order: Optional[int] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Scores every candidate in one pass and returns (costs, best_idx).
+
+    Without routes_per_order all rows belong to a single order and best_idx is
+    a 0-d array with the overall argmin. With routes_per_order the rows are
+    treated as consecutive blocks of that size (one block per order) and
+    best_idx holds the row index of each block's argmin.
+    """
+    costs = predict_costs(model, features)
+    if routes_per_order is None:
+        return costs, np.asarray(np.argmin(costs))
+    blocks = costs.reshape(-1, routes_per_order)
+    offsets = np.arange(blocks.shape[0]) * routes_per_order
+    return costs, blocks.argmin(axis=1) + offsets
+
+def predict_cost(model: "LinearRegression", route: Dict[str, float], order: Order) -> float:
     """
     Inference with 6 features:
       [distance, time_window_start, time_window_end, traffic, inventory, requested_qty]
     """
-    arr = np.array([[
-        route["distance"],
-        route["time_window_start"],
-        route["time_window_end"],
-        route["traffic"],
-        route["warehouse_inventory"],
-        order.quantity
-    ]])
-    cost = model.predict(arr)[0]
-    return float(cost)
+    return float(predict_costs(model, build_feature_matrix([route], order))[0])
+
+def score_orders(orders: List[Order],
+                 warehouse_ids: np.ndarray,
+                 warehouse_lats: np.ndarray,
+                 warehouse_lons: np.ndarray,
+                 warehouse_inventories: np.ndarray,
+                 model,
+                 num_routes: int = 5,
+                 rng: Optional[np.random.Generator] = None,
+                 distances: Optional[DistanceService] = None,
+                 max_rows: int = MAX_BLOCK_ROWS
+) -> RouteSelection:
+    """
+    Best route per order: generate_candidates_for_orders + score_candidates,
+    keeping only each order's argmin row. Orders are processed in blocks of
+    at most max_rows candidate rows (but at least one order), so peak memory
+    doesn't grow with the batch size.
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    per_order = max(len(warehouse_ids) * num_routes, 1)
+    block = max(max_rows // per_order, 1)
+    parts = []
+    for start in range(0, len(orders), block):
+        cands = generate_candidates_for_orders(orders[start:start + block], warehouse_ids,
+                                               warehouse_lats, warehouse_lons,
+                                               warehouse_inventories,
+                                               num_routes=num_routes, rng=rng,
+                                               distances=distances)
+        costs, best_idx = score_candidates(model, cands.feature_matrix(),
+                                           routes_per_order=cands.routes_per_order)
+        parts.append(cands.select(costs, best_idx))
+    if len(parts) == 1:
+        return parts[0]
+    return RouteSelection.concatenate(parts)
@@ -2,20 +2,114 @@
 schemas.py
 
 We keep time_window_start, time_window_end, quantity
+(+ optional k_nearest / max_radius warehouse shortlist, and the response
+shape: best_only / top_k / route_format; allow_split ships the order from up
+to max_shipments warehouses when none holds the whole quantity)
+BulkOrderRequest is one order of /optimize/batch, /optimize/stream or /vrp;
+the per-request options (shortlist, reserve, response shape) are rejected there.
+VRPRequest batches several orders onto multi-stop vehicle routes.
+FeedbackRequest carries observed delivery costs for returned routes (/feedback).
+WarehouseUpsert is one row of a warehouse/inventory feed (/warehouses/bulk).
 """
 
+from typing import List, Literal, Optional
 from pydantic import BaseModel, Field, validator
 
+# orders (or feedback observations) per batch request
+MAX_BATCH_ORDERS = 10000
+
 class OptimizeRequest(BaseModel):
     latitude: float
     longitude: float
     time_window_start: float = Field(..., ge=0)
     time_window_end: float   = Field(..., ge=0)
     quantity: float          = Field(..., ge=1)
+    # optional shortlist: only score the k nearest warehouses with enough
+    # inventory, and/or only those within max_radius (route distance units)
+    k_nearest: Optional[int]    = Field(None, ge=1)
+    max_radius: Optional[float] = Field(None, gt=0)
+    # atomically decrement inventory at the chosen warehouse
+    reserve: bool               = False
+    # response shape: only best_route, or the top_k cheapest routes instead of
+    # all of them; "columnar" returns the route list as {field: [values]}
+    best_only: bool             = False
+    top_k: Optional[int]        = Field(None, ge=1)
+    route_format: Literal["records", "columnar"] = "records"
+    # split the order across several warehouses if no single one has enough
+    allow_split: bool           = False
+    max_shipments: int          = Field(5, ge=2, le=20)
+
+    @validator("time_window_end")
+    def ensure_tw_end_gt_start(cls, v, values):
+        tw_start = values.get("time_window_start")
+        if tw_start is not None and v <= tw_start:
+            raise ValueError("time_window_end must be greater than time_window_start")
+        return v
+
+    @validator("allow_split")
+    def reject_split_reserve(cls, v, values):
+        if v and values.get("reserve"):
+            raise ValueError("reserve is not supported together with allow_split")
+        return v
+
+class BulkOrderRequest(OptimizeRequest):
+    @validator("k_nearest", "max_radius", "reserve", "best_only", "top_k", "allow_split")
+    def reject_single_order_options(cls, v):
+        if v:
+            raise ValueError("only supported by /optimize (single order)")
+        return v
+
+    @validator("route_format")
+    def reject_route_format(cls, v):
+        if v != "records":
+            raise ValueError("only supported by /optimize (single order)")
+        return v
+
+class VRPRequest(BaseModel):
+    orders: List[BulkOrderRequest] = Field(..., min_length=1, max_length=MAX_BATCH_ORDERS)
+    vehicle_capacity: float       = Field(..., gt=0)
+    speed: float                  = Field(40.0, gt=0)
+    service_time: float           = Field(0.0, ge=0)
+    start_time: float             = Field(0.0, ge=0)
+    time_budget_ms: float         = Field(200.0, gt=0, le=10000)
+
+class DeliveryFeedback(BaseModel):
+    # the route as returned by /optimize plus the order it was for
+    route_id: Optional[str]  = None
+    distance: float          = Field(..., ge=0)
+    traffic: float           = Field(..., ge=0)
+    inventory: float         = Field(..., ge=0)
+    time_window_start: float = Field(..., ge=0)
+    time_window_end: float   = Field(..., ge=0)
+    quantity: float          = Field(..., ge=1)
+    actual_cost: float       = Field(..., ge=0)
 
     @validator("time_window_end")
     def ensure_tw_end_gt_start(cls, v, values):
         tw_start = values.get("time_window_start")
-        if v <= tw_start:
+        if tw_start is not None and v <= tw_start:
             raise ValueError("time_window_end must be greater than time_window_start")
         return v
+
+class FeedbackRequest(BaseModel):
+    observations: List[DeliveryFeedback] = Field(..., min_length=1, max_length=MAX_BATCH_ORDERS)
+
+class WarehouseUpsert(BaseModel):
+    name: str                          = Field(..., min_length=1)
+    latitude: Optional[float]          = Field(None, ge=-90, le=90)
+    longitude: Optional[float]         = Field(None, ge=-180, le=180)
+    # absolute stock, or a change to it; at most one per row
+    inventory: Optional[float]         = Field(None, ge=0)
+    inventory_delta: Optional[float]   = None
+
+    @validator("longitude", always=True)
+    def ensure_lat_lon_together(cls, v, values):
+        if (v is None) != (values.get("latitude") is None):
+            raise ValueError("latitude and longitude must be given together")
+        return v
+
+    @validator("inventory_delta")
+    def ensure_single_inventory_field(cls, v, values):
+        if v is not None and values.get("inventory") is not None:
+            raise ValueError("give either inventory or inventory_delta, not both")
+        return v
@@ -0,0 +1,574 @@
+"""
+service.py
+
+Request handling shared by the Flask app (app.py) and the ASGI app (asgi_app.py).
+Each *_request function takes the parsed JSON body, the model and the warehouse
+cache, and returns (payload, status_code), so both servers keep the same
+response contract.
+"""
+
+import json
+import logging
+import os
+import random
+import numpy as np
+from typing import Optional, Tuple
+from pydantic import ValidationError
+
+from database import init_db, SessionLocal
+from metrics import NULL_TIMER
+from result_cache import ResultCache, order_key, order_seed, quantize_order
+from models import Warehouse
+from model_store import load_model, load_or_train_model
+from route_optimizer import (
+    Order, CandidateRoutes, RouteSelection, generate_candidates, score_candidates,
+    score_orders
+)
+from split_shipment import solve_split
+from schemas import MAX_BATCH_ORDERS, BulkOrderRequest, FeedbackRequest, OptimizeRequest, VRPRequest
+from vrp import VRPSolver
+from inventory import reserve_first
+from warehouse_cache import WarehouseCache, WarehouseSnapshot, warehouse_cache
+from parallel import PARALLEL_MIN_ORDERS, parallel_scorer
+from online_learning import OnlineLearner, OnlineUnsupported
+from warehouse_upsert import MAX_UPSERT_ROWS, UpsertError, rows_from_csv, upsert_warehouses
+
+logger = logging.getLogger(__name__)
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+TRAINING_SAMPLES = int(os.environ.get("TRAINING_SAMPLES", "2000"))
+COST_MODEL_BACKEND = os.environ.get("COST_MODEL_BACKEND", "linear")
+RESEED_WAREHOUSES = os.environ.get("RESEED_WAREHOUSES", "0") == "1"
+DEFAULT_SEED_MODE = "always" if RESEED_WAREHOUSES else "auto"
+WARMUP_ORDER = {"time_window_start": 2.0, "time_window_end": 6.0, "quantity": 1}
+
+def populate_random_warehouses(num_warehouses: int = 3,
+                                cache: WarehouseCache = warehouse_cache) -> None:
+    session = SessionLocal()
+    try:
+        session.query(Warehouse).delete()
+        session.commit()
+
+        for i in range(num_warehouses):
+            lat = 48.137 + random.uniform(-0.1, 0.1)
+            lon = 11.576 + random.uniform(-0.1, 0.1)
+            inv = random.uniform(0, 500)
+            wh = Warehouse(
+                name=f"Warehouse_{i+1}",
+                latitude=lat,
+                longitude=lon,
+                inventory=inv
+            )
+            session.add(wh)
+        session.commit()
+        logger.info("Populated %d random warehouses.", num_warehouses)
+    finally:
+        session.close()
+        cache.invalidate()
+
+def warehouse_count() -> int:
+    session = SessionLocal()
+    try:
+        return session.query(Warehouse).count()
+    finally:
+        session.close()
+
+def seed_warehouses(mode: str = "auto", cache: WarehouseCache = warehouse_cache) -> bool:
+    """
+    auto: random warehouses only into an empty table; always: replace all
+    warehouses; never: leave the table alone. Returns whether it seeded.
+    """
+    if mode not in ("auto", "always", "never"):
+        raise ValueError(f"Unknown seed mode {mode!r}; choose auto, always or never")
+    if mode == "always" or (mode == "auto" and warehouse_count() == 0):
+        populate_random_warehouses(num_warehouses=3, cache=cache)
+        return True
+    return False
+
+def load_serving_model(source: str = "load_or_train"):
+    """
+    (model, manifest) for COST_MODEL_BACKEND. source="load" only loads an
+    existing artifact (FileNotFoundError if there is none) and never trains.
+    """
+    logger.info("Loading 6D %s cost model (with time_window_{start,end}) penalty approach.",
+                COST_MODEL_BACKEND)
+    if source == "load":
+        model, manifest = load_model(backend=COST_MODEL_BACKEND)
+    elif source == "load_or_train":
+        model, manifest = load_or_train_model(samples=TRAINING_SAMPLES, backend=COST_MODEL_BACKEND)
+    else:
+        raise ValueError(f"Unknown model source {source!r}; choose load or load_or_train")
+    logger.info("Model artifact v%d loaded (%.4f ms per 1k rows).",
+                manifest["version"], manifest["inference_ms_per_1k"])
+    return model, manifest
+
+def warm_up(model, cache: WarehouseCache = warehouse_cache,
+            snapshot: Optional[WarehouseSnapshot] = None) -> None:
+    """
+    Loads the warehouse snapshot (and its spatial index) and scores one
+    throwaway order, so the first real request doesn't pay for lazy setup.
+    """
+    whs = snapshot if snapshot is not None else cache.get()
+    if len(whs):
+        optimize_request(dict(WARMUP_ORDER, latitude=float(whs.latitudes[0]),
+                              longitude=float(whs.longitudes[0])),
+                         model, cache, snapshot=whs)
+
+def initialize(cache: WarehouseCache = warehouse_cache,
+               seed: str = DEFAULT_SEED_MODE,
+               model_source: str = "load_or_train"):
+    """
+    DB tables + seed warehouses if needed, then (model, manifest) for COST_MODEL_BACKEND.
+    """
+    logger.info("Initializing DB...")
+    init_db()
+    seed_warehouses(seed, cache)
+    return load_serving_model(model_source)
+
+def routes_to_response(cands: CandidateRoutes, costs: np.ndarray, rows=None,
+                       route_format: str = "records"):
+    """
+    Builds the JSON route dicts for the given candidate rows (all rows by
+    default), or one {field: [values]} dict with route_format="columnar".
+    """
+    if rows is None:
+        rows = np.arange(len(cands))
+    sel = cands.select(costs, rows)
+    if route_format == "columnar":
+        return selection_to_columns(cands.warehouse_ids, sel)
+    return selection_to_response(cands.warehouse_ids, sel)
+
+def selection_to_columns(warehouse_ids: np.ndarray, sel: RouteSelection) -> dict:
+    """
+    Columnar route listing {field: [values]} for a RouteSelection.
+    Rounding is done column-wise before any dict is created.
+    """
+    wids = warehouse_ids[sel.warehouse_idx].tolist()
+    return {
+        "route_id": [f"{wid}_{rn}" for wid, rn in zip(wids, sel.route_num.tolist())],
+        "warehouse_id": wids,
+        "distance": np.round(sel.distance, 3).tolist(),
+        "traffic": np.round(sel.traffic, 2).tolist(),
+        "inventory": np.round(sel.inventory, 2).tolist(),
+        "predicted_cost": np.round(sel.cost, 3).tolist()
+    }
+
+def selection_to_response(warehouse_ids: np.ndarray, sel: RouteSelection) -> list:
+    """
+    JSON route dicts for a RouteSelection.
+    """
+    columns = selection_to_columns(warehouse_ids, sel)
+    fields = list(columns)
+    return [dict(zip(fields, values)) for values in zip(*columns.values())]
+
+def wants_msgpack(accept: Optional[str]) -> bool:
+    return MSGPACK_MEDIA_TYPE in (accept or "")
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Whether an If-None-Match header lists etag (or is "*"), so GET /warehouses
+    can answer 304 Not Modified.
+    """
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+def encode_msgpack(payload) -> Optional[bytes]:
+    """
+    MessagePack body for payload, or None if the msgpack package isn't
+    installed (callers then answer with JSON).
+    """
+    try:
+        import msgpack
+    except ImportError:
+        return None
+    return msgpack.packb(payload, use_bin_type=True)
+
+def order_from_request(req_model: OptimizeRequest) -> Order:
+    return Order(
+        lat=req_model.latitude,
+        lon=req_model.longitude,
+        time_window_start=req_model.time_window_start,
+        time_window_end=req_model.time_window_end,
+        quantity=req_model.quantity
+    )
+
+def top_rows(costs: np.ndarray, k: int) -> np.ndarray:
+    """
+    Rows of the k cheapest routes, cheapest first (ties by row), without
+    sorting the whole candidate set.
+    """
+    if k < len(costs):
+        part = np.argpartition(costs, k - 1)[:k]
+        # rows tied with the k-th cost may sit on either side of the partition
+        kth = costs[part].max()
+        part = np.concatenate([np.flatnonzero(costs < kth), np.flatnonzero(costs == kth)])[:k]
+    else:
+        part = np.arange(len(costs))
+    return part[np.lexsort((part, costs[part]))]
+
+def reserve_cheapest(cands: CandidateRoutes, costs: np.ndarray, quantity: float,
+                     cache: WarehouseCache):
+    """
+    Reserves quantity at the warehouse of the cheapest feasible route, falling
+    back to the next-cheapest warehouse when another request took the stock.
+    Returns (route row, reservation dict) or None.
+    """
+    rows = np.argsort(costs, kind="stable")
+    rows = rows[(costs[rows] < 999999) & (cands.inventory[rows] >= quantity)]
+    wh_positions = cands.warehouse_idx[rows]
+    _, first = np.unique(wh_positions, return_index=True)
+    first.sort()
+    warehouse_ids = cands.warehouse_ids[wh_positions[first]].tolist()
+
+    wid, remaining, attempts = reserve_first(
+        warehouse_ids, quantity,
+        on_update=lambda w, inv: cache.apply_inventory({w: inv})
+    )
+    if wid is None:
+        return None
+    row = int(rows[first[warehouse_ids.index(wid)]])
+    return row, {
+        "warehouse_id": wid,
+        "quantity": quantity,
+        "remaining_inventory": round(remaining, 2),
+        "attempts": attempts
+    }
+
+def optimize_request(raw_data, model, cache: WarehouseCache,
+                     snapshot: Optional[WarehouseSnapshot] = None,
+                     timer=NULL_TIMER,
+                     results: Optional[ResultCache] = None,
+                     model_version=None) -> Tuple[dict, int]:
+    """
+    /optimize: best route + all routes for one order (or only the best route /
+    the top_k cheapest, as records or columns; only those rows are serialized).
+    snapshot defaults to cache.get(); async callers load it beforehand.
+    timer (metrics.RequestTimer) is marked after each stage.
+    The order is quantized and candidates are seeded from it, so answers are
+    reproducible; with `results` and `model_version`, successful non-reserving
+    answers are cached per (snapshot version, model version, order).
+    Scoring, inventory checks, the shortlist, reservations and the cache key
+    use the requested quantity; the rounded-up one only feeds the seed.
+    """
+    if not raw_data:
+        return {"error":"No JSON body provided"}, 400
+
+    try:
+        req_model = OptimizeRequest(**raw_data)
+    except ValidationError as e:
+        return {"validation_error": json.loads(e.json())}, 400
+
+    raw_order = order_from_request(req_model)
+    quantized = quantize_order(raw_order)
+    key = order_key(quantized, req_model.k_nearest, req_model.max_radius)
+    # the response shape is part of the cache key but not of the seed, so every
+    # shape reports the same routes
+    result_key = key + (req_model.quantity, req_model.best_only, req_model.top_k,
+                        req_model.route_format, req_model.allow_split,
+                        req_model.max_shipments)
+    timer.mark("validate")
+
+    whs = snapshot
+    if whs is None:
+        whs = cache.get()
+        timer.mark("snapshot")
+
+    versions = (whs.version, model_version)
+    if req_model.reserve:
+        order = raw_order
+        use_cache = False
+    else:
+        # scored on the quantized location and window with the requested quantity
+        order = Order(quantized.latitude, quantized.longitude, quantized.time_window_start,
+                      quantized.time_window_end, raw_order.quantity)
+        use_cache = results is not None and model_version is not None
+    if use_cache:
+        cached = results.get(versions, result_key)
+        timer.mark("result_cache")
+        if cached is not None:
+            return cached, 200
+
+    if not (whs.inventories >= order.quantity).any():
+        if not req_model.allow_split:
+            return {"error":"Not enough inventory in all warehouses."}, 400
+        # not cached: whether a split works depends on the total inventory,
+        # which the quantity band of the key doesn't capture
+        return split_shipment_response(order, req_model, model, whs, cache,
+                                       order_seed(key), timer)
+
+    if req_model.k_nearest is not None or req_model.max_radius is not None:
+        positions = cache.index.nearest_in(
+            whs, order.latitude, order.longitude,
+            k=req_model.k_nearest,
+            max_radius=req_model.max_radius,
+            min_inventory=order.quantity
+        )
+        if not len(positions):
+            return {"error":"No warehouse with enough inventory within max_radius."}, 400
+        whs = whs.subset(positions)
+        timer.mark("shortlist")
+
+    cands = generate_candidates(
+        order=order,
+        warehouse_ids=whs.ids,
+        warehouse_lats=whs.latitudes,
+        warehouse_lons=whs.longitudes,
+        warehouse_inventories=whs.inventories,
+        num_routes=5,
+        rng=np.random.default_rng(order_seed(key))
+    )
+    timer.mark("candidates")
+    costs, best_idx = score_candidates(model, cands.feature_matrix(order))
+    timer.mark("inference")
+
+    best_idx = int(best_idx)
+    if float(costs[best_idx]) >= 999999:
+        return {"error":"All routes penalized; none feasible."}, 400
+
+    response = {"best_route": routes_to_response(cands, costs, rows=[best_idx])[0]}
+    if req_model.top_k is not None:
+        top = top_rows(costs, req_model.top_k)
+        response["top_routes"] = routes_to_response(cands, costs, rows=top,
+                                                    route_format=req_model.route_format)
+    elif not req_model.best_only:
+        response["all_routes"] = routes_to_response(cands, costs,
+                                                    route_format=req_model.route_format)
+    timer.mark("serialize")
+
+    if req_model.reserve:
+        reservation = reserve_cheapest(cands, costs, order.quantity, cache)
+        if reservation is None:
+            return {"error":"Inventory could not be reserved at any feasible warehouse."}, 409
+        row, response["reservation"] = reservation
+        if row != best_idx:
+            response["best_route"] = routes_to_response(cands, costs, rows=[row])[0]
+        timer.mark("reserve")
+    elif use_cache:
+        results.put(versions, result_key, response)
+
+    return response, 200
+
+def split_shipment_response(order: Order, req_model: OptimizeRequest, model,
+                            whs: WarehouseSnapshot, cache: WarehouseCache,
+                            seed: int, timer=NULL_TIMER) -> Tuple[dict, int]:
+    """
+    /optimize with allow_split when no single warehouse has order.quantity:
+    the cheapest combination of up to max_shipments partial shipments
+    (split_shipment.py), each with its route and predicted cost.
+    """
+    if req_model.k_nearest is not None or req_model.max_radius is not None:
+        whs = whs.subset(cache.index.nearest_in(
+            whs, order.latitude, order.longitude,
+            k=req_model.k_nearest,
+            max_radius=req_model.max_radius
+        ))
+    whs = whs.subset(np.flatnonzero(whs.inventories > 0))
+    timer.mark("shortlist")
+
+    cands = generate_candidates(
+        order=order,
+        warehouse_ids=whs.ids,
+        warehouse_lats=whs.latitudes,
+        warehouse_lons=whs.longitudes,
+        warehouse_inventories=whs.inventories,
+        num_routes=5,
+        rng=np.random.default_rng(seed)
+    )
+    timer.mark("candidates")
+    plan = solve_split(model, order, cands, max_shipments=req_model.max_shipments)
+    timer.mark("split")
+
+    if plan is None:
+        return {"error": f"Not enough inventory to split across {req_model.max_shipments} "
+                         f"warehouses."}, 400
+    if plan.total_cost >= 999999:
+        return {"error":"All routes penalized; none feasible."}, 400
+
+    rows = np.array([s.row for s in plan.shipments])
+    costs = np.zeros(len(cands))
+    costs[rows] = [s.cost for s in plan.shipments]
+    shipments = routes_to_response(cands, costs, rows=rows)
+    for shipment, s in zip(shipments, plan.shipments):
+        shipment["quantity"] = round(s.quantity, 3)
+    timer.mark("serialize")
+    return {"split_shipment": {
+        "quantity": order.quantity,
+        "total_cost": round(plan.total_cost, 3),
+        "shipments": shipments,
+        "solve_ms": round(plan.solve_seconds * 1000.0, 3)
+    }}, 200
+
+def optimize_orders(raw_orders: list, model, whs: WarehouseSnapshot) -> list:
+    """
+    Validates and scores a list of raw order dicts against one snapshot.
+    Returns one result per order, in order, with "index" = position in raw_orders.
+    """
+    results = [None] * len(raw_orders)
+    orders = []
+    positions = []
+    for i, raw in enumerate(raw_orders):
+        if not isinstance(raw, dict):
+            results[i] = {"index": i, "error": "Order must be a JSON object."}
+            continue
+        try:
+            req_model = BulkOrderRequest(**raw)
+        except ValidationError as e:
+            results[i] = {"index": i, "validation_error": json.loads(e.json())}
+            continue
+        orders.append(order_from_request(req_model))
+        positions.append(i)
+
+    max_inventory = whs.inventories.max() if len(whs) else -np.inf
+
+    feasible_orders = []
+    feasible_positions = []
+    for order, i in zip(orders, positions):
+        if order.quantity > max_inventory:
+            results[i] = {"index": i, "error": "Not enough inventory in all warehouses."}
+        else:
+            feasible_orders.append(order)
+            feasible_positions.append(i)
+
+    if feasible_orders:
+        scorer = parallel_scorer()
+        if scorer is not None and len(feasible_orders) >= PARALLEL_MIN_ORDERS:
+            best = scorer.score(feasible_orders, whs, model)
+        else:
+            best = score_orders(
+                orders=feasible_orders,
+                warehouse_ids=whs.ids,
+                warehouse_lats=whs.latitudes,
+                warehouse_lons=whs.longitudes,
+                warehouse_inventories=whs.inventories,
+                model=model,
+                num_routes=5
+            )
+        best_routes = selection_to_response(whs.ids, best)
+        for i, cost, route in zip(feasible_positions, best.cost.tolist(), best_routes):
+            if cost >= 999999:
+                results[i] = {"index": i, "error": "All routes penalized; none feasible."}
+            else:
+                results[i] = {"index": i, "best_route": route}
+
+    return results
+
+def optimize_batch_request(raw_data, model, cache: WarehouseCache,
+                           snapshot: Optional[WarehouseSnapshot] = None) -> Tuple[dict, int]:
+    """
+    Accepts a JSON array of orders (or {"orders": [...]}), each shaped like the
+    /optimize body. Returns {"results": [...]} in input order, one entry per
+    order with either "best_route" or an inline "validation_error"/"error".
+    Large batches go to the process pool when PARALLEL_WORKERS is set.
+    """
+    raw_orders = raw_data.get("orders") if isinstance(raw_data, dict) else raw_data
+    if not isinstance(raw_orders, list) or not raw_orders:
+        return {"error":"Expected a non-empty JSON array of orders."}, 400
+    if len(raw_orders) > MAX_BATCH_ORDERS:
+        return {"error":f"At most {MAX_BATCH_ORDERS} orders per batch."}, 413
+
+    whs = snapshot if snapshot is not None else cache.get()
+    return {"results": optimize_orders(raw_orders, model, whs)}, 200
+
+def vrp_request(raw_data, cache: WarehouseCache,
+                snapshot: Optional[WarehouseSnapshot] = None) -> Tuple[dict, int]:
+    """
+    Batches a set of orders onto multi-stop vehicle routes out of the warehouses.
+    Order indices in the response refer to positions in the request's "orders".
+    """
+    if not raw_data:
+        return {"error":"No JSON body provided"}, 400
+    orders = raw_data.get("orders") if isinstance(raw_data, dict) else None
+    if isinstance(orders, list) and len(orders) > MAX_BATCH_ORDERS:
+        return {"error":f"At most {MAX_BATCH_ORDERS} orders per request."}, 413
+
+    try:
+        req_model = VRPRequest(**raw_data)
+    except ValidationError as e:
+        return {"validation_error": json.loads(e.json())}, 400
+
+    whs = snapshot if snapshot is not None else cache.get()
+    if not len(whs):
+        return {"error":"No warehouses available."}, 400
+
+    solver = VRPSolver(
+        orders=[order_from_request(o) for o in req_model.orders],
+        warehouse_lats=whs.latitudes,
+        warehouse_lons=whs.longitudes,
+        warehouse_inventories=whs.inventories,
+        vehicle_capacity=req_model.vehicle_capacity,
+        speed=req_model.speed,
+        service_time=req_model.service_time,
+        start_time=req_model.start_time,
+        time_budget_s=req_model.time_budget_ms / 1000.0
+    )
+    solution = solver.solve()
+
+    routes = []
+    for r in solution.routes:
+        routes.append({
+            "warehouse_id": int(whs.ids[r.depot]),
+            "order_indices": r.stops,
+            "arrival_times": [round(t, 3) for t in solver.schedule(r.depot, r.stops)],
+            "load": round(float(solver.quantity[r.stops].sum()), 2),
+            "distance": round(solver.route_distance(r.depot, r.stops), 3)
+        })
+    return {
+        "routes": routes,
+        "unassigned": solution.unassigned,
+        "total_distance": round(solution.total_distance, 3),
+        "vehicles": len(routes),
+        "solve_ms": round(solution.solve_seconds * 1000.0, 2)
+    }, 200
+
+def feedback_request(raw_data, learner: OnlineLearner) -> Tuple[dict, int]:
+    """
+    Observed delivery costs ({"observations": [...]} or a bare array) for
+    routes returned earlier; updates the live cost model (online_learning.py).
+    """
+    observations = raw_data if isinstance(raw_data, list) else (raw_data or {}).get("observations")
+    if not isinstance(observations, list) or not observations:
+        return {"error":"Expected a non-empty JSON array of observations."}, 400
+    if len(observations) > MAX_BATCH_ORDERS:
+        return {"error":f"At most {MAX_BATCH_ORDERS} observations per request."}, 413
+
+    try:
+        req_model = FeedbackRequest(observations=observations)
+    except ValidationError as e:
+        return {"validation_error": json.loads(e.json())}, 400
+
+    X = np.array([[o.distance, o.time_window_start, o.time_window_end,
+                   o.traffic, o.inventory, o.quantity] for o in req_model.observations])
+    y = np.array([o.actual_cost for o in req_model.observations])
+    try:
+        return learner.ingest(X, y), 200
+    except OnlineUnsupported as e:
+        return {"error": str(e)}, 409
+
+def warehouse_upsert_request(content_type: Optional[str], body: bytes,
+                             cache: WarehouseCache) -> Tuple[dict, int]:
+    """
+    Bulk warehouse/inventory feed: CSV (Content-Type: text/csv) or a JSON array
+    (or {"rows": [...]}). All rows are applied in one transaction, or none if
+    any is invalid.
+    """
+    mimetype = (content_type or "").split(";")[0].strip().lower()
+    try:
+        text = body.decode("utf-8")
+        if mimetype == "text/csv":
+            rows = rows_from_csv(text)
+        else:
+            data = json.loads(text)
+            rows = data.get("rows") if isinstance(data, dict) else data
+    except ValueError:
+        return {"error":"Body must be UTF-8 JSON, or CSV with Content-Type: text/csv."}, 400
+    if not isinstance(rows, list) or not rows:
+        return {"error":"Expected a non-empty list of warehouse rows."}, 400
+    if len(rows) > MAX_UPSERT_ROWS:
+        return {"error":f"At most {MAX_UPSERT_ROWS} rows per request."}, 413
+
+    try:
+        return upsert_warehouses(rows, cache=cache), 200
+    except UpsertError as e:
+        return {"error": str(e), "errors": e.errors[:100]}, 400
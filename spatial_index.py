@@ -0,0 +1,216 @@
+"""
+spatial_index.py
+
+Uniform grid over warehouse coordinates for nearest-warehouse lookups.
+Each warehouse lives in one (lat, lon) cell; a query scans rings of cells
+around the order until the k nearest feasible (inventory >= quantity)
+warehouses are known or the ring passes max_radius.
+
+Distances use route_optimizer._compute_distance (haversine km), so
+max_radius is in km like route distances. Updates are incremental: upsert()/remove()
+only touch the affected cell, and sync() applies the diff against a
+WarehouseSnapshot. The index records the snapshot version it matches;
+nearest_in() answers from the grid only for that version and scans an older
+(or newer) snapshot's arrays directly.
+"""
+
+import heapq
+import math
+import threading
+import numpy as np
+from typing import Dict, List, Optional, Set, Tuple
+
+from distance import KM_PER_DEGREE
+from route_optimizer import _compute_distance, _compute_distances
+
+DEFAULT_CELL_SIZE = 0.05
+
+class GridIndex:
+    """
+    points: id -> (lat, lon, inventory)
+    cells:  (row, col) -> set of ids
+    """
+    def __init__(self, cell_size: float = DEFAULT_CELL_SIZE):
+        self.cell_size = cell_size
+        self.points: Dict[int, Tuple[float, float, float]] = {}
+        self.cells: Dict[Tuple[int, int], Set[int]] = {}
+        self._max_abs_lat = 0.0
+        # snapshot version the points were last brought in line with
+        self.version: Optional[int] = None
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return (math.floor(lat / self.cell_size), math.floor(lon / self.cell_size))
+
+    def upsert(self, warehouse_id: int, lat: float, lon: float, inventory: float) -> None:
+        with self._lock:
+            old = self.points.get(warehouse_id)
+            new_cell = self._cell(lat, lon)
+            if old is not None:
+                old_cell = self._cell(old[0], old[1])
+                if old_cell != new_cell:
+                    self._discard(old_cell, warehouse_id)
+            self.points[warehouse_id] = (lat, lon, inventory)
+            self.cells.setdefault(new_cell, set()).add(warehouse_id)
+            self._max_abs_lat = max(self._max_abs_lat, abs(lat))
+
+    def remove(self, warehouse_id: int) -> None:
+        with self._lock:
+            old = self.points.pop(warehouse_id, None)
+            if old is not None:
+                self._discard(self._cell(old[0], old[1]), warehouse_id)
+
+    def _discard(self, cell: Tuple[int, int], warehouse_id: int) -> None:
+        members = self.cells.get(cell)
+        if members is not None:
+            members.discard(warehouse_id)
+            if not members:
+                del self.cells[cell]
+
+    def sync(self, snapshot) -> int:
+        """
+        Brings the index in line with a WarehouseSnapshot, touching only rows
+        that were added, moved, changed inventory or disappeared.
+        Returns the number of changed rows.
+        """
+        changed = 0
+        with self._lock:
+            seen = set()
+            for wid, lat, lon, inv in zip(snapshot.ids.tolist(),
+                                          snapshot.latitudes.tolist(),
+                                          snapshot.longitudes.tolist(),
+                                          snapshot.inventories.tolist()):
+                seen.add(wid)
+                if self.points.get(wid) != (lat, lon, inv):
+                    self.upsert(wid, lat, lon, inv)
+                    changed += 1
+            for wid in [w for w in self.points if w not in seen]:
+                self.remove(wid)
+                changed += 1
+            self.version = snapshot.version
+        return changed
+
+    def upsert_many(self, points, version: int) -> None:
+        """
+        Upserts (id, lat, lon, inventory) rows and marks the index as matching
+        snapshot `version`, atomically for readers.
+        """
+        with self._lock:
+            for wid, lat, lon, inv in points:
+                self.upsert(wid, lat, lon, inv)
+            self.version = version
+
+    def nearest(self,
+                lat: float,
+                lon: float,
+                k: Optional[int] = None,
+                max_radius: Optional[float] = None,
+                min_inventory: float = 0.0
+    ) -> List[int]:
+        """
+        Ids of the k nearest warehouses with inventory >= min_inventory,
+        closest first. k=None returns every match within max_radius
+        (or every match at all if max_radius is None too).
+        """
+        with self._lock:
+            if not self.cells:
+                return []
+            rows = [c[0] for c in self.cells]
+            cols = [c[1] for c in self.cells]
+            r0, c0 = self._cell(lat, lon)
+            max_ring = max(abs(r0 - min(rows)), abs(r0 - max(rows)),
+                           abs(c0 - min(cols)), abs(c0 - max(cols)))
+
+            # a cell step is at least this many km anywhere between the query and the points
+            km_per_cell = (self.cell_size * KM_PER_DEGREE
+                           * math.cos(math.radians(min(89.0, max(self._max_abs_lat, abs(lat))))))
+            found: List[Tuple[float, int]] = []
+            ring = 0
+            while ring <= max_ring:
+                for cell in self._ring_cells(r0, c0, ring):
+                    for wid in self.cells.get(cell, ()):
+                        wlat, wlon, inv = self.points[wid]
+                        if inv < min_inventory:
+                            continue
+                        d = _compute_distance(lat, lon, wlat, wlon)
+                        if max_radius is not None and d > max_radius:
+                            continue
+                        found.append((d, wid))
+                # anything outside this ring is at least ring cells away
+                covered = ring * km_per_cell
+                if max_radius is not None and covered > max_radius:
+                    break
+                if k is not None and len(found) >= k and heapq.nsmallest(k, found)[-1][0] <= covered:
+                    break
+                ring += 1
+
+            ordered = sorted(found)
+            if k is not None:
+                ordered = ordered[:k]
+            return [wid for _, wid in ordered]
+
+    def nearest_in(self,
+                   snapshot,
+                   lat: float,
+                   lon: float,
+                   k: Optional[int] = None,
+                   max_radius: Optional[float] = None,
+                   min_inventory: float = 0.0
+    ) -> np.ndarray:
+        """
+        Row positions in `snapshot` of nearest() for that snapshot, closest
+        first. The index is shared and updated in place, so a request holding
+        an older snapshot is answered by scanning the snapshot's arrays.
+        """
+        with self._lock:
+            if self.version == snapshot.version:
+                return positions_of(snapshot, self.nearest(lat, lon, k=k, max_radius=max_radius,
+                                                           min_inventory=min_inventory))
+        return nearest_positions(snapshot, lat, lon, k=k, max_radius=max_radius,
+                                 min_inventory=min_inventory)
+
+    def _ring_cells(self, r0: int, c0: int, ring: int):
+        if ring == 0:
+            yield (r0, c0)
+            return
+        for dc in range(-ring, ring + 1):
+            yield (r0 - ring, c0 + dc)
+            yield (r0 + ring, c0 + dc)
+        for dr in range(-ring + 1, ring):
+            yield (r0 + dr, c0 - ring)
+            yield (r0 + dr, c0 + ring)
+
+def build_index(snapshot, cell_size: float = DEFAULT_CELL_SIZE) -> GridIndex:
+    index = GridIndex(cell_size=cell_size)
+    index.sync(snapshot)
+    return index
+
+def positions_of(snapshot, warehouse_ids: List[int]) -> np.ndarray:
+    """
+    Row positions of warehouse_ids inside a snapshot (ids are sorted).
+    The index is shared and updated in place, so it can hold ids that an
+    older snapshot doesn't have; those are dropped.
+    """
+    ids = np.asarray(warehouse_ids, dtype=np.int64)
+    pos = np.searchsorted(snapshot.ids, ids)
+    found = pos < len(snapshot.ids)
+    found[found] = snapshot.ids[pos[found]] == ids[found]
+    return pos[found]
+
+def nearest_positions(snapshot, lat: float, lon: float, k: Optional[int] = None,
+                      max_radius: Optional[float] = None,
+                      min_inventory: float = 0.0) -> np.ndarray:
+    """
+    Vectorized GridIndex.nearest over a snapshot's arrays, returning row
+    positions (ties broken by id like the grid).
+    """
+    d = _compute_distances(lat, lon, snapshot.latitudes, snapshot.longitudes)
+    ok = snapshot.inventories >= min_inventory
+    if max_radius is not None:
+        ok &= d <= max_radius
+    pos = np.flatnonzero(ok)
+    pos = pos[np.argsort(d[pos], kind="stable")]
+    return pos[:k] if k is not None else pos
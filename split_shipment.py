@@ -0,0 +1,170 @@
+"""
+split_shipment.py
+
+Split-shipment fulfillment: when no single warehouse holds the order
+quantity, the order ships in parts from up to max_shipments warehouses.
+
+Every shipment is scored with the live cost model like a single-warehouse
+route: the warehouse's cheapest candidate route (distance, traffic) with
+requested_qty = the quantity shipped from it, so shipments never exceed a
+warehouse's inventory and no shortfall penalty applies. The plan minimizes
+the sum of the shipment costs, which makes it a covering knapsack. Instead of
+enumerating combinations the solver is bounded:
+
+ - only the max_candidates warehouses with the lowest cost per unit they can
+   cover are considered
+ - a greedy pass repeatedly ships from the warehouse with the lowest cost per
+   unit of the remaining quantity, among those that still leave the rest
+   coverable within the remaining shipments (one vectorized predict per step)
+ - the greedy pass is rerun with each of the beam_width best first choices
+   forced, and the cheapest plan wins; reruns stop at time_budget_s
+
+so one solve costs at most beam_width * max_shipments model calls over
+max_candidates rows.
+"""
+
+import time
+import numpy as np
+from typing import List, Optional, Tuple
+
+from route_optimizer import CandidateRoutes, Order, predict_costs
+
+class Shipment:
+    """
+    quantity units from candidate row `row` (one route of one warehouse).
+    """
+    def __init__(self, row: int, quantity: float, cost: float):
+        self.row = row
+        self.quantity = quantity
+        self.cost = cost
+
+class SplitPlan:
+    def __init__(self,
+                 shipments: List[Shipment],
+                 total_cost: float,
+                 solve_seconds: float,
+                 evaluations: int):
+        self.shipments = shipments
+        self.total_cost = total_cost
+        self.solve_seconds = solve_seconds
+        self.evaluations = evaluations
+
+class SplitSolver:
+    """
+    Warehouses are the distinct warehouse_idx of `cands` (generate_candidates
+    for one order); their inventory is taken from the candidate rows.
+    """
+    def __init__(self,
+                 model,
+                 order: Order,
+                 cands: CandidateRoutes,
+                 max_shipments: int = 5,
+                 max_candidates: int = 64,
+                 beam_width: int = 8,
+                 time_budget_s: float = 0.005):
+        self.model = model
+        self.order = order
+        self.quantity = float(order.quantity)
+        self.max_shipments = max_shipments
+        self.beam_width = beam_width
+        self.time_budget_s = time_budget_s
+        self.evaluations = 0
+
+        n_wh = len(cands.warehouse_ids)
+        X = cands.feature_matrix(order)
+        inventory = X[:, 4]
+        X[:, 5] = np.minimum(inventory, self.quantity)
+        costs = self._predict(X)
+        # cheapest route per warehouse at the quantity it would ship on its own
+        best = costs.reshape(n_wh, cands.num_routes).argmin(axis=1) + np.arange(n_wh) * cands.num_routes
+        best = best[inventory[best] > 0]
+        unit_cost = costs[best] / X[best, 5]
+        keep = np.argsort(unit_cost, kind="stable")[:max_candidates]
+
+        self.rows = best[keep]
+        self.features = X[self.rows]
+        self.inventory = inventory[self.rows]
+
+    def _predict(self, X: np.ndarray) -> np.ndarray:
+        self.evaluations += X.shape[0]
+        return predict_costs(self.model, X)
+
+    def _costs(self, candidates: np.ndarray, quantities: np.ndarray) -> np.ndarray:
+        X = self.features[candidates].copy()
+        X[:, 5] = quantities
+        return self._predict(X)
+
+    def _step(self, available: np.ndarray, remaining: float,
+              slots: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Candidates that can ship next, their quantities and cost per unit.
+        A candidate qualifies if the slots - 1 largest other inventories can
+        still cover what it leaves over.
+        """
+        candidates = np.flatnonzero(available)
+        inv = self.inventory[candidates]
+        q = np.minimum(inv, remaining)
+        order = np.argsort(-inv, kind="stable")
+        prefix = np.concatenate([[0.0], np.cumsum(inv[order])])
+        k = min(slots - 1, len(inv))
+        rank = np.empty(len(inv), dtype=int)
+        rank[order] = np.arange(len(inv))
+        others = np.where(rank < k, prefix[min(k + 1, len(inv))] - inv, prefix[k])
+        ok = q + others >= remaining - 1e-9
+        candidates, q = candidates[ok], q[ok]
+        if not len(candidates):
+            return candidates, q, np.empty(0)
+        return candidates, q, self._costs(candidates, q) / q
+
+    def _greedy(self, first: Optional[int] = None) -> Optional[Tuple[float, List[Tuple[int, float, float]]]]:
+        available = np.ones(len(self.rows), dtype=bool)
+        remaining = self.quantity
+        picks: List[Tuple[int, float, float]] = []
+        while remaining > 1e-9:
+            slots = self.max_shipments - len(picks)
+            if slots <= 0:
+                return None
+            candidates, q, unit = self._step(available, remaining, slots)
+            if not len(candidates):
+                return None
+            j = int(np.argmin(unit))
+            if first is not None and not picks:
+                hits = np.flatnonzero(candidates == first)
+                if not len(hits):
+                    return None
+                j = int(hits[0])
+            c = int(candidates[j])
+            picks.append((c, float(q[j]), float(unit[j] * q[j])))
+            available[c] = False
+            remaining -= float(q[j])
+        return sum(p[2] for p in picks), picks
+
+    def solve(self) -> Optional[SplitPlan]:
+        """
+        Cheapest plan found, or None if the candidates cannot cover the
+        quantity within max_shipments.
+        """
+        t0 = time.perf_counter()
+        deadline = t0 + self.time_budget_s
+        if not len(self.rows) or self.inventory.sum() < self.quantity - 1e-9:
+            return None
+
+        candidates, _, unit = self._step(np.ones(len(self.rows), dtype=bool),
+                                         self.quantity, self.max_shipments)
+        best = None
+        for first in candidates[np.argsort(unit, kind="stable")[:self.beam_width]].tolist():
+            plan = self._greedy(first)
+            if plan is not None and (best is None or plan[0] < best[0]):
+                best = plan
+            if time.perf_counter() > deadline:
+                break
+        if best is None:
+            return None
+
+        total, picks = best
+        shipments = [Shipment(int(self.rows[c]), q, cost) for c, q, cost in picks]
+        return SplitPlan(shipments, total, time.perf_counter() - t0, self.evaluations)
+
+def solve_split(model, order: Order, cands: CandidateRoutes,
+                max_shipments: int = 5, **options) -> Optional[SplitPlan]:
+    return SplitSolver(model, order, cands, max_shipments=max_shipments, **options).solve()
@@ -0,0 +1,129 @@
+"""
+startup.py
+
+Explicit server startup, shared by app.py (create_app) and asgi_app.py
+(lifespan). Nothing runs at import time; the phases run in order when the
+application is created:
+
+  db      create missing tables
+  seed    STARTUP_SEED=auto (random warehouses only into an empty table, default),
+          always (replace them; also RESEED_WAREHOUSES=1) or never
+  model   STARTUP_MODEL=load_or_train (default: train + save an artifact if none exists)
+          or load (artifact only; startup fails instead of training)
+  warm    STARTUP_WARM=1 (default): load the warehouse snapshot and spatial index
+          and score one throwaway order
+
+With STARTUP_BACKGROUND=1 the phases run in a thread. The server accepts
+connections at once, GET /ready answers 503 until warm-up is done, and the
+model-backed endpoints answer 503 in the meantime. Readiness records every
+phase's duration, or the error that stopped startup.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+class StartupConfig:
+    def __init__(self, seed: Optional[str] = None, model: str = "load_or_train",
+                 warm: bool = True, background: bool = False):
+        from service import DEFAULT_SEED_MODE
+        self.seed = seed or DEFAULT_SEED_MODE
+        self.model = model
+        self.warm = warm
+        self.background = background
+
+    @classmethod
+    def from_env(cls) -> "StartupConfig":
+        return cls(seed=os.environ.get("STARTUP_SEED"),
+                   model=os.environ.get("STARTUP_MODEL", "load_or_train"),
+                   warm=os.environ.get("STARTUP_WARM", "1") == "1",
+                   background=os.environ.get("STARTUP_BACKGROUND", "0") == "1")
+
+    def as_dict(self) -> Dict:
+        return {"seed": self.seed, "model": self.model,
+                "warm": self.warm, "background": self.background}
+
+class Readiness:
+    """
+    Startup progress: phase -> ms once finished; ready after the last phase.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.phases: Dict[str, float] = {}
+        self.current: Optional[str] = None
+        self.ready = False
+        self.error: Optional[str] = None
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        self.seconds: Optional[float] = None
+
+    def run(self, phase: str, fn: Callable):
+        with self._lock:
+            self.current = phase
+        t0 = time.perf_counter()
+        result = fn()
+        with self._lock:
+            self.phases[phase] = round((time.perf_counter() - t0) * 1000.0, 2)
+        return result
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        with self._lock:
+            self.current = None
+            self.seconds = round(time.perf_counter() - self._t0, 3)
+            if error is None:
+                self.ready = True
+            else:
+                self.error = f"{type(error).__name__}: {error}"
+
+    def as_dict(self) -> Dict:
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "phase": self.current,
+                "phases_ms": dict(self.phases),
+                "startup_seconds": self.seconds,
+                "error": self.error
+            }
+
+def run_startup(cache, slot, config: StartupConfig, readiness: Readiness) -> None:
+    """
+    Runs the phases against the warehouse cache and publishes the model into
+    slot (online_learning.ModelSlot). Errors are recorded on readiness and re-raised.
+    """
+    from database import init_db
+    from service import load_serving_model, seed_warehouses, warm_up
+
+    try:
+        readiness.run("db", init_db)
+        readiness.run("seed", lambda: seed_warehouses(config.seed, cache))
+        slot.publish(*readiness.run("model", lambda: load_serving_model(config.model)))
+        if config.warm:
+            readiness.run("warm", lambda: warm_up(slot.live.model, cache))
+    except Exception as e:
+        logger.exception("Startup failed in phase %s.", readiness.current)
+        readiness.finish(e)
+        raise
+    readiness.finish()
+    logger.info("Startup complete in %.3fs: %s", readiness.seconds, readiness.phases)
+
+def start(cache, slot, config: StartupConfig, readiness: Readiness) -> Optional[threading.Thread]:
+    """
+    run_startup inline, or in a daemon thread with config.background.
+    """
+    if not config.background:
+        run_startup(cache, slot, config, readiness)
+        return None
+
+    def target():
+        try:
+            run_startup(cache, slot, config, readiness)
+        except Exception:
+            pass  # recorded on readiness and logged
+
+    thread = threading.Thread(target=target, name="startup", daemon=True)
+    thread.start()
+    return thread
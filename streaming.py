@@ -0,0 +1,236 @@
+"""
+streaming.py
+
+Bulk optimization over order files that don't fit in memory. Orders stream in
+as NDJSON (one /optimize body per line) or CSV (header row with the same field
+names), are validated and scored in chunks of --chunk-size through
+service.optimize_orders, and results stream out as soon as each chunk is done:
+  - ndjson: one /optimize/batch result per line ({"index", "best_route"|"error"|...})
+  - csv:    index,route_id,warehouse_id,distance,traffic,inventory,predicted_cost,error
+
+Only one chunk of orders and its candidate routes (chunk_size x warehouses x
+num_routes rows) are alive at a time, so memory stays flat however long the
+input is. A summary with rows/sec and peak RSS is reported at the end.
+
+   python streaming.py orders.ndjson results.ndjson [--chunk-size 1000]
+   python streaming.py orders.csv - --output-format csv < ...
+
+"-" reads stdin / writes stdout; formats default to the file extensions.
+The same pipeline backs POST /optimize/stream.
+"""
+
+import argparse
+import csv
+import io
+import json
+import logging
+import resource
+import sys
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from service import MAX_BATCH_ORDERS, optimize_orders
+from warehouse_cache import WarehouseCache, WarehouseSnapshot
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 1000
+CSV_COLUMNS = ["index", "route_id", "warehouse_id", "distance", "traffic",
+               "inventory", "predicted_cost", "error"]
+
+def peak_rss_mb() -> float:
+    """
+    High-water mark of this process's resident set (ru_maxrss is KiB on Linux).
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0
+
+def format_for(path: str, default: str = "ndjson") -> str:
+    if path.endswith(".csv"):
+        return "csv"
+    if path.endswith((".ndjson", ".jsonl", ".json")):
+        return "ndjson"
+    return default
+
+class RecordParser:
+    """
+    Turns input lines into raw order dicts (or an error dict for unparseable
+    lines). Keeps the CSV header between calls so lines can arrive in pieces.
+    """
+    def __init__(self, fmt: str = "ndjson"):
+        if fmt not in ("ndjson", "csv"):
+            raise ValueError(f"Unknown stream format {fmt!r}; choose ndjson or csv")
+        self.fmt = fmt
+        self.header: Optional[List[str]] = None
+
+    def parse(self, line: str):
+        """
+        Raw record for one line, or None for blank lines and the CSV header.
+        """
+        line = line.strip()
+        if not line:
+            return None
+        if self.fmt == "ndjson":
+            try:
+                return json.loads(line)
+            except ValueError:
+                return {"_error": "Invalid JSON line."}
+        fields = next(csv.reader([line]))
+        if self.header is None:
+            self.header = [f.strip() for f in fields]
+            return None
+        if len(fields) != len(self.header):
+            return {"_error": f"Expected {len(self.header)} CSV fields, got {len(fields)}."}
+        return {k: v for k, v in zip(self.header, fields) if v != ""}
+
+class StreamJob:
+    """
+    Chunked scoring state shared by the CLI and the HTTP endpoints:
+    process() turns one chunk of raw records into output text, summary()
+    reports totals once the input is exhausted.
+    """
+    def __init__(self, model, cache: WarehouseCache, output_format: str = "ndjson"):
+        if output_format not in ("ndjson", "csv"):
+            raise ValueError(f"Unknown stream format {output_format!r}; choose ndjson or csv")
+        self.model = model
+        self.cache = cache
+        self.output_format = output_format
+        self.rows = 0
+        self.routed = 0
+        self.errors = 0
+        self.chunks = 0
+        self._t0 = time.perf_counter()
+
+    def header(self) -> str:
+        if self.output_format != "csv":
+            return ""
+        return ",".join(CSV_COLUMNS) + "\n"
+
+    def process(self, records: List, snapshot: Optional[WarehouseSnapshot] = None) -> str:
+        whs = snapshot if snapshot is not None else self.cache.get()
+        results = [None] * len(records)
+        valid, positions = [], []
+        for i, rec in enumerate(records):
+            if isinstance(rec, dict) and "_error" in rec:
+                results[i] = {"index": self.rows + i, "error": rec["_error"]}
+            else:
+                valid.append(rec)
+                positions.append(i)
+        if valid:
+            scored = optimize_orders(valid, self.model, whs)
+            for i, res in zip(positions, scored):
+                res["index"] = self.rows + i
+                results[i] = res
+
+        self.rows += len(records)
+        self.chunks += 1
+        n_routed = sum(1 for r in results if "best_route" in r)
+        self.routed += n_routed
+        self.errors += len(results) - n_routed
+        return self._render(results)
+
+    def _render(self, results: List[Dict]) -> str:
+        if self.output_format == "ndjson":
+            return "".join(json.dumps(r) + "\n" for r in results)
+        out = io.StringIO()
+        writer = csv.writer(out, lineterminator="\n")
+        for r in results:
+            route = r.get("best_route")
+            if route is not None:
+                writer.writerow([r["index"], route["route_id"], route["warehouse_id"],
+                                 route["distance"], route["traffic"], route["inventory"],
+                                 route["predicted_cost"], ""])
+            else:
+                error = r.get("error") or json.dumps(r.get("validation_error"))
+                writer.writerow([r["index"], "", "", "", "", "", "", error])
+        return out.getvalue()
+
+    def summary(self) -> Dict:
+        elapsed = time.perf_counter() - self._t0
+        return {
+            "rows": self.rows,
+            "routed": self.routed,
+            "errors": self.errors,
+            "chunks": self.chunks,
+            "seconds": round(elapsed, 3),
+            "rows_per_sec": round(self.rows / elapsed, 1) if elapsed > 0 else 0.0,
+            "peak_rss_mb": round(peak_rss_mb(), 1)
+        }
+
+def iter_chunks(lines: Iterable[str], parser: RecordParser, chunk_size: int) -> Iterator[List]:
+    chunk = []
+    for line in lines:
+        rec = parser.parse(line)
+        if rec is None:
+            continue
+        chunk.append(rec)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def stream_optimize(lines: Iterable[str], job: StreamJob, input_format: str = "ndjson",
+                    chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[str]:
+    """
+    Yields output text chunk by chunk; job.summary() is final once exhausted.
+    """
+    header = job.header()
+    if header:
+        yield header
+    for chunk in iter_chunks(lines, RecordParser(input_format), chunk_size):
+        yield job.process(chunk)
+
+def stream_options(content_type: Optional[str], query) -> Tuple[str, str, int]:
+    """
+    (input_format, output_format, chunk_size) for an HTTP stream request:
+    text/csv bodies are CSV, anything else NDJSON; ?format= and ?chunk_size=
+    pick the output. Raises ValueError for bad values.
+    """
+    mimetype = (content_type or "").split(";")[0].strip().lower()
+    input_format = "csv" if mimetype == "text/csv" else "ndjson"
+    output_format = query.get("format", "ndjson")
+    if output_format not in ("ndjson", "csv"):
+        raise ValueError("format must be ndjson or csv")
+    try:
+        chunk_size = int(query.get("chunk_size", DEFAULT_CHUNK_SIZE))
+    except ValueError:
+        raise ValueError("chunk_size must be an integer")
+    if not 1 <= chunk_size <= MAX_BATCH_ORDERS:
+        raise ValueError(f"chunk_size must be between 1 and {MAX_BATCH_ORDERS}")
+    return input_format, output_format, chunk_size
+
+def media_type(output_format: str) -> str:
+    return "text/csv" if output_format == "csv" else "application/x-ndjson"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("input", help="order file (.ndjson/.csv) or - for stdin")
+    parser.add_argument("output", help="result file (.ndjson/.csv) or - for stdout")
+    parser.add_argument("--input-format", choices=["ndjson", "csv"])
+    parser.add_argument("--output-format", choices=["ndjson", "csv"])
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    from service import initialize
+    from warehouse_cache import warehouse_cache
+    model, _ = initialize(warehouse_cache)
+
+    input_format = args.input_format or format_for(args.input)
+    output_format = args.output_format or format_for(args.output)
+    src = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8", newline="")
+    dst = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8", newline="")
+    job = StreamJob(model, warehouse_cache, output_format=output_format)
+    try:
+        for text in stream_optimize(src, job, input_format, args.chunk_size):
+            dst.write(text)
+    finally:
+        if src is not sys.stdin:
+            src.close()
+        if dst is not sys.stdout:
+            dst.close()
+    print(json.dumps(job.summary()), file=sys.stderr)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
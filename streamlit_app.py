@@ -3,22 +3,56 @@ streamlit_app.py
 
 Streamlit UI that:
  - Takes order input: (lat, lon, time_window_start, time_window_end, quantity)
- - Calls /optimize => gets best_route + all_routes
- - fetches /warehouses => for map
+ - Calls /optimize => gets best_route + the "Routes to show" cheapest routes
+   (top_k, columnar), i.e. only what the table renders
+ - fetches /warehouses => for map, in parallel with /optimize and only in full
+   when the warehouse snapshot changed (api_client.RouteOptimClient, ETag)
  - Displays a table, highlighting best route
+ - Draws warehouses through a client-side marker cluster, so the map stays
+   responsive with thousands of warehouses
  - Uses session_state + callbacks so no flicker
 """
 
+import os
 import streamlit as st
-import requests
 import folium
+from folium.plugins import FastMarkerCluster
 from streamlit_folium import st_folium
 import pandas as pd
 
-BACKEND_OPTIMIZE_URL = "http://127.0.0.1:5000/optimize"
-BACKEND_WAREHOUSES_URL = "http://127.0.0.1:5000/warehouses"
+from api_client import ApiError, RouteOptimClient
 
-def create_map(order_lat, order_lon, chosen_wh_id, wh_data):
+BACKEND_URL = os.environ.get("BACKEND_URL", "http://127.0.0.1:5000")
+
+# one marker per row [lat, lon, popup], built in the browser
+WAREHOUSE_MARKER_CALLBACK = """
+function (row) {
+    var icon = L.AwesomeMarkers.icon({icon: 'home', markerColor: 'red', prefix: 'glyphicon'});
+    var marker = L.marker(new L.LatLng(row[0], row[1]), {icon: icon});
+    marker.bindPopup(row[2]);
+    return marker;
+};
+"""
+
+@st.cache_resource
+def get_client() -> RouteOptimClient:
+    """
+    One pooled client per Streamlit server process, shared by all sessions.
+    """
+    return RouteOptimClient(BACKEND_URL)
+
+def marker_rows(wh_data):
+    return [[w["latitude"], w["longitude"], f"Warehouse #{w['id']} ({w['name']})"]
+            for w in wh_data]
+
+@st.cache_data(max_entries=4)
+def warehouse_markers(etag, _wh_data):
+    """
+    marker_rows, rebuilt only when the warehouse snapshot (its ETag) changes.
+    """
+    return marker_rows(_wh_data)
+
+def create_map(order_lat, order_lon, chosen_wh_id, wh_data, etag=None):
     map_ = folium.Map(location=[order_lat, order_lon], zoom_start=10)
 
     folium.Marker(
@@ -27,24 +61,17 @@ def create_map(order_lat, order_lon, chosen_wh_id, wh_data):
         icon=folium.Icon(color="blue", icon="info-sign")
     ).add_to(map_)
 
-    for w in wh_data:
-        wid = w["id"]
-        wlat = w["latitude"]
-        wlon = w["longitude"]
-        wname = w["name"]
-
-        if wid == chosen_wh_id:
-            folium.Marker(
-                location=[wlat, wlon],
-                popup=f"Chosen Warehouse #{wid} ({wname})",
-                icon=folium.Icon(color="green", icon="star")
-            ).add_to(map_)
-        else:
-            folium.Marker(
-                location=[wlat, wlon],
-                popup=f"Warehouse #{wid} ({wname})",
-                icon=folium.Icon(color="red", icon="home")
-            ).add_to(map_)
+    markers = warehouse_markers(etag, wh_data) if etag else marker_rows(wh_data)
+    FastMarkerCluster([m for m, w in zip(markers, wh_data) if w["id"] != chosen_wh_id],
+                      callback=WAREHOUSE_MARKER_CALLBACK).add_to(map_)
+
+    chosen = next((w for w in wh_data if w["id"] == chosen_wh_id), None)
+    if chosen is not None:
+        folium.Marker(
+            location=[chosen["latitude"], chosen["longitude"]],
+            popup=f"Chosen Warehouse #{chosen['id']} ({chosen['name']})",
+            icon=folium.Icon(color="green", icon="star")
+        ).add_to(map_)
 
     return map_
 
@@ -56,30 +83,23 @@ def on_optimize_click():
         "longitude": st.session_state["lon"],
         "time_window_start": st.session_state["time_window_start"],
         "time_window_end": st.session_state["time_window_end"],
-        "quantity": st.session_state["quantity"]
+        "quantity": st.session_state["quantity"],
+        "top_k": st.session_state["routes_shown"],
+        "route_format": "columnar"
     }
 
+    client = get_client()
     try:
-        resp = requests.post(BACKEND_OPTIMIZE_URL, json=payload, timeout=10)
-        if resp.status_code == 200:
-            data = resp.json()
-            st.session_state["best_route"] = data["best_route"]
-            st.session_state["all_routes"] = data["all_routes"]
-            wh_resp = requests.get(BACKEND_WAREHOUSES_URL, timeout=5)
-            if wh_resp.status_code == 200:
-                st.session_state["warehouses"] = wh_resp.json()
-            else:
-                st.error(f"Failed GET /warehouses: {wh_resp.status_code} {wh_resp.text}")
-                st.session_state["warehouses"] = None
-        else:
-            st.session_state["best_route"] = None
-            st.session_state["all_routes"] = None
-            st.session_state["warehouses"] = None
-            try:
-                err_data = resp.json()
-                st.error(f"Optimization error: {err_data.get('error','Unknown')}")
-            except:
-                st.error(f"Optimization error: status={resp.status_code} {resp.text}")
+        data, warehouses = client.optimize_with_warehouses(payload)
+        st.session_state["best_route"] = data["best_route"]
+        st.session_state["all_routes"] = data["top_routes"]
+        st.session_state["warehouses"] = warehouses
+        st.session_state["warehouses_etag"] = client.warehouses_etag
+    except ApiError as ex:
+        st.session_state["best_route"] = None
+        st.session_state["all_routes"] = None
+        st.session_state["warehouses"] = None
+        st.error(f"Optimization error: {ex}")
     except Exception as ex:
         st.error(f"Error calling /optimize: {ex}")
         st.session_state["best_route"] = None
@@ -97,6 +117,8 @@ def main():
         st.session_state["all_routes"] = None
     if "warehouses" not in st.session_state:
         st.session_state["warehouses"] = None
+    if "warehouses_etag" not in st.session_state:
+        st.session_state["warehouses_etag"] = None
 
     if "lat" not in st.session_state:
         st.session_state["lat"] = 48.14
@@ -108,6 +130,8 @@ def main():
         st.session_state["time_window_end"] = 6.0
     if "quantity" not in st.session_state:
         st.session_state["quantity"] = 75.0
+    if "routes_shown" not in st.session_state:
+        st.session_state["routes_shown"] = 10
 
     st.sidebar.header("Order Details")
     st.session_state["lat"] = st.sidebar.number_input("Latitude", value=st.session_state["lat"])
@@ -115,7 +139,7 @@ def main():
     st.session_state["time_window_start"] = st.sidebar.number_input("Time Window Start", value=st.session_state["time_window_start"])
     st.session_state["time_window_end"] = st.sidebar.number_input("Time Window End", value=st.session_state["time_window_end"])
     st.session_state["quantity"] = st.sidebar.number_input("Quantity", min_value=1.0, value=st.session_state["quantity"], step=1.0)
-
+    st.session_state["routes_shown"] = st.sidebar.number_input("Routes to show", min_value=1, value=st.session_state["routes_shown"], step=1)
 
     st.button("Optimize Route", on_click=on_optimize_click)
 
@@ -125,7 +149,7 @@ def main():
         wh_data = st.session_state["warehouses"]
 
         if all_routes:
-            st.markdown("### All Candidate Routes (Chosen route highlighted)")
+            st.markdown("### Cheapest Candidate Routes (Chosen route highlighted)")
             df = pd.DataFrame(all_routes)
             best_id = best_route["route_id"] if best_route else None
 
@@ -143,9 +167,11 @@ def main():
                 st.session_state["lat"],
                 st.session_state["lon"],
                 chosen_wh_id,
-                wh_data
+                wh_data,
+                etag=st.session_state["warehouses_etag"]
             )
-            st_folium(map_, width=700, height=500)
+            # nothing is read back from the map, so panning doesn't rerun the script
+            st_folium(map_, width=700, height=500, returned_objects=[])
         else:
             st.info("No map to display yet.")
 
@@ -0,0 +1,9 @@
+import os
+import tempfile
+
+# Point the app at a scratch database and artifact directory before any test
+# module imports database.py / model_store.py, so runs never touch (or drain)
+# ./demo_warehouses.db and always start from freshly seeded warehouses.
+_TMP = tempfile.mkdtemp(prefix="route_optim_tests_")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_TMP, 'test_warehouses.db')}")
+os.environ.setdefault("MODEL_ARTIFACT_DIR", os.path.join(_TMP, "model_artifacts"))
@@ -0,0 +1,71 @@
+import sys
+import os
+import pytest
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+pytest.importorskip("requests")
+from api_client import ApiError, RouteOptimClient
+
+ORDER = {"latitude": 48.14, "longitude": 11.58, "time_window_start": 2.0,
+         "time_window_end": 6.0, "quantity": 1}
+
+class _Response:
+    def __init__(self, status_code, payload=None, headers=None):
+        self.status_code = status_code
+        self.payload = payload
+        self.headers = headers or {}
+        self.text = str(payload)
+
+    def json(self):
+        if self.payload is None:
+            raise ValueError("no body")
+        return self.payload
+
+class _FakeSession:
+    """
+    /warehouses answers 304 when If-None-Match matches the current ETag.
+    """
+    def __init__(self):
+        self.etag = 'W/"a-1"'
+        self.rows = [{"id": 1, "name": "W1", "latitude": 48.1, "longitude": 11.5, "inventory": 10.0}]
+        self.requests = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.requests.append(("GET", url, dict(headers or {})))
+        if (headers or {}).get("If-None-Match") == self.etag:
+            return _Response(304, headers={"ETag": self.etag})
+        return _Response(200, list(self.rows), {"ETag": self.etag})
+
+    def post(self, url, json=None, timeout=None):
+        self.requests.append(("POST", url, json))
+        if json["quantity"] > 10:
+            return _Response(400, {"error": "Not enough inventory in all warehouses."})
+        return _Response(200, {"best_route": {"warehouse_id": 1}})
+
+    def close(self):
+        pass
+
+def test_warehouses_revalidate_with_etag():
+    session = _FakeSession()
+    with RouteOptimClient("http://api/", session=session) as api:
+        first = api.warehouses()
+        assert api.warehouses() is first
+        assert session.requests[-1][2] == {"If-None-Match": 'W/"a-1"'}
+
+        session.etag = 'W/"a-2"'
+        session.rows.append(dict(session.rows[0], id=2))
+        assert len(api.warehouses()) == 2
+        assert api.warehouses_etag == 'W/"a-2"'
+        assert api.stats()["warehouse_hits"] == 1 and api.stats()["warehouse_misses"] == 2
+        assert session.requests[0][1] == "http://api/warehouses"
+
+def test_optimize_with_warehouses_and_errors():
+    session = _FakeSession()
+    with RouteOptimClient("http://api", session=session) as api:
+        result, warehouses = api.optimize_with_warehouses(ORDER, top_k=3)
+        assert result["best_route"]["warehouse_id"] == 1 and len(warehouses) == 1
+        assert ("POST", "http://api/optimize", dict(ORDER, top_k=3)) in session.requests
+
+        with pytest.raises(ApiError) as err:
+            api.optimize(dict(ORDER, quantity=50))
+        assert err.value.status == 400
+        assert "Not enough inventory" in str(err.value)
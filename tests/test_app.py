@@ -4,6 +4,31 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from app import app as flask_app
+from database import SessionLocal
+from models import Warehouse
+from result_cache import result_cache
+from warehouse_cache import warehouse_cache
+
+@pytest.fixture
+def seeded():
+    """
+    Replaces the warehouses with three well-stocked ones around the test order.
+    """
+    session = SessionLocal()
+    try:
+        session.query(Warehouse).delete()
+        session.add_all([
+            Warehouse(name="Near", latitude=48.141, longitude=11.581, inventory=400.0),
+            Warehouse(name="Mid", latitude=48.20, longitude=11.60, inventory=400.0),
+            Warehouse(name="Far", latitude=48.30, longitude=11.70, inventory=400.0),
+        ])
+        session.commit()
+    finally:
+        session.close()
+    warehouse_cache.invalidate()
+    yield
+    warehouse_cache.invalidate()
+
 @pytest.fixture
 def client():
     """
@@ -47,6 +72,18 @@ def test_optimize_success(client):
     assert isinstance(data["all_routes"], list)
     assert "predicted_cost" in data["best_route"]
 
+def test_metrics_reports_optimize_stages(client):
+    client.post("/optimize",
+                data=json.dumps({"latitude": 48.14, "longitude": 11.58, "time_window_start": 2.0,
+                                 "time_window_end": 6.0, "quantity": 1}),
+                content_type="application/json")
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    text = resp.get_data(as_text=True)
+    assert 'endpoint="optimize",stage="parse"' in text
+    assert 'endpoint="optimize",stage="validate"' in text
+    assert "route_optim_warehouse_cache_hits" in text
+
 def test_optimize_missing_field(client):
     """
     Missing a required field (time_window_end) => should fail with 400
@@ -89,3 +126,411 @@ def test_optimize_insufficient_inventory(client):
         assert resp.status_code == 400
         data = resp.get_json()
         assert "error" in data
+
+def test_optimize_batch_reports_errors_inline(client):
+    """
+    POST /optimize/batch scores valid orders and reports bad ones per index.
+    """
+    good = {
+        "latitude": 48.14,
+        "longitude": 11.58,
+        "time_window_start": 2.0,
+        "time_window_end": 6.0,
+        "quantity": 1
+    }
+    bad = dict(good, time_window_end=1.0)
+    resp = client.post("/optimize/batch",
+                       data=json.dumps({"orders": [good, bad, good]}),
+                       content_type="application/json")
+    assert resp.status_code == 200
+    results = resp.get_json()["results"]
+    assert [r["index"] for r in results] == [0, 1, 2]
+    assert "validation_error" in results[1]
+    for r in (results[0], results[2]):
+        assert "best_route" in r or "error" in r
+        if "best_route" in r:
+            assert "predicted_cost" in r["best_route"]
+
+def test_optimize_batch_reports_malformed_order_inline(client):
+    good = {
+        "latitude": 48.14,
+        "longitude": 11.58,
+        "time_window_start": 2.0,
+        "time_window_end": 6.0,
+        "quantity": 1
+    }
+    malformed = {k: v for k, v in good.items() if k != "time_window_start"}
+    resp = client.post("/optimize/batch",
+                       data=json.dumps({"orders": [good, malformed]}),
+                       content_type="application/json")
+    assert resp.status_code == 200
+    results = resp.get_json()["results"]
+    assert "validation_error" in results[1]
+    assert "validation_error" not in results[0]
+
+def test_optimize_batch_rejects_empty_body(client):
+    resp = client.post("/optimize/batch",
+                       data=json.dumps([]),
+                       content_type="application/json")
+    assert resp.status_code == 400
+    assert "error" in resp.get_json()
+
+def test_optimize_stream_returns_one_line_per_order(client):
+    """
+    POST /optimize/stream answers every NDJSON line in order, then a summary.
+    """
+    order = {
+        "latitude": 48.14,
+        "longitude": 11.58,
+        "time_window_start": 2.0,
+        "time_window_end": 6.0,
+        "quantity": 1
+    }
+    body = "\n".join([json.dumps(order), "{not json", json.dumps(order)] * 3) + "\n"
+    resp = client.post("/optimize/stream?chunk_size=4", data=body,
+                       content_type="application/x-ndjson")
+    assert resp.status_code == 200
+    lines = [json.loads(l) for l in resp.get_data(as_text=True).splitlines()]
+    results, summary = lines[:-1], lines[-1]["summary"]
+    assert [r["index"] for r in results] == list(range(9))
+    assert results[1]["error"] == "Invalid JSON line."
+    assert summary["rows"] == 9 and summary["chunks"] == 3
+    assert summary["peak_rss_mb"] > 0
+
+def test_optimize_stream_rejects_bad_format(client):
+    resp = client.post("/optimize/stream?format=xml", data="",
+                       content_type="application/x-ndjson")
+    assert resp.status_code == 400
+
+def test_optimize_k_nearest_limits_scored_warehouses(client, seeded):
+    """
+    With k_nearest=1 only one warehouse (the nearest with enough stock) is scored.
+    """
+    payload = {
+        "latitude": 48.14,
+        "longitude": 11.58,
+        "time_window_start": 2.0,
+        "time_window_end": 6.0,
+        "quantity": 1,
+        "k_nearest": 1
+    }
+    resp = client.post("/optimize",
+                       data=json.dumps(payload),
+                       content_type="application/json")
+    assert resp.status_code == 200
+    routes = resp.get_json()["all_routes"]
+    assert len(routes) == 5
+    whs = {w["name"]: w["id"] for w in client.get("/warehouses").get_json()}
+    assert {r["warehouse_id"] for r in routes} == {whs["Near"]}
+
+def test_vrp_batches_orders_onto_vehicles(client):
+    order = {
+        "latitude": 48.14,
+        "longitude": 11.58,
+        "time_window_start": 0.0,
+        "time_window_end": 24.0,
+        "quantity": 1
+    }
+    payload = {"orders": [order, dict(order, latitude=48.15), dict(order, longitude=11.60)],
+               "vehicle_capacity": 10}
+    resp = client.post("/vrp",
+                       data=json.dumps(payload),
+                       content_type="application/json")
+    assert resp.status_code == 200
+    data = resp.get_json()
+    served = sorted(i for r in data["routes"] for i in r["order_indices"])
+    assert sorted(served + data["unassigned"]) == [0, 1, 2]
+
+def test_vrp_rejects_oversized_batches(client):
+    from schemas import MAX_BATCH_ORDERS
+    order = {
+        "latitude": 48.14,
+        "longitude": 11.58,
+        "time_window_start": 0.0,
+        "time_window_end": 24.0,
+        "quantity": 1
+    }
+    payload = {"orders": [order] * (MAX_BATCH_ORDERS + 1), "vehicle_capacity": 10}
+    resp = client.post("/vrp", data=json.dumps(payload), content_type="application/json")
+    assert resp.status_code == 413
+    assert "error" in resp.get_json()
+
+def test_optimize_reserve_decrements_inventory(client, seeded):
+    payload = {
+        "latitude": 48.14,
+        "longitude": 11.58,
+        "time_window_start": 2.0,
+        "time_window_end": 6.0,
+        "quantity": 1,
+        "reserve": True
+    }
+    resp = client.post("/optimize",
+                       data=json.dumps(payload),
+                       content_type="application/json")
+    assert resp.status_code == 200
+    data = resp.get_json()
+    reservation = data["reservation"]
+    assert reservation["remaining_inventory"] == 399.0
+    assert reservation["warehouse_id"] == data["best_route"]["warehouse_id"]
+    whs = {w["id"]: w for w in client.get("/warehouses").get_json()}
+    assert round(whs[reservation["warehouse_id"]]["inventory"], 2) == reservation["remaining_inventory"]
+    assert client.get("/reservations/stats").get_json()["reserved"] >= 1
+
+def test_bulk_endpoints_reject_single_order_options(client, seeded):
+    order = {
+        "latitude": 48.14,
+        "longitude": 11.58,
+        "time_window_start": 2.0,
+        "time_window_end": 6.0,
+        "quantity": 1
+    }
+    resp = client.post("/optimize/batch",
+                       data=json.dumps([dict(order, reserve=True), dict(order, k_nearest=1),
+                                        dict(order, top_k=2), dict(order, route_format="columnar")]),
+                       content_type="application/json")
+    results = resp.get_json()["results"]
+    assert all("validation_error" in r for r in results)
+
+    resp = client.post("/vrp",
+                       data=json.dumps({"orders": [dict(order, reserve=True)], "vehicle_capacity": 10}),
+                       content_type="application/json")
+    assert resp.status_code == 400 and "validation_error" in resp.get_json()
+
+def test_repeated_optimize_is_served_from_result_cache(client, seeded):
+    payload = {
+        "latitude": 48.14,
+        "longitude": 11.58,
+        "time_window_start": 2.0,
+        "time_window_end": 6.0,
+        "quantity": 3
+    }
+    first = client.post("/optimize", data=json.dumps(payload), content_type="application/json")
+    hits = client.get("/optimize/cache").get_json()["hits"]
+    # same quantized order -> cache hit with an identical answer
+    again = client.post("/optimize", data=json.dumps(dict(payload, latitude=48.140001)),
+                        content_type="application/json")
+    assert first.status_code == again.status_code == 200
+    assert again.get_json() == first.get_json()
+    assert client.get("/optimize/cache").get_json()["hits"] == hits + 1
+
+    # requested_qty is a model feature: another quantity in the same band is
+    # a miss, and its cached answer matches a fresh one
+    other = dict(payload, quantity=2.5)
+    cached = client.post("/optimize", data=json.dumps(other), content_type="application/json")
+    assert client.get("/optimize/cache").get_json()["hits"] == hits + 1
+    cached = client.post("/optimize", data=json.dumps(other), content_type="application/json")
+    assert client.get("/optimize/cache").get_json()["hits"] == hits + 2
+    result_cache.clear()
+    fresh = client.post("/optimize", data=json.dumps(other), content_type="application/json")
+    assert cached.get_json() == fresh.get_json()
+
+    # an inventory change publishes a new snapshot version, which invalidates the cache
+    warehouse_cache.apply_inventory({first.get_json()["best_route"]["warehouse_id"]: 399.0})
+    client.post("/optimize", data=json.dumps(payload), content_type="application/json")
+    stats = client.get("/optimize/cache").get_json()
+    assert stats["hits"] == hits + 2 and stats["entries"] == 1
+
+def test_optimize_compact_response_modes(client, seeded):
+    payload = {
+        "latitude": 48.14,
+        "longitude": 11.58,
+        "time_window_start": 2.0,
+        "time_window_end": 6.0,
+        "quantity": 4
+    }
+    def post(**options):
+        resp = client.post("/optimize", data=json.dumps(dict(payload, **options)),
+                           content_type="application/json")
+        assert resp.status_code == 200
+        return resp.get_json()
+
+    full = post()
+    by_cost = sorted(full["all_routes"], key=lambda r: r["predicted_cost"])
+
+    best = post(best_only=True)
+    assert best == {"best_route": full["best_route"]}
+
+    top = post(top_k=3)
+    assert "all_routes" not in top
+    assert [r["predicted_cost"] for r in top["top_routes"]] == [r["predicted_cost"] for r in by_cost[:3]]
+    assert top["top_routes"][0] == full["best_route"]
+
+    columns = post(route_format="columnar")["all_routes"]
+    assert columns["route_id"] == [r["route_id"] for r in full["all_routes"]]
+    assert columns["predicted_cost"] == [r["predicted_cost"] for r in full["all_routes"]]
+
+def test_optimize_msgpack_falls_back_to_json(client, seeded):
+    payload = {
+        "latitude": 48.14,
+        "longitude": 11.58,
+        "time_window_start": 2.0,
+        "time_window_end": 6.0,
+        "quantity": 4,
+        "best_only": True
+    }
+    resp = client.post("/optimize", data=json.dumps(payload), content_type="application/json",
+                       headers={"Accept": "application/msgpack"})
+    assert resp.status_code == 200
+    try:
+        import msgpack
+    except ImportError:
+        assert resp.mimetype == "application/json"
+        assert "best_route" in resp.get_json()
+    else:
+        assert resp.mimetype == "application/msgpack"
+        assert "best_route" in msgpack.unpackb(resp.data)
+
+def test_feedback_updates_the_live_model(client, seeded):
+    payload = {
+        "latitude": 48.14,
+        "longitude": 11.58,
+        "time_window_start": 2.0,
+        "time_window_end": 6.0,
+        "quantity": 5
+    }
+    resp = client.post("/optimize", data=json.dumps(payload), content_type="application/json")
+    route = resp.get_json()["best_route"]
+    client.post("/optimize", data=json.dumps(payload), content_type="application/json")
+    hits = client.get("/optimize/cache").get_json()["hits"]
+
+    observation = dict(route, time_window_start=2.0, time_window_end=6.0, quantity=5,
+                       actual_cost=25.0)
+    resp = client.post("/feedback", data=json.dumps([observation]), content_type="application/json")
+    assert resp.status_code == 200
+    result = resp.get_json()
+    assert result["accepted"] == 1 and result["published"]
+
+    stats = client.get("/feedback/stats").get_json()
+    assert stats["model_version"] == result["model_version"] and stats["observations"] >= 1
+    assert client.get("/model").get_json()["online_revision"] >= 1
+
+    # the new model version invalidates cached /optimize answers
+    again = client.post("/optimize", data=json.dumps(payload), content_type="application/json")
+    assert again.status_code == 200
+    assert client.get("/optimize/cache").get_json()["hits"] == hits
+
+    bad = client.post("/feedback", data=json.dumps([dict(observation, actual_cost=-1)]),
+                      content_type="application/json")
+    assert bad.status_code == 400 and "validation_error" in bad.get_json()
+
+def test_bulk_warehouse_upsert_from_csv_and_json(client, seeded):
+    client.get("/warehouses")
+    body = "name,latitude,longitude,inventory,inventory_delta\nNear,,,,-100\nNew,48.15,11.59,20,\n"
+    resp = client.post("/warehouses/bulk", data=body, content_type="text/csv")
+    assert resp.status_code == 200
+    result = resp.get_json()
+    assert (result["inserted"], result["updated"]) == (1, 1)
+    whs = {w["name"]: w for w in client.get("/warehouses").get_json()}
+    assert whs["Near"]["inventory"] == 300.0 and whs["New"]["inventory"] == 20.0
+
+    resp = client.post("/warehouses/bulk", data=json.dumps({"rows": [{"name": "Ghost", "inventory": 1}]}),
+                       content_type="application/json")
+    assert resp.status_code == 400 and resp.get_json()["errors"][0]["index"] == 0
+
+def test_optimize_allow_split_ships_from_several_warehouses(client, seeded):
+    payload = {
+        "latitude": 48.14,
+        "longitude": 11.58,
+        "time_window_start": 2.0,
+        "time_window_end": 6.0,
+        "quantity": 700
+    }
+    resp = client.post("/optimize", data=json.dumps(payload), content_type="application/json")
+    assert resp.status_code == 400
+
+    resp = client.post("/optimize", data=json.dumps(dict(payload, allow_split=True)),
+                       content_type="application/json")
+    assert resp.status_code == 200
+    split = resp.get_json()["split_shipment"]
+    assert len(split["shipments"]) == 2
+    assert sum(s["quantity"] for s in split["shipments"]) == 700
+    assert all(s["quantity"] <= s["inventory"] for s in split["shipments"])
+
+    resp = client.post("/optimize", data=json.dumps(dict(payload, allow_split=True, reserve=True)),
+                       content_type="application/json")
+    assert resp.status_code == 400
+
+def test_warehouses_etag_revalidation(client, seeded):
+    resp = client.get("/warehouses")
+    etag = resp.headers["ETag"]
+    assert resp.status_code == 200 and len(resp.get_json()) == 3
+
+    resp = client.get("/warehouses", headers={"If-None-Match": etag})
+    assert resp.status_code == 304 and resp.headers["ETag"] == etag
+
+    warehouse_cache.invalidate()
+    resp = client.get("/warehouses", headers={"If-None-Match": etag})
+    assert resp.status_code == 200 and resp.headers["ETag"] != etag
+
+def _set_inventories(**inventories):
+    session = SessionLocal()
+    try:
+        for w in session.query(Warehouse).all():
+            w.inventory = inventories.get(w.name, 0.0)
+        session.commit()
+    finally:
+        session.close()
+    warehouse_cache.invalidate()
+
+def test_optimize_uses_the_requested_quantity_not_the_rounded_one(client, seeded):
+    """
+    Quantities are rounded up for the result-cache key only: 50.2 fits a
+    warehouse holding 50.3, and reserving 10.2 takes exactly 10.2.
+    """
+    _set_inventories(Near=50.3)
+    order = {"latitude": 48.14, "longitude": 11.58, "time_window_start": 2.0,
+             "time_window_end": 6.0, "quantity": 50.2}
+    resp = client.post("/optimize", data=json.dumps(order), content_type="application/json")
+    assert resp.status_code == 200
+    resp = client.post("/optimize", data=json.dumps(dict(order, k_nearest=1)),
+                       content_type="application/json")
+    assert resp.status_code == 200
+
+    _set_inventories(Near=400.0)
+    resp = client.post("/optimize", data=json.dumps(dict(order, quantity=10.2, reserve=True)),
+                       content_type="application/json")
+    assert resp.status_code == 200
+    reservation = resp.get_json()["reservation"]
+    assert reservation["quantity"] == 10.2
+    assert reservation["remaining_inventory"] == round(400.0 - 10.2, 2)
+
+def test_optimize_sub_step_time_window(client, seeded):
+    order = {"latitude": 48.14, "longitude": 11.58, "time_window_start": 2.01,
+             "time_window_end": 2.04, "quantity": 1}
+    resp = client.post("/optimize", data=json.dumps(order), content_type="application/json")
+    assert resp.status_code == 200
+
+def test_k_nearest_ignores_warehouses_newer_than_the_snapshot(seeded):
+    """
+    A bulk upsert updates the shared spatial index in place; a request that
+    captured its snapshot before is shortlisted against that snapshot.
+    """
+    from online_learning import model_slot
+    from service import optimize_request
+    from warehouse_upsert import upsert_warehouses
+
+    snapshot = warehouse_cache.get()
+    upsert_warehouses([{"name": "Closest", "latitude": 48.14, "longitude": 11.58,
+                        "inventory": 500.0}], cache=warehouse_cache)
+    order = {"latitude": 48.14, "longitude": 11.58, "time_window_start": 2.0,
+             "time_window_end": 6.0, "quantity": 1, "k_nearest": 1}
+    payload, status = optimize_request(order, model_slot.live.model, warehouse_cache,
+                                       snapshot=snapshot)
+    assert status == 200
+    near = next(i for i, name in zip(snapshot.ids, snapshot.names) if name == "Near")
+    assert payload["best_route"]["warehouse_id"] == int(near)
+
+def test_split_plans_are_not_shared_within_a_quantity_band(client, seeded):
+    """
+    9.2 and 9.8 share a cache band, but only 9.2 can be split across 5.0 + 4.5.
+    """
+    _set_inventories(Near=5.0, Mid=4.5)
+    order = {"latitude": 48.14, "longitude": 11.58, "time_window_start": 2.0,
+             "time_window_end": 6.0, "quantity": 9.2, "allow_split": True}
+    resp = client.post("/optimize", data=json.dumps(order), content_type="application/json")
+    assert resp.status_code == 200
+    assert resp.get_json()["split_shipment"]["quantity"] == 9.2
+
+    resp = client.post("/optimize", data=json.dumps(dict(order, quantity=9.8)),
+                       content_type="application/json")
+    assert resp.status_code == 400
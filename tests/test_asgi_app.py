@@ -0,0 +1,66 @@
+import sys
+import os
+import threading
+import pytest
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+pytest.importorskip("starlette")
+pytest.importorskip("httpx")
+pytest.importorskip("aiosqlite")
+from starlette.testclient import TestClient
+import asgi_app
+
+ORDER = {
+    "latitude": 48.14,
+    "longitude": 11.58,
+    "time_window_start": 2.0,
+    "time_window_end": 6.0,
+    "quantity": 1
+}
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(asgi_app.app) as c:
+        yield c
+
+def test_asgi_matches_flask_contract(client):
+    whs = client.get("/warehouses")
+    assert whs.status_code == 200 and isinstance(whs.json(), list)
+    assert "reserved" in client.get("/reservations/stats").json()
+    assert client.get("/db/pool").status_code == 200
+
+    resp = client.post("/optimize", json=ORDER)
+    if resp.status_code == 200:
+        assert {"best_route", "all_routes"} <= set(resp.json())
+    else:
+        assert resp.status_code == 400 and "error" in resp.json()
+
+    bad = client.post("/optimize", json={"latitude": 48.14})
+    assert bad.status_code == 400 and "validation_error" in bad.json()
+
+    batch = client.post("/optimize/batch", json={"orders": [ORDER, {"bad": 1}]})
+    assert batch.status_code == 200
+    assert "validation_error" in batch.json()["results"][1]
+
+    body = "latitude,longitude,time_window_start,time_window_end,quantity\n" + \
+           "48.14,11.58,2,6,1\n" * 3
+    # the stream endpoint reads the body itself; guard against it blocking on receive()
+    out = {}
+    worker = threading.Thread(daemon=True, target=lambda: out.update(resp=client.post(
+        "/optimize/stream?format=csv", content=body, headers={"content-type": "text/csv"})))
+    worker.start()
+    worker.join(timeout=30)
+    assert not worker.is_alive(), "/optimize/stream did not answer within 30s"
+    stream = out["resp"]
+    assert stream.status_code == 200
+    rows = stream.text.splitlines()
+    assert rows[0].startswith("index,route_id") and len(rows) == 4
+
+def test_asgi_sheds_load_when_saturated(client):
+    limit = asgi_app.app.limit
+    asgi_app.app.limit = 0
+    try:
+        resp = client.get("/warehouses")
+    finally:
+        asgi_app.app.limit = limit
+    assert resp.status_code == 429
+    assert resp.headers["Retry-After"] == "1"
@@ -0,0 +1,32 @@
+import sys
+import os
+import numpy as np
+import pytest
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from cost_models import BACKENDS, train_cost_model, measure_inference_latency, make_backend
+from model_store import save_model, load_model
+from training import generate_synthetic_training_data
+
+def test_engineered_backend_captures_inventory_penalty():
+    model = train_cost_model(backend="engineered", samples=5000, seed=0)
+    X, y = generate_synthetic_training_data(samples=1000, seed=1)
+    pred = model.predict(X)
+    short = X[:, 4] < X[:, 5]
+    assert (pred[short] > 900000).all()
+    assert (pred[~short] < 900000).all()
+
+@pytest.mark.parametrize("backend", sorted(BACKENDS))
+def test_backends_round_trip_through_artifacts(tmp_path, backend):
+    model = train_cost_model(backend=backend, samples=2000, seed=0)
+    manifest = save_model(model, str(tmp_path))
+    assert manifest["backend"] == backend
+    assert manifest["inference_ms_per_1k"] > 0
+
+    loaded, _ = load_model(str(tmp_path), backend=backend)
+    X, _ = generate_synthetic_training_data(samples=50, seed=2)
+    np.testing.assert_allclose(loaded.predict(X), model.predict(X))
+    assert measure_inference_latency(loaded, rows=200, repeats=3) > 0
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        make_backend("quantum")
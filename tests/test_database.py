@@ -0,0 +1,27 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sqlalchemy import text
+from database import make_engine, pool_stats
+
+def test_sqlite_engine_applies_pragmas_and_reports_pool_stats(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path / 'cfg.db'}", pool_size=2, max_overflow=1,
+                         journal_mode="WAL", synchronous="NORMAL", mmap_size=1 << 20)
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar().lower() == "wal"
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert conn.execute(text("PRAGMA mmap_size")).scalar() == 1 << 20
+        stats = pool_stats(engine)
+        assert stats["checked_out"] == 1
+        assert abs(stats["saturation"] - 1 / 3) < 1e-9
+
+    stats = pool_stats(engine)
+    assert stats["checkouts"] >= 1 and stats["checked_out"] == 0
+    assert stats["checkout_ms_p95"] >= 0.0
+    engine.dispose()
+
+def test_in_memory_sqlite_skips_pool_sizing():
+    engine = make_engine("sqlite://")
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT 1")).scalar() == 1
+    assert "pool_class" in pool_stats(engine)
@@ -0,0 +1,47 @@
+import sys
+import os
+import json
+import numpy as np
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from distance import haversine, HaversineBackend, RoadNetworkBackend, DistanceService
+
+def test_haversine_known_distance_and_matrix_shape():
+    # Munich -> Berlin is ~504 km great-circle
+    assert abs(float(haversine(48.137, 11.576, 52.520, 13.405)) - 504) < 3
+    m = HaversineBackend().matrix(np.array([48.1, 48.2]), np.array([11.5, 11.6]),
+                                  np.array([48.1, 48.3, 48.4]), np.array([11.5, 11.7, 11.8]))
+    assert m.shape == (2, 3) and m[0, 0] == 0.0
+
+def test_service_caches_rows_on_rounded_coordinates_with_lru_eviction():
+    service = DistanceService(max_entries=2, precision=4)
+    wh_lats, wh_lons = np.array([48.1, 48.2]), np.array([11.5, 11.6])
+
+    first = service.matrix([48.14, 48.15], [11.58, 11.59], wh_lats, wh_lons)
+    again = service.matrix([48.140001], [11.580001], wh_lats, wh_lons)
+    np.testing.assert_array_equal(again[0], first[0])
+    assert (service.hits, service.misses) == (1, 2)
+
+    service.matrix([48.16], [11.60], wh_lats, wh_lons)
+    assert service.stats()["entries"] == 2 and service.evictions == 1
+
+def test_service_bounds_cached_rows_by_bytes():
+    """
+    Each cached row is its own copy, and the byte cap evicts oldest rows first.
+    """
+    wh_lats, wh_lons = np.linspace(48.0, 48.5, 100), np.linspace(11.0, 11.5, 100)
+    service = DistanceService(max_entries=1000, max_bytes=2 * 100 * 8)
+
+    service.matrix([48.14, 48.15, 48.16], [11.58, 11.59, 11.60], wh_lats, wh_lons)
+    stats = service.stats()
+    assert stats["entries"] == 2 and stats["bytes"] == 1600 and service.evictions == 1
+    assert all(row.base is None for row in service._rows.values())
+
+def test_road_backend_follows_graph_edges(tmp_path):
+    # a detour: A-B-C along a path, with no direct A-C edge
+    graph = {"nodes": [[1, 48.0, 11.0], [2, 48.0, 12.0], [3, 48.1, 11.0]],
+             "edges": [[1, 2, 80.0], [2, 3, 80.0]]}
+    path = tmp_path / "roads.json"
+    path.write_text(json.dumps(graph))
+    road = RoadNetworkBackend(str(path))
+    m = road.matrix(np.array([48.0]), np.array([11.0]), np.array([48.1]), np.array([11.0]))
+    assert abs(m[0, 0] - 160.0) < 1e-6
@@ -0,0 +1,58 @@
+import sys
+import os
+import threading
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from database import Base
+from models import Warehouse
+from inventory import ReservationStats, reserve_inventory, reserve_first
+
+def _session_factory(tmp_path, inventories):
+    engine = create_engine(f"sqlite:///{tmp_path / 'inv.db'}",
+                           connect_args={"timeout": 30})
+
+    @event.listens_for(engine, "connect")
+    def _wal(dbapi_conn, _):
+        dbapi_conn.execute("PRAGMA journal_mode=WAL")
+
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+    session = factory()
+    for i, inv in enumerate(inventories, start=1):
+        session.add(Warehouse(name=f"W{i}", latitude=48.0, longitude=11.0, inventory=inv))
+    session.commit()
+    session.close()
+    return factory
+
+def test_concurrent_reservations_never_oversell(tmp_path):
+    factory = _session_factory(tmp_path, [200.0])
+    stats = ReservationStats()
+    wins = []
+
+    def worker():
+        for _ in range(5):
+            ok, _ = reserve_inventory(1, 10.0, factory, max_retries=50, stats=stats)
+            if ok:
+                wins.append(1)
+
+    threads = [threading.Thread(target=worker) for _ in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    session = factory()
+    remaining = session.get(Warehouse, 1).inventory
+    session.close()
+    assert len(wins) == 20 and remaining == 0.0
+    assert stats.reserved == 20 and stats.conflicts == 60
+
+def test_reserve_first_falls_back_and_reports_inventory(tmp_path):
+    factory = _session_factory(tmp_path, [5.0, 50.0])
+    seen = {}
+    wid, remaining, attempts = reserve_first([1, 2], 10.0, factory,
+                                             on_update=seen.__setitem__,
+                                             stats=ReservationStats())
+    assert (wid, remaining, attempts) == (2, 40.0, 2)
+    assert seen == {1: 5.0, 2: 40.0}
@@ -0,0 +1,121 @@
+import sys
+import os
+import json
+import threading
+import numpy as np
+import pytest
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from loadtest import OrderMix, arrival_offsets, plan_requests, run_closed, run_open
+
+WAREHOUSES = [
+    {"latitude": 48.1, "longitude": 11.5, "inventory": 300.0},
+    {"latitude": 48.2, "longitude": 11.6, "inventory": 40.0},
+]
+
+class _FakeTarget:
+    """
+    Answers /optimize with 400 for quantities above 100 and 200 otherwise;
+    has no /optimize/cache.
+    """
+    name = "fake"
+
+    def __init__(self):
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def client(self):
+        def send(method, path, body):
+            if path == "/optimize/cache":
+                return 404, b"{}"
+            with self._lock:
+                self.calls += 1
+            if path == "/optimize" and json.loads(body)["quantity"] > 100:
+                return 400, b"{}"
+            return 200, b"{}"
+        return send
+
+class _CachingTarget(_FakeTarget):
+    """
+    Counts repeated /optimize bodies as result-cache hits on /optimize/cache.
+    """
+    def __init__(self):
+        super().__init__()
+        self.seen = set()
+        self.hits = self.misses = 0
+
+    def client(self):
+        def send(method, path, body):
+            with self._lock:
+                if path == "/optimize/cache":
+                    return 200, json.dumps({"hits": self.hits, "misses": self.misses}).encode()
+                self.calls += 1
+                if body in self.seen:
+                    self.hits += 1
+                else:
+                    self.seen.add(body)
+                    self.misses += 1
+            return 200, b"{}"
+        return send
+
+def test_order_mix_kinds():
+    mix = OrderMix(WAREHOUSES, {"near_inventory": 1, "tight_window": 1}, seed=0)
+    orders = mix.orders(500)
+    assert {kind for kind, _ in orders} == {"near_inventory", "tight_window"}
+    for kind, body in orders:
+        length = body["time_window_end"] - body["time_window_start"]
+        assert body["quantity"] >= 1
+        if kind == "tight_window":
+            assert length <= 0.5
+        else:
+            assert 1.0 <= length <= 8.0
+            assert any(0.9 * w["inventory"] - 1 <= body["quantity"] <= 1.1 * w["inventory"] + 1
+                       for w in WAREHOUSES)
+    with pytest.raises(ValueError):
+        OrderMix(WAREHOUSES, {"rush_hour": 1})
+
+def test_clustered_orders_stay_near_centers():
+    mix = OrderMix(WAREHOUSES, {"clustered": 1}, clusters=2, cluster_km=1.0, seed=1)
+    points = np.array([[b["latitude"], b["longitude"]] for _, b in mix.orders(300)])
+    nearest = np.min(np.linalg.norm(points[:, None, :] - mix.centers[None], axis=2), axis=1)
+    assert np.median(nearest) < 0.05
+
+def test_closed_loop_report():
+    mix = OrderMix(WAREHOUSES, seed=0)
+    planned = plan_requests(mix, 50, warehouses_fraction=0.2, seed=0)
+    target = _FakeTarget()
+
+    result = run_closed(target, planned, concurrency=4, requests=200)
+
+    assert target.calls == 200 and result["requests"] == 200
+    assert result["error_rate"] == 0.0
+    assert set(result["endpoints"]) == {"/optimize", "/warehouses"}
+    assert sum(r["requests"] for r in result["endpoints"].values()) == 200
+    assert result["latency_ms"]["p50"] <= result["latency_ms"]["p99"]
+    rejected = result["status_counts"].get("400", 0)
+    assert result["rejection_rate"] == round(rejected / 200, 4)
+
+def test_open_loop_follows_schedule():
+    offsets = arrival_offsets(200.0, 1.0, "constant")
+    assert len(offsets) == 200 and offsets[1] == pytest.approx(0.005)
+    assert 150 < len(arrival_offsets(200.0, 1.0, "poisson", seed=0)) < 250
+
+    mix = OrderMix(WAREHOUSES, seed=0)
+    planned = plan_requests(mix, 20, seed=0)
+    result = run_open(_FakeTarget(), planned, rate=100.0, duration=0.5,
+                      concurrency=2, arrival="constant")
+
+    assert result["requests"] == result["scheduled"] == 50
+    assert "schedule_lag_ms" in result
+
+def test_cycled_pool_reports_cache_hits_unless_unique():
+    mix = OrderMix(WAREHOUSES, seed=0)
+    planned = plan_requests(mix, 10, seed=0)
+
+    cycled = run_closed(_CachingTarget(), planned, concurrency=2, requests=30)
+    assert cycled["result_cache"] == {"hits": 20, "misses": 10, "hit_rate": 0.6667}
+
+    target = _CachingTarget()
+    unique = run_closed(target, planned, concurrency=2, requests=30, unique=True)
+    assert unique["result_cache"] == {"hits": 0, "misses": 30, "hit_rate": 0.0}
+    assert len(target.seen) == 30
+    assert run_closed(_FakeTarget(), planned, concurrency=1, requests=5)["result_cache"] is None
@@ -0,0 +1,33 @@
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from metrics import RequestTimer, StageMetrics, render_prometheus
+
+def test_timer_feeds_histograms_and_prometheus_text():
+    metrics = StageMetrics()
+    for _ in range(3):
+        timer = RequestTimer("optimize", metrics)
+        timer.mark("validate")
+        timer.mark("inference")
+        timer.finish(200)
+
+    summary = metrics.summary()["optimize"]
+    assert set(summary) == {"validate", "inference", "total"}
+    assert summary["inference"]["count"] == 3
+    assert timer.server_timing().startswith("validate;dur=")
+
+    text = render_prometheus(metrics, extra={"cache": lambda: {"hits": 5, "backend": "x"}})
+    assert 'route_optim_stage_seconds_count{endpoint="optimize",stage="inference"} 3' in text
+    assert 'le="+Inf"} 3' in text
+    assert 'route_optim_requests_total{endpoint="optimize",status="200"} 3' in text
+    assert "route_optim_cache_hits 5" in text and "backend" not in text
+
+def test_mark_overhead_is_a_few_microseconds():
+    timer = RequestTimer("bench", StageMetrics())
+    n = 20000
+    t0 = time.perf_counter()
+    for _ in range(n):
+        timer.mark("stage")
+    per_mark_us = (time.perf_counter() - t0) / n * 1e6
+    assert per_mark_us < 20.0
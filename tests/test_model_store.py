@@ -0,0 +1,48 @@
+import sys
+import os
+import numpy as np
+import pytest
+from concurrent.futures import ProcessPoolExecutor
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from training import train_regression_model, generate_synthetic_training_data
+from model_store import save_model, load_model, load_or_train_model, list_versions
+
+def test_artifact_round_trip_and_versioning(tmp_path):
+    model = train_regression_model(samples=200)
+    m1 = save_model(model, str(tmp_path))
+    m2 = save_model(model, str(tmp_path))
+    assert (m1["version"], m2["version"]) == (1, 2)
+    assert list_versions(str(tmp_path)) == [1, 2]
+
+    loaded, manifest = load_model(str(tmp_path))
+    assert manifest["version"] == 2
+    X, _ = generate_synthetic_training_data(samples=20)
+    np.testing.assert_allclose(loaded.predict(X), model.predict(X))
+
+def test_checksum_mismatch_is_rejected(tmp_path):
+    manifest = save_model(train_regression_model(samples=200), str(tmp_path))
+    params_path = os.path.join(str(tmp_path), manifest["params_file"])
+    params = np.load(params_path)
+    params[1] += 1.0
+    np.save(params_path, params)
+    with pytest.raises(ValueError):
+        load_model(str(tmp_path))
+
+def test_load_or_train_only_trains_when_missing(tmp_path):
+    _, first = load_or_train_model(samples=200, directory=str(tmp_path))
+    _, second = load_or_train_model(samples=200, directory=str(tmp_path))
+    assert first["version"] == second["version"] == 1
+
+def _boot_worker(directory):
+    _, manifest = load_or_train_model(samples=200, directory=directory)
+    return manifest["version"]
+
+def test_concurrent_first_boot_trains_once(tmp_path):
+    """
+    Workers that start together on an empty directory share one artifact.
+    """
+    with ProcessPoolExecutor(max_workers=4) as pool:
+        versions = list(pool.map(_boot_worker, [str(tmp_path)] * 4))
+    assert versions == [1, 1, 1, 1]
+    assert list_versions(str(tmp_path)) == [1]
+    assert not [n for n in os.listdir(tmp_path) if n.endswith(".tmp")]
@@ -0,0 +1,57 @@
+import sys
+import os
+import numpy as np
+import pytest
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from cost_models import train_cost_model
+from online_learning import ModelSlot, OnlineLearner, OnlineUnsupported
+from training import generate_synthetic_training_data
+
+def _slot(backend="linear"):
+    slot = ModelSlot()
+    slot.publish(train_cost_model(backend=backend, samples=2000, seed=0), {"version": 1})
+    return slot
+
+def test_feedback_that_matches_the_model_keeps_it():
+    slot = _slot()
+    base = slot.live
+    X, _ = generate_synthetic_training_data(samples=200, seed=1)
+    result = OnlineLearner(slot).ingest(X, base.model.predict(X))
+    assert result["published"] and result["model_version"] == base.version + 1
+    assert slot.live.manifest["online_revision"] == 1 and slot.live.manifest["version"] == 1
+    np.testing.assert_allclose(slot.live.model.params(), base.model.params(), rtol=1e-6, atol=1e-6)
+
+def test_model_converges_to_observed_costs():
+    slot = _slot()
+    learner = OnlineLearner(slot, prior_weight=100, publish_min=500)
+    rng = np.random.default_rng(0)
+    X, _ = generate_synthetic_training_data(samples=5000, seed=2)
+    # real deliveries turn out 2 per distance unit more expensive than the model thinks
+    y = slot.live.model.predict(X) + 2.0 * X[:, 0] + rng.normal(0, 1, len(X))
+    first = slot.live
+    for start in range(0, len(X), 250):
+        learner.ingest(X[start:start + 250], y[start:start + 250])
+    assert learner.publishes == 10 and learner.pending == 0
+    assert slot.live.model.coef_[0] == pytest.approx(first.model.coef_[0] + 2.0, abs=0.05)
+
+    stats = learner.stats()
+    assert stats["observations"] == 5000 and stats["model_version"] == first.version + 10
+    assert stats["last_batch_mae"] < stats["mae"]
+
+def test_learner_restarts_from_an_externally_published_model():
+    slot = _slot()
+    learner = OnlineLearner(slot)
+    X, _ = generate_synthetic_training_data(samples=50, seed=3)
+    learner.ingest(X, slot.live.model.predict(X) + 10.0)
+    reloaded = train_cost_model(backend="engineered", samples=2000, seed=1)
+    slot.publish(reloaded, {"version": 2})
+    learner.ingest(X, reloaded.predict(X))
+    assert type(slot.live.model) is type(reloaded)
+    np.testing.assert_allclose(slot.live.model.predict(X), reloaded.predict(X), rtol=1e-4, atol=1e-2)
+
+def test_tree_backend_is_not_updated_online():
+    slot = _slot(backend="tree")
+    X, y = generate_synthetic_training_data(samples=10, seed=4)
+    with pytest.raises(OnlineUnsupported):
+        OnlineLearner(slot).ingest(X, y)
+    assert slot.live.version == 1
@@ -0,0 +1,79 @@
+import sys
+import os
+import numpy as np
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from cost_models import train_cost_model
+from parallel import ParallelScorer
+from route_optimizer import Order, RouteSelection, score_orders
+from warehouse_cache import WarehouseSnapshot
+
+def _snapshot(n=40, seed=0):
+    rng = np.random.default_rng(seed)
+    return WarehouseSnapshot(
+        ids=np.arange(1, n + 1, dtype=np.int64),
+        names=[f"W{i}" for i in range(n)],
+        latitudes=48.1 + rng.uniform(-0.2, 0.2, n),
+        longitudes=11.5 + rng.uniform(-0.2, 0.2, n),
+        inventories=rng.uniform(0, 500, n),
+        version=1,
+        loaded_at=0.0
+    )
+
+def _orders(n=50):
+    return [Order(48.1 + i * 1e-3, 11.5, 2.0, 6.0, 10.0 + i) for i in range(n)]
+
+def test_parallel_scoring_matches_serial_chunks_in_order():
+    """
+    Chunk i is scored with default_rng([seed, i]) and merged back in input order.
+    """
+    snap = _snapshot()
+    orders = _orders()
+    model = train_cost_model("engineered", samples=500, seed=0)
+
+    with ParallelScorer(workers=2, chunk_size=16) as scorer:
+        got = scorer.score(orders, snap, model, seed=3)
+        again = scorer.score(orders, snap, model, seed=3)
+        assert scorer.stats()["publishes"] == 1
+
+    expected = RouteSelection.concatenate([
+        score_orders(orders[s:s + 16], snap.ids, snap.latitudes, snap.longitudes,
+                     snap.inventories, model, rng=np.random.default_rng((3, i)))
+        for i, s in enumerate(range(0, len(orders), 16))
+    ])
+    assert len(got) == len(orders)
+    np.testing.assert_allclose(got.cost, expected.cost)
+    np.testing.assert_array_equal(got.warehouse_idx, expected.warehouse_idx)
+    np.testing.assert_array_equal(got.route_num, expected.route_num)
+    np.testing.assert_allclose(again.cost, got.cost)
+
+def test_parallel_scoring_republishes_for_a_new_model():
+    """
+    A new model (or snapshot) object is published even with the same snapshot version.
+    """
+    snap = _snapshot(n=10)
+    orders = _orders(n=8)
+
+    with ParallelScorer(workers=1, chunk_size=8) as scorer:
+        scorer.score(orders, snap, train_cost_model("linear", samples=300, seed=0), seed=1)
+        model = train_cost_model("linear", samples=300, seed=1)
+        got = scorer.score(orders, snap, model, seed=1)
+        assert scorer.stats()["publishes"] == 2
+
+    expected = score_orders(orders, snap.ids, snap.latitudes, snap.longitudes,
+                            snap.inventories, model, rng=np.random.default_rng((1, 0)))
+    np.testing.assert_allclose(got.cost, expected.cost)
+
+def test_parallel_scoring_ships_non_linear_models():
+    """
+    Models without plain coefficients (tree backend) are shared pickled.
+    """
+    snap = _snapshot(n=10)
+    orders = _orders(n=8)
+    model = train_cost_model("tree", samples=300, seed=0)
+
+    with ParallelScorer(workers=1, chunk_size=8) as scorer:
+        got = scorer.score(orders, snap, model, seed=1)
+
+    expected = score_orders(orders, snap.ids, snap.latitudes, snap.longitudes,
+                            snap.inventories, model, rng=np.random.default_rng((1, 0)))
+    np.testing.assert_allclose(got.cost, expected.cost)
@@ -0,0 +1,46 @@
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from route_optimizer import Order
+from result_cache import ResultCache, order_key, order_seed, quantize_order
+
+def _payload(routes=1):
+    return {"best_route": {}, "all_routes": [{}] * routes}
+
+def test_quantized_orders_share_a_key_and_seed():
+    a = quantize_order(Order(48.140001, 11.58, 2.01, 5.96, 9.2))
+    b = quantize_order(Order(48.14, 11.580004, 2.0, 5.92, 10.0))
+    assert order_key(a) == order_key(b)
+    assert a.quantity == 10.0 and a.time_window_start == 2.0 and a.time_window_end == 6.0
+    assert order_seed(order_key(a)) == order_seed(order_key(b))
+
+def test_sub_step_windows_never_collapse():
+    for start, end in ((2.01, 2.04), (2.06, 2.11), (2.0, 2.1)):
+        q = quantize_order(Order(48.14, 11.58, start, end, 1.0))
+        assert q.time_window_end - q.time_window_start >= 0.1 - 1e-9
+        assert q.time_window_start <= start and q.time_window_end >= end
+
+def test_lru_ttl_and_version_invalidation():
+    cache = ResultCache(max_entries=2, ttl_seconds=60, max_bytes=10**6)
+    cache.put((1, 1), "a", _payload())
+    cache.put((1, 1), "b", _payload())
+    assert cache.get((1, 1), "a") is not None      # a is now most recent
+    cache.put((1, 1), "c", _payload())
+    assert cache.get((1, 1), "b") is None and cache.evictions == 1
+
+    # a newer snapshot/model version drops everything cached under the old one
+    assert cache.get((2, 1), "a") is None
+    assert cache.stats()["entries"] == 0 and cache.invalidations == 1
+
+    short = ResultCache(max_entries=10, ttl_seconds=0.01)
+    short.put((1, 1), "a", _payload())
+    time.sleep(0.02)
+    assert short.get((1, 1), "a") is None and short.expirations == 1
+
+def test_memory_cap_evicts_by_payload_size():
+    cache = ResultCache(max_entries=100, ttl_seconds=60, max_bytes=5000)
+    for key in range(4):
+        cache.put((1, 1), key, _payload(routes=2))
+    stats = cache.stats()
+    assert stats["bytes"] <= 5000 and stats["entries"] < 4
@@ -0,0 +1,97 @@
+import sys
+import os
+import numpy as np
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from training import train_regression_model
+from route_optimizer import (
+    Order, generate_candidates, generate_candidates_for_orders,
+    generate_candidate_routes, build_feature_matrix,
+    predict_cost, score_candidates, score_orders
+)
+
+def _order(quantity=50.0):
+    return Order(lat=48.14, lon=11.58, time_window_start=2.0,
+                 time_window_end=6.0, quantity=quantity)
+
+def test_batch_scoring_matches_single_route_predictions():
+    """
+    score_candidates must agree with per-route predict_cost and pick the argmin.
+    """
+    model = train_regression_model(samples=200)
+    order = _order()
+    routes = generate_candidate_routes(order, 1, 48.1, 11.5, 300.0, num_routes=5)
+    routes += generate_candidate_routes(order, 2, 48.2, 11.6, 20.0, num_routes=5)
+
+    costs, best_idx = score_candidates(model, build_feature_matrix(routes, order))
+    single = np.array([predict_cost(model, r, order) for r in routes])
+
+    np.testing.assert_allclose(costs, single)
+    assert int(best_idx) == int(np.argmin(single))
+
+def test_grouped_scoring_returns_argmin_per_order():
+    """
+    With routes_per_order, best indices are absolute row indices per block.
+    """
+    class _Identity:
+        def predict(self, X):
+            return X[:, 0]
+
+    X = np.zeros((6, 6))
+    X[:, 0] = [3.0, 1.0, 2.0, 5.0, 6.0, 4.0]
+    _, best_idx = score_candidates(_Identity(), X, routes_per_order=3)
+    assert best_idx.tolist() == [1, 5]
+
+def test_columnar_candidates_cover_all_warehouses_and_are_seedable():
+    """
+    generate_candidates yields warehouse-major rows and is reproducible per seed.
+    """
+    order = _order()
+    args = (order, np.array([7, 9]), np.array([48.1, 48.2]),
+            np.array([11.5, 11.6]), np.array([300.0, 20.0]))
+    a = generate_candidates(*args, num_routes=4, rng=np.random.default_rng(1))
+    b = generate_candidates(*args, num_routes=4, rng=np.random.default_rng(1))
+
+    assert len(a) == 8
+    assert a.route_id(0) == "7_1" and a.route_id(7) == "9_4"
+    assert a.inventory.tolist() == [300.0] * 4 + [20.0] * 4
+    np.testing.assert_array_equal(a.feature_matrix(order), b.feature_matrix(order))
+    assert ((a.traffic >= 1.0) & (a.traffic <= 3.0)).all()
+
+def test_multi_order_candidates_match_single_order_layout():
+    """
+    generate_candidates_for_orders stacks one routes_per_order block per order.
+    """
+    orders = [_order(10.0), _order(400.0)]
+    orders[1].time_window_end = 9.0
+    cands = generate_candidates_for_orders(
+        orders, np.array([1, 2, 3]), np.array([48.1, 48.2, 48.3]),
+        np.array([11.5, 11.6, 11.7]), np.array([100.0, 500.0, 50.0]),
+        num_routes=2, rng=np.random.default_rng(0))
+
+    assert len(cands) == 12 and cands.routes_per_order == 6
+    X = cands.feature_matrix()
+    assert X[:6, 5].tolist() == [10.0] * 6
+    assert X[6:, 5].tolist() == [400.0] * 6
+    assert X[6:, 2].tolist() == [9.0] * 6
+    assert cands.route_id(6) == "1_1" and cands.route_id(11) == "3_2"
+
+def test_score_orders_works_in_bounded_blocks():
+    """
+    With max_rows smaller than the batch, orders are scored block by block
+    (2 orders x 3 warehouses x 2 routes per block here) and merged in order.
+    """
+    orders = [_order(10.0 + i) for i in range(5)]
+    ids = np.array([1, 2, 3])
+    lats, lons = np.array([48.1, 48.2, 48.3]), np.array([11.5, 11.6, 11.7])
+    invs = np.array([100.0, 500.0, 50.0])
+    model = train_regression_model(samples=200)
+
+    got = score_orders(orders, ids, lats, lons, invs, model, num_routes=2,
+                       rng=np.random.default_rng(1), max_rows=12)
+
+    rng = np.random.default_rng(1)
+    blocks = [score_orders(orders[s:s + 2], ids, lats, lons, invs, model,
+                           num_routes=2, rng=rng) for s in (0, 2, 4)]
+    assert len(got) == 5
+    np.testing.assert_allclose(got.cost, np.concatenate([b.cost for b in blocks]))
+    np.testing.assert_array_equal(got.route_num, np.concatenate([b.route_num for b in blocks]))
@@ -0,0 +1,71 @@
+import sys
+import os
+import numpy as np
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from spatial_index import GridIndex
+from route_optimizer import _compute_distance
+
+def _brute_force(points, lat, lon, k, max_radius, min_inventory):
+    found = sorted(
+        (_compute_distance(lat, lon, p[0], p[1]), wid)
+        for wid, p in points.items()
+        if p[2] >= min_inventory
+        and (max_radius is None or _compute_distance(lat, lon, p[0], p[1]) <= max_radius)
+    )
+    return [wid for _, wid in found][:k]
+
+def test_nearest_matches_brute_force():
+    rng = np.random.default_rng(3)
+    index = GridIndex(cell_size=0.02)
+    points = {}
+    for wid in range(1, 301):
+        p = (48.137 + rng.uniform(-0.3, 0.3), 11.576 + rng.uniform(-0.3, 0.3),
+             rng.uniform(0, 500))
+        points[wid] = p
+        index.upsert(wid, *p)
+
+    for k, radius, qty in [(1, None, 0.0), (5, None, 250.0), (10, 5.0, 100.0), (None, 10.0, 400.0)]:
+        got = index.nearest(48.14, 11.58, k=k, max_radius=radius, min_inventory=qty)
+        assert got == _brute_force(points, 48.14, 11.58, k, radius, qty)
+
+def test_incremental_move_and_remove():
+    index = GridIndex(cell_size=0.05)
+    index.upsert(1, 48.0, 11.0, 100.0)
+    index.upsert(2, 49.0, 12.0, 100.0)
+    assert index.nearest(48.95, 11.95, k=1) == [2]
+
+    index.upsert(1, 48.96, 11.96, 100.0)
+    assert index.nearest(48.95, 11.95, k=1) == [1]
+
+    index.remove(1)
+    assert index.nearest(48.95, 11.95, k=2) == [2]
+    assert len(index) == 1
+
+def test_positions_of_drops_ids_missing_from_the_snapshot():
+    from spatial_index import positions_of
+    from warehouse_cache import WarehouseSnapshot
+    snapshot = WarehouseSnapshot(ids=np.array([2, 5, 9], dtype=np.int64), names=["a", "b", "c"],
+                                 latitudes=np.zeros(3), longitudes=np.zeros(3),
+                                 inventories=np.ones(3), version=1, loaded_at=0.0)
+    assert positions_of(snapshot, [9, 12, 1, 5, 7]).tolist() == [2, 1]
+    assert positions_of(snapshot, []).tolist() == []
+
+def test_nearest_in_scans_snapshots_the_index_has_moved_past():
+    from spatial_index import build_index
+    from warehouse_cache import WarehouseSnapshot
+    rng = np.random.default_rng(5)
+    n = 200
+    lats = 48.137 + rng.uniform(-0.3, 0.3, n)
+    lons = 11.576 + rng.uniform(-0.3, 0.3, n)
+    invs = rng.uniform(0, 500, n)
+    snapshot = WarehouseSnapshot(ids=np.arange(1, n + 1, dtype=np.int64), names=[""] * n,
+                                 latitudes=lats, longitudes=lons, inventories=invs,
+                                 version=1, loaded_at=0.0)
+    index = build_index(snapshot, cell_size=0.02)
+    points = {i + 1: (lats[i], lons[i], invs[i]) for i in range(n)}
+
+    # a newer version adds the closest warehouse; the old snapshot must not see it
+    index.upsert_many([(n + 1, 48.14, 11.58, 500.0)], version=2)
+    for k, radius, qty in [(1, None, 0.0), (5, None, 250.0), (10, 5.0, 100.0), (None, 10.0, 400.0)]:
+        got = index.nearest_in(snapshot, 48.14, 11.58, k=k, max_radius=radius, min_inventory=qty)
+        assert (snapshot.ids[got]).tolist() == _brute_force(points, 48.14, 11.58, k, radius, qty)
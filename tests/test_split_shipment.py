@@ -0,0 +1,66 @@
+import sys
+import os
+import numpy as np
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from cost_models import LinearCostModel, train_cost_model
+from route_optimizer import CandidateRoutes, Order, generate_candidates
+from split_shipment import solve_split
+
+# cost = 10 per shipment + distance
+FIXED_PLUS_DISTANCE = LinearCostModel(coef=np.array([1.0, 0, 0, 0, 0, 0]), intercept=10.0)
+
+def _order(quantity):
+    return Order(lat=48.14, lon=11.58, time_window_start=2.0, time_window_end=6.0,
+                 quantity=quantity)
+
+def _cands(distances, inventories):
+    n = len(distances)
+    return CandidateRoutes(warehouse_ids=np.arange(1, n + 1),
+                           warehouse_idx=np.arange(n),
+                           distance=np.array(distances, dtype=float),
+                           traffic=np.ones(n),
+                           inventory=np.array(inventories, dtype=float),
+                           num_routes=1)
+
+def _shipped(plan, cands):
+    return {int(cands.warehouse_ids[cands.warehouse_idx[s.row]]): s.quantity for s in plan.shipments}
+
+def test_split_prefers_cheap_partial_shipments():
+    cands = _cands([1.0, 2.0, 50.0], [60.0, 60.0, 200.0])
+    plan = solve_split(FIXED_PLUS_DISTANCE, _order(100), cands)
+    assert _shipped(plan, cands) == {1: 60.0, 2: 40.0}
+    assert np.isclose(plan.total_cost, 11.0 + 12.0)
+
+def test_split_keeps_the_rest_coverable():
+    """
+    The cheapest-per-unit warehouse (1) would leave 70 units that no single
+    other warehouse holds, so with two shipments it is skipped.
+    """
+    cands = _cands([0.0, 20.0, 20.0], [30.0, 50.0, 50.0])
+    plan = solve_split(FIXED_PLUS_DISTANCE, _order(100), cands, max_shipments=2)
+    assert _shipped(plan, cands) == {2: 50.0, 3: 50.0}
+
+def test_split_respects_max_shipments_and_total_inventory():
+    cands = _cands([1.0, 2.0, 3.0], [30.0, 30.0, 30.0])
+    assert solve_split(FIXED_PLUS_DISTANCE, _order(80), cands, max_shipments=2) is None
+    assert solve_split(FIXED_PLUS_DISTANCE, _order(100), cands, max_shipments=5) is None
+    plan = solve_split(FIXED_PLUS_DISTANCE, _order(80), cands, max_shipments=3)
+    assert len(plan.shipments) == 3
+    assert sum(s.quantity for s in plan.shipments) == 80.0
+
+def test_split_on_generated_network_stays_within_inventory():
+    rng = np.random.default_rng(0)
+    n = 300
+    inventories = rng.uniform(0, 50, n)
+    cands = generate_candidates(_order(180), np.arange(1, n + 1),
+                                48.137 + rng.uniform(-0.5, 0.5, n),
+                                11.576 + rng.uniform(-0.5, 0.5, n),
+                                inventories, rng=rng)
+    model = train_cost_model("linear", samples=500, seed=0)
+    plan = solve_split(model, _order(180), cands)
+
+    assert plan is not None and len(plan.shipments) <= 5
+    assert np.isclose(sum(s.quantity for s in plan.shipments), 180.0)
+    for s in plan.shipments:
+        assert s.quantity <= cands.inventory[s.row] + 1e-9
+    assert len({int(cands.warehouse_idx[s.row]) for s in plan.shipments}) == len(plan.shipments)
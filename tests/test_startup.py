@@ -0,0 +1,84 @@
+import json
+import os
+import subprocess
+import sys
+import pytest
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import model_store
+from app import create_app
+from database import SessionLocal
+from models import Warehouse
+from service import load_serving_model, seed_warehouses
+from startup import Readiness, StartupConfig
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_import_has_no_side_effects(tmp_path):
+    """
+    Importing the server module creates no database, trains no model and
+    leaves scikit-learn unimported.
+    """
+    db = tmp_path / "w.db"
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{db}",
+               MODEL_ARTIFACT_DIR=str(tmp_path / "artifacts"))
+    code = "import sys, json, app; print(json.dumps(sorted(m for m in sys.modules if m.startswith('sklearn'))))"
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True)
+    assert json.loads(out.stdout.strip().splitlines()[-1]) == []
+    assert not db.exists()
+    assert not (tmp_path / "artifacts").exists()
+
+def test_not_ready_returns_503():
+    flask_app = create_app(StartupConfig(seed="never", warm=False))
+    flask_app.extensions["readiness"] = Readiness()
+    client = flask_app.test_client()
+
+    resp = client.post("/optimize", json={"latitude": 48.1, "longitude": 11.5,
+                                          "time_window_start": 2, "time_window_end": 6,
+                                          "quantity": 1})
+    assert resp.status_code == 503
+    assert resp.headers["Retry-After"] == "1"
+    assert client.get("/ready").status_code == 503
+    assert client.get("/").status_code == 200
+
+def test_background_startup_becomes_ready():
+    flask_app = create_app(StartupConfig(seed="never", background=True))
+    flask_app.extensions["startup_thread"].join(timeout=60)
+    client = flask_app.test_client()
+
+    resp = client.get("/ready")
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert data["ready"] is True
+    assert set(data["phases_ms"]) == {"db", "seed", "model", "warm"}
+    assert client.get("/warehouses").status_code == 200
+
+def _warehouse_count() -> int:
+    session = SessionLocal()
+    try:
+        return session.query(Warehouse).count()
+    finally:
+        session.close()
+
+def test_seed_modes():
+    session = SessionLocal()
+    try:
+        session.query(Warehouse).delete()
+        session.commit()
+    finally:
+        session.close()
+
+    assert seed_warehouses("never") is False
+    assert _warehouse_count() == 0
+    assert seed_warehouses("auto") is True
+    assert _warehouse_count() == 3
+    assert seed_warehouses("auto") is False
+    assert _warehouse_count() == 3
+    with pytest.raises(ValueError):
+        seed_warehouses("sometimes")
+
+def test_load_only_never_trains(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_store, "ARTIFACT_DIR", str(tmp_path))
+    with pytest.raises(FileNotFoundError):
+        load_serving_model("load")
+    assert model_store.list_versions(str(tmp_path)) == []
@@ -0,0 +1,53 @@
+import sys
+import os
+import csv
+import io
+import numpy as np
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from cost_models import train_cost_model
+from streaming import RecordParser, StreamJob, stream_optimize
+from warehouse_cache import WarehouseSnapshot
+
+class _StaticCache:
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+
+    def get(self):
+        return self.snapshot
+
+def _cache():
+    return _StaticCache(WarehouseSnapshot(
+        ids=np.array([1, 2], dtype=np.int64),
+        names=["W1", "W2"],
+        latitudes=np.array([48.1, 48.2]),
+        longitudes=np.array([11.5, 11.6]),
+        inventories=np.array([300.0, 50.0]),
+        version=1,
+        loaded_at=0.0
+    ))
+
+def test_csv_parser_keeps_header_and_flags_ragged_rows():
+    parser = RecordParser("csv")
+    assert parser.parse("latitude,longitude,quantity\n") is None
+    assert parser.parse("48.1,11.5,3\n") == {"latitude": "48.1", "longitude": "11.5", "quantity": "3"}
+    assert "_error" in parser.parse("48.1,11.5\n")
+    assert parser.parse("   \n") is None
+
+def test_stream_scores_in_chunks_with_global_indices():
+    """
+    Chunks are scored independently but indices run across the whole stream.
+    """
+    model = train_cost_model("linear", samples=300, seed=0)
+    job = StreamJob(model, _cache(), output_format="csv")
+    lines = ["latitude,longitude,time_window_start,time_window_end,quantity\n"]
+    lines += ["48.14,11.58,2,6,%d\n" % q for q in (10, 400, 20, 30, 40)]
+
+    text = "".join(stream_optimize(iter(lines), job, "csv", chunk_size=2))
+    rows = list(csv.DictReader(io.StringIO(text)))
+
+    assert [int(r["index"]) for r in rows] == [0, 1, 2, 3, 4]
+    assert rows[1]["error"] == "Not enough inventory in all warehouses."
+    assert rows[0]["warehouse_id"] in ("1", "2")
+    summary = job.summary()
+    assert summary["rows"] == 5 and summary["chunks"] == 3
+    assert summary["routed"] + summary["errors"] == 5
@@ -0,0 +1,32 @@
+import sys
+import os
+import numpy as np
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sklearn.linear_model import LinearRegression
+from training import (
+    _true_cost_function, generate_synthetic_training_data,
+    iter_synthetic_training_batches, train_regression_model
+)
+
+def test_vectorized_cost_matches_scalar():
+    X, y = generate_synthetic_training_data(samples=500, seed=1)
+    expected = [_true_cost_function(*row) for row in X.tolist()]
+    np.testing.assert_allclose(y, expected)
+    assert (y >= 999999).any() and (y < 999999).any()
+
+def test_generator_is_seedable_and_batches_cover_all_samples():
+    a, _ = generate_synthetic_training_data(samples=100, seed=7)
+    b, _ = generate_synthetic_training_data(samples=100, seed=7)
+    np.testing.assert_array_equal(a, b)
+    sizes = [len(X) for X, _ in iter_synthetic_training_batches(250, batch_size=100, seed=7)]
+    assert sizes == [100, 100, 50]
+
+def test_incremental_fit_matches_in_memory_fit():
+    batches = list(iter_synthetic_training_batches(3000, batch_size=700, seed=5))
+    X = np.vstack([b[0] for b in batches])
+    y = np.concatenate([b[1] for b in batches])
+    full = LinearRegression().fit(X, y)
+
+    streamed = train_regression_model(samples=3000, seed=5, batch_size=700)
+    np.testing.assert_allclose(streamed.coef_, full.coef_, rtol=1e-6, atol=1e-6)
+    np.testing.assert_allclose(streamed.predict(X[:50]), full.predict(X[:50]), rtol=1e-6)
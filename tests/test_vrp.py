@@ -0,0 +1,45 @@
+import sys
+import os
+import numpy as np
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from route_optimizer import Order
+from vrp import VRPSolver
+
+def _orders(n, seed=0, tw=(0.0, 100.0), quantity=10.0):
+    rng = np.random.default_rng(seed)
+    return [Order(lat=48.137 + rng.uniform(-0.1, 0.1),
+                  lon=11.576 + rng.uniform(-0.1, 0.1),
+                  time_window_start=tw[0], time_window_end=tw[1],
+                  quantity=quantity)
+            for _ in range(n)]
+
+def _solver(orders, inventories=(1000.0, 1000.0), **kwargs):
+    return VRPSolver(orders,
+                     warehouse_lats=np.array([48.10, 48.18]),
+                     warehouse_lons=np.array([11.50, 11.65]),
+                     warehouse_inventories=np.array(inventories),
+                     **kwargs)
+
+def test_solution_respects_capacity_windows_and_serves_everyone():
+    orders = _orders(30)
+    solver = _solver(orders, vehicle_capacity=50.0, speed=1.0, time_budget_s=1.0)
+    sol = solver.solve()
+
+    served = sorted(s for r in sol.routes for s in r.stops)
+    assert served == list(range(30)) and sol.unassigned == []
+    for r in sol.routes:
+        assert solver.quantity[r.stops].sum() <= 50.0
+        assert solver.schedule(r.depot, r.stops) is not None
+    # batching beats one vehicle per order
+    singles = sum(solver.route_distance(d, [s]) for d, s in
+                  ((r.depot, s) for r in sol.routes for s in r.stops))
+    assert sol.total_distance < singles
+
+def test_inventory_and_time_windows_limit_assignment():
+    orders = _orders(4, quantity=60.0)
+    sol = _solver(orders, inventories=(100.0, 0.0), vehicle_capacity=500.0).solve()
+    assert len(sol.unassigned) == 3
+
+    late = _orders(2, tw=(0.0, 1e-6))
+    sol = _solver(late, vehicle_capacity=500.0, speed=1.0).solve()
+    assert sol.unassigned == [0, 1] and sol.routes == []
@@ -0,0 +1,76 @@
+import sys
+import os
+import pytest
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from database import Base
+from models import Warehouse
+from warehouse_cache import WarehouseCache
+
+@pytest.fixture
+def session_factory():
+    """
+    Isolated in-memory DB with two warehouses.
+    """
+    engine = create_engine("sqlite://", poolclass=StaticPool,
+                           connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+    session = factory()
+    session.add_all([
+        Warehouse(name="A", latitude=48.1, longitude=11.5, inventory=10.0),
+        Warehouse(name="B", latitude=48.2, longitude=11.6, inventory=20.0),
+    ])
+    session.commit()
+    session.close()
+    return factory
+
+def test_snapshot_is_served_from_memory_until_invalidated(session_factory):
+    cache = WarehouseCache(session_factory, ttl_seconds=60)
+    snap = cache.get()
+    assert snap.names == ["A", "B"]
+    assert snap.inventories.tolist() == [10.0, 20.0]
+    assert cache.get() is snap
+    assert (cache.hits, cache.misses, cache.refreshes) == (1, 1, 1)
+
+    session = session_factory()
+    session.query(Warehouse).filter(Warehouse.name == "A").update({"inventory": 5.0})
+    session.commit()
+    session.close()
+    assert cache.get().inventories.tolist() == [10.0, 20.0]
+
+    cache.invalidate()
+    fresh = cache.get()
+    assert fresh.inventories.tolist() == [5.0, 20.0]
+    assert fresh.version == snap.version + 1
+    assert cache.stats()["refreshes"] == 2
+
+def test_expired_snapshot_is_reloaded(session_factory):
+    cache = WarehouseCache(session_factory, ttl_seconds=0)
+    cache.get()
+    cache.get()
+    assert cache.refreshes == 2 and cache.hits == 0
+
+def test_reload_read_before_invalidate_is_not_installed(session_factory):
+    """
+    Rows read before an invalidate() (e.g. an async reload racing a write)
+    are returned to the reader but never become the cached snapshot.
+    """
+    from warehouse_cache import load_rows
+    cache = WarehouseCache(session_factory, ttl_seconds=60)
+    generation = cache._generation
+    stale_rows = load_rows(session_factory)
+
+    session = session_factory()
+    session.query(Warehouse).filter(Warehouse.name == "A").update({"inventory": 5.0})
+    session.commit()
+    session.close()
+    cache.invalidate()
+
+    with cache._lock:
+        stale = cache._install_locked(stale_rows, generation)
+    assert stale.inventories.tolist() == [10.0, 20.0]
+    assert cache.stats()["version"] is None
+    assert cache.get().inventories.tolist() == [5.0, 20.0]
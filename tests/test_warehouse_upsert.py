@@ -0,0 +1,69 @@
+import sys
+import os
+import pytest
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from database import Base
+from models import Warehouse
+from warehouse_cache import WarehouseCache
+from warehouse_upsert import UpsertError, rows_from_csv, upsert_warehouses
+
+def _factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'upsert.db'}")
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+    session = factory()
+    session.add_all([Warehouse(name="W1", latitude=48.0, longitude=11.0, inventory=100.0),
+                     Warehouse(name="W2", latitude=48.1, longitude=11.1, inventory=50.0)])
+    session.commit()
+    session.close()
+    return factory
+
+def _rows(factory):
+    session = factory()
+    try:
+        return {w.name: (w.latitude, w.longitude, w.inventory) for w in session.query(Warehouse)}
+    finally:
+        session.close()
+
+def test_upsert_applies_sets_deltas_and_inserts_and_notifies_cache(tmp_path):
+    factory = _factory(tmp_path)
+    cache = WarehouseCache(session_factory=factory, ttl_seconds=3600)
+    before = cache.get()
+
+    result = upsert_warehouses([
+        {"name": "W1", "inventory_delta": -30},
+        {"name": "W1", "inventory_delta": -100},          # deltas add up, clamped at 0
+        {"name": "W2", "inventory": 50.0},               # no change
+        {"name": "W3", "latitude": 48.2, "longitude": 11.2, "inventory": 10},
+    ], session_factory=factory, cache=cache)
+    assert (result["inserted"], result["updated"], result["unchanged"]) == (1, 1, 1)
+    assert result["rows"] == 4 and result["rows_per_sec"] > 0
+
+    rows = _rows(factory)
+    assert rows["W1"][2] == 0.0 and rows["W2"][2] == 50.0 and rows["W3"] == (48.2, 11.2, 10.0)
+
+    # the cache got exactly the written rows, without a reload
+    snap = cache.get()
+    assert cache.refreshes == 1 and cache.row_updates == 1 and snap.version == before.version + 1
+    assert dict(zip(snap.names, snap.inventories.tolist())) == {"W1": 0.0, "W2": 50.0, "W3": 10.0}
+    assert len(cache.index) == 3
+    assert snap.to_dicts() == WarehouseCache(session_factory=factory).get().to_dicts()
+
+def test_invalid_rows_reject_the_whole_feed(tmp_path):
+    factory = _factory(tmp_path)
+    with pytest.raises(UpsertError) as e:
+        upsert_warehouses([
+            {"name": "W1", "inventory": 1},
+            {"name": "W9", "inventory": 5},               # new, but no coordinates
+            {"name": "W2", "inventory": 1, "inventory_delta": 2},
+        ], session_factory=factory)
+    assert [err["index"] for err in e.value.errors] == [1, 2]
+    assert _rows(factory)["W1"][2] == 100.0
+
+def test_rows_from_csv_skips_empty_cells():
+    rows = rows_from_csv("name,latitude,longitude,inventory,inventory_delta\n"
+                         "W1,,,,-5\nW4,48.3,11.3,7,\n")
+    assert rows == [{"name": "W1", "inventory_delta": "-5"},
+                    {"name": "W4", "latitude": "48.3", "longitude": "11.3", "inventory": "7"}]
@@ -12,13 +12,25 @@ Generates synthetic data for 6 features:
 Trains a linear regression that penalizes:
  - insufficient inventory
  - short (time_window_end - time_window_start)
+
+Run as a script to train and save a new versioned model artifact:
+   python training.py --samples 2000 [--artifact-dir ./model_artifacts]
+Large datasets (millions of rows) are generated and fitted in chunks:
+   python training.py --samples 5000000 --batch-size 200000
+Other backends (see cost_models.py) and a latency/accuracy comparison:
+   python training.py --backend engineered
+   python training.py --compare-backends --samples 20000
 """
 
-import random
-import math
+import argparse
+import logging
 import numpy as np
-from typing import Tuple
-from sklearn.linear_model import LinearRegression
+from typing import TYPE_CHECKING, Iterator, Optional, Tuple
+
+# sklearn is imported where a LinearRegression is built, so serving code that
+# only needs LinearSufficientStats / the sample generators doesn't load it
+if TYPE_CHECKING:
+    from sklearn.linear_model import LinearRegression
 
 def _true_cost_function(distance: float,
                         time_window_start: float,
@@ -50,38 +62,164 @@ def _true_cost_function(distance: float,
     total = base_cost + traffic_cost + time_window_penalty + insufficient_penalty - inv_benefit
     return max(0.0, total)
 
-def generate_synthetic_training_data(samples: int = 1000
+def _true_cost_function_vec(distance: np.ndarray,
+                            time_window_start: np.ndarray,
+                            time_window_end: np.ndarray,
+                            traffic: np.ndarray,
+                            warehouse_inventory: np.ndarray,
+                            requested_quantity: np.ndarray
+) -> np.ndarray:
+    """
+    Vectorized _true_cost_function over equally-shaped arrays.
+    """
+    available_time = time_window_end - time_window_start
+    alpha = 10.0
+    total = (distance
+             + distance * traffic
+             + alpha * traffic / available_time
+             + np.where(warehouse_inventory < requested_quantity, 999999.0, 0.0)
+             - 0.02 * warehouse_inventory)
+    return np.maximum(0.0, total)
+
+def _sample_batch(rng: np.random.Generator, samples: int) -> Tuple[np.ndarray, np.ndarray]:
+    X = np.empty((samples, 6), dtype=float)
+    X[:, 0] = rng.uniform(1.0, 100.0, samples)          # distance
+    X[:, 1] = rng.uniform(0.0, 8.0, samples)            # time_window_start
+    X[:, 2] = X[:, 1] + rng.uniform(0.5, 10.0, samples) # time_window_end
+    X[:, 3] = rng.uniform(1.0, 3.0, samples)            # traffic
+    X[:, 4] = rng.uniform(0.0, 500.0, samples)          # inventory
+    X[:, 5] = rng.uniform(1.0, 200.0, samples)          # requested_qty
+    y = _true_cost_function_vec(X[:, 0], X[:, 1], X[:, 2], X[:, 3], X[:, 4], X[:, 5])
+    return X, y
+
+def generate_synthetic_training_data(samples: int = 1000,
+                                     seed: Optional[int] = None
 ) -> Tuple[np.ndarray, np.ndarray]:
     """
     shape: (samples, 6)
      [distance, time_window_start, time_window_end, traffic, inventory, requested_qty]
     plus cost label
     """
-    X_list = []
-    y_list = []
+    return _sample_batch(np.random.default_rng(seed), samples)
+
+def iter_synthetic_training_batches(samples: int,
+                                    batch_size: int = 100_000,
+                                    seed: Optional[int] = None
+) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Streams the same distribution as generate_synthetic_training_data in
+    (X, y) batches of at most batch_size rows, so memory stays O(batch_size).
+    """
+    rng = np.random.default_rng(seed)
+    remaining = samples
+    while remaining > 0:
+        n = min(batch_size, remaining)
+        yield _sample_batch(rng, n)
+        remaining -= n
 
-    for _ in range(samples):
-        distance = random.uniform(1.0, 100.0)
-        tw_start = random.uniform(0.0, 8.0)
-        tw_end   = tw_start + random.uniform(0.5, 10.0)
-        traffic  = random.uniform(1.0, 3.0)
-        inv      = random.uniform(0.0, 500.0)
-        req_qty  = random.uniform(1.0, 200.0)
+class LinearSufficientStats:
+    """
+    Running X^T X / X^T y (with an intercept column) for least squares.
+    Batches can be added one at a time and the exact OLS solution recovered
+    at any point, so datasets never need to fit in memory at once.
+    """
+    def __init__(self, n_features: int = 6):
+        self.n_features = n_features
+        self.xtx = np.zeros((n_features + 1, n_features + 1))
+        self.xty = np.zeros(n_features + 1)
+        self.n = 0
 
-        cost = _true_cost_function(
-            distance, tw_start, tw_end, traffic, inv, req_qty
-        )
+    def update(self, X: np.ndarray, y: np.ndarray) -> None:
+        A = np.empty((X.shape[0], self.n_features + 1))
+        A[:, 0] = 1.0
+        A[:, 1:] = X
+        self.xtx += A.T @ A
+        self.xty += A.T @ y
+        self.n += X.shape[0]
 
-        X_list.append([distance, tw_start, tw_end, traffic, inv, req_qty])
-        y_list.append(cost)
+    def params(self) -> np.ndarray:
+        """
+        Least-squares [intercept, coef...].
+        """
+        return np.linalg.lstsq(self.xtx, self.xty, rcond=None)[0]
 
-    return np.array(X_list), np.array(y_list)
+    def solve(self) -> "LinearRegression":
+        from sklearn.linear_model import LinearRegression
+        params = self.params()
+        model = LinearRegression()
+        model.intercept_ = float(params[0])
+        model.coef_ = params[1:]
+        model.n_features_in_ = self.n_features
+        return model
 
-def train_regression_model(samples: int = 2000) -> LinearRegression:
+def train_regression_model(samples: int = 2000,
+                           seed: Optional[int] = None,
+                           batch_size: Optional[int] = None) -> "LinearRegression":
     """
     Train a linear regression on the 6D data.
+    With batch_size, data is generated and fitted incrementally in chunks
+    (see iter_synthetic_training_batches / LinearSufficientStats).
+    """
+    if batch_size is None:
+        from sklearn.linear_model import LinearRegression
+        X, y = generate_synthetic_training_data(samples=samples, seed=seed)
+        model = LinearRegression()
+        model.fit(X, y)
+        return model
+
+    stats = LinearSufficientStats()
+    for X, y in iter_synthetic_training_batches(samples, batch_size=batch_size, seed=seed):
+        stats.update(X, y)
+    return stats.solve()
+
+def compare_backends(samples: int = 20000, seed: Optional[int] = 0) -> list:
+    """
+    Trains every cost-model backend on the same data and reports
+    train time, holdout MAE and inference latency (ms per 1k rows).
     """
-    X, y = generate_synthetic_training_data(samples=samples)
-    model = LinearRegression()
-    model.fit(X, y)
-    return model
+    import time
+    from cost_models import BACKENDS, train_cost_model, measure_inference_latency
+
+    X_test, y_test = generate_synthetic_training_data(samples=5000, seed=None if seed is None else seed + 1)
+    rows = []
+    for name in BACKENDS:
+        t0 = time.perf_counter()
+        model = train_cost_model(backend=name, samples=samples, seed=seed)
+        train_s = time.perf_counter() - t0
+        rows.append({
+            "backend": name,
+            "train_seconds": round(train_s, 3),
+            "holdout_mae": round(float(np.mean(np.abs(model.predict(X_test) - y_test))), 2),
+            "inference_ms_per_1k": round(measure_inference_latency(model), 4)
+        })
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the cost model and save a new artifact version.")
+    parser.add_argument("--samples", type=int, default=2000)
+    parser.add_argument("--backend", default="linear",
+                        help="cost model backend: linear, engineered or tree")
+    parser.add_argument("--batch-size", type=int, default=None,
+                        help="fit incrementally in chunks of this many rows (linear backends)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--artifact-dir", default=None)
+    parser.add_argument("--compare-backends", action="store_true",
+                        help="print accuracy/latency of every backend instead of saving")
+    args = parser.parse_args(argv)
+
+    if args.compare_backends:
+        for row in compare_backends(samples=args.samples, seed=args.seed):
+            print(row)
+        return
+
+    from cost_models import train_cost_model
+    from model_store import save_model
+    model = train_cost_model(backend=args.backend, samples=args.samples,
+                             seed=args.seed, batch_size=args.batch_size)
+    manifest = save_model(model, args.artifact_dir, metadata={"samples": args.samples})
+    print(f"Saved {manifest['backend']} model artifact v{manifest['version']} "
+          f"(sha256 {manifest['sha256'][:12]}, {manifest['inference_ms_per_1k']:.4f} ms/1k rows)")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
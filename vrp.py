@@ -0,0 +1,248 @@
+"""
+vrp.py
+
+Multi-stop vehicle routing on top of route_optimizer.Order:
+ - each order is assigned to a depot (warehouse) with enough remaining inventory
+ - per depot, orders are batched onto vehicles with Clarke-Wright savings,
+   respecting vehicle capacity and time_window_start / time_window_end
+ - routes are then improved by 2-opt and relocate moves until no move helps
+   or the wall-clock budget runs out
+
+Travel time between two points is distance / speed; a vehicle leaves its depot
+at start_time, waits if it arrives before time_window_start, and must arrive
+no later than time_window_end. Distances (km; speed in km per time unit) come
+from one vectorized matrix over all depots + orders built by distance.py.
+"""
+
+import time
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+from distance import DistanceService, distance_service
+from route_optimizer import Order
+
+class VehicleRoute:
+    """
+    One vehicle: leaves `depot` (a warehouse position), visits `stops`
+    (order positions) in sequence and returns to the depot.
+    """
+    def __init__(self, depot: int, stops: List[int]):
+        self.depot = depot
+        self.stops = stops
+
+class VRPSolution:
+    def __init__(self,
+                 routes: List[VehicleRoute],
+                 unassigned: List[int],
+                 total_distance: float,
+                 solve_seconds: float,
+                 improvements: int):
+        self.routes = routes
+        self.unassigned = unassigned
+        self.total_distance = total_distance
+        self.solve_seconds = solve_seconds
+        self.improvements = improvements
+
+def pairwise_distance_matrix(lats: np.ndarray, lons: np.ndarray,
+                             distances: Optional[DistanceService] = None) -> np.ndarray:
+    """
+    (n, n) km matrix between all points in one vectorized call
+    (default: distance.distance_service's backend).
+    """
+    return (distances or distance_service).square_matrix(lats, lons)
+
+class VRPSolver:
+    """
+    Node numbering in the distance matrix: depots 0..D-1, then orders D..D+N-1.
+    """
+    def __init__(self,
+                 orders: List[Order],
+                 warehouse_lats: np.ndarray,
+                 warehouse_lons: np.ndarray,
+                 warehouse_inventories: np.ndarray,
+                 vehicle_capacity: float,
+                 speed: float = 40.0,
+                 service_time: float = 0.0,
+                 start_time: float = 0.0,
+                 time_budget_s: float = 0.2,
+                 distances: Optional[DistanceService] = None):
+        self.orders = orders
+        self.n_depots = len(warehouse_lats)
+        self.n_orders = len(orders)
+        self.inventories = np.asarray(warehouse_inventories, dtype=float)
+        self.capacity = vehicle_capacity
+        self.speed = speed
+        self.service_time = service_time
+        self.start_time = start_time
+        self.time_budget_s = time_budget_s
+
+        self.quantity = np.array([o.quantity for o in orders], dtype=float)
+        self.tw_start = np.array([o.time_window_start for o in orders], dtype=float)
+        self.tw_end = np.array([o.time_window_end for o in orders], dtype=float)
+        lats = np.concatenate([np.asarray(warehouse_lats, dtype=float),
+                               [o.latitude for o in orders]])
+        lons = np.concatenate([np.asarray(warehouse_lons, dtype=float),
+                               [o.longitude for o in orders]])
+        self.dist = pairwise_distance_matrix(lats, lons, distances)
+        self._deadline = 0.0
+        self.improvements = 0
+
+    # --- route evaluation -------------------------------------------------
+
+    def _node(self, stop: int) -> int:
+        return self.n_depots + stop
+
+    def route_distance(self, depot: int, stops: List[int]) -> float:
+        if not stops:
+            return 0.0
+        nodes = [depot] + [self._node(s) for s in stops] + [depot]
+        return float(self.dist[nodes[:-1], nodes[1:]].sum())
+
+    def schedule(self, depot: int, stops: List[int]) -> Optional[List[float]]:
+        """
+        Arrival (service start) time at every stop, or None if the route
+        breaks capacity or a time window.
+        """
+        if self.quantity[stops].sum() > self.capacity:
+            return None
+        t = self.start_time
+        prev = depot
+        arrivals = []
+        for s in stops:
+            node = self._node(s)
+            t = max(t + self.dist[prev, node] / self.speed, self.tw_start[s])
+            if t > self.tw_end[s]:
+                return None
+            arrivals.append(t)
+            t += self.service_time
+            prev = node
+        return arrivals
+
+    def _feasible(self, depot: int, stops: List[int]) -> bool:
+        return self.schedule(depot, stops) is not None
+
+    def _out_of_time(self) -> bool:
+        return time.perf_counter() >= self._deadline
+
+    # --- construction -----------------------------------------------------
+
+    def _assign_depots(self) -> Tuple[Dict[int, List[int]], List[int]]:
+        """
+        Nearest depot with enough remaining inventory that can serve the order
+        on its own; largest orders first so they get first pick of stock.
+        """
+        remaining = self.inventories.copy()
+        by_depot: Dict[int, List[int]] = {d: [] for d in range(self.n_depots)}
+        unassigned = []
+        order_rows = self.dist[:self.n_depots, self.n_depots:]
+        for s in np.argsort(-self.quantity, kind="stable").tolist():
+            for d in np.argsort(order_rows[:, s], kind="stable").tolist():
+                if remaining[d] >= self.quantity[s] and self._feasible(d, [s]):
+                    remaining[d] -= self.quantity[s]
+                    by_depot[d].append(s)
+                    break
+            else:
+                unassigned.append(s)
+        return by_depot, sorted(unassigned)
+
+    def _savings(self, depot: int, stops: List[int]) -> List[VehicleRoute]:
+        """
+        Clarke-Wright: start with one vehicle per order and merge routes
+        end-to-start in decreasing order of savings d(0,i) + d(0,j) - d(i,j).
+        """
+        routes = {s: [s] for s in stops}   # route keyed by its first stop
+        route_of = {s: s for s in stops}   # stop -> key of its route
+        if len(stops) > 1:
+            nodes = np.array([self._node(s) for s in stops])
+            d0 = self.dist[depot, nodes]
+            saving = d0[:, None] + d0[None, :] - self.dist[np.ix_(nodes, nodes)]
+            np.fill_diagonal(saving, -np.inf)
+            flat = np.argsort(-saving, axis=None, kind="stable")
+            for idx in flat.tolist():
+                a, b = divmod(idx, len(stops))
+                if saving[a, b] <= 0 or self._out_of_time():
+                    break
+                i, j = stops[a], stops[b]
+                ri, rj = route_of[i], route_of[j]
+                if ri == rj or routes[ri][-1] != i or routes[rj][0] != j:
+                    continue
+                merged = routes[ri] + routes[rj]
+                if not self._feasible(depot, merged):
+                    continue
+                routes[ri] = merged
+                del routes[rj]
+                for s in merged:
+                    route_of[s] = ri
+        return [VehicleRoute(depot, r) for r in routes.values()]
+
+    # --- local search -----------------------------------------------------
+
+    def _two_opt(self, route: VehicleRoute) -> bool:
+        stops = route.stops
+        best = self.route_distance(route.depot, stops)
+        for i in range(len(stops) - 1):
+            for j in range(i + 1, len(stops)):
+                cand = stops[:i] + stops[i:j + 1][::-1] + stops[j + 1:]
+                d = self.route_distance(route.depot, cand)
+                if d < best - 1e-12 and self._feasible(route.depot, cand):
+                    route.stops = cand
+                    return True
+            if self._out_of_time():
+                break
+        return False
+
+    def _relocate(self, routes: List[VehicleRoute]) -> bool:
+        for src in routes:
+            for pos, s in enumerate(src.stops):
+                src_without = src.stops[:pos] + src.stops[pos + 1:]
+                gain_src = (self.route_distance(src.depot, src.stops)
+                            - self.route_distance(src.depot, src_without))
+                for dst in routes:
+                    if dst.depot != src.depot:
+                        continue
+                    base = src_without if dst is src else dst.stops
+                    base_d = self.route_distance(dst.depot, base)
+                    for ins in range(len(base) + 1):
+                        cand = base[:ins] + [s] + base[ins:]
+                        if dst is src and cand == src.stops:
+                            continue
+                        delta = self.route_distance(dst.depot, cand) - base_d
+                        if delta < gain_src - 1e-12 and self._feasible(dst.depot, cand):
+                            if dst is src:
+                                src.stops = cand
+                            else:
+                                src.stops = src_without
+                                dst.stops = cand
+                            return True
+                if self._out_of_time():
+                    return False
+        return False
+
+    def _improve(self, routes: List[VehicleRoute]) -> List[VehicleRoute]:
+        improved = True
+        while improved and not self._out_of_time():
+            improved = False
+            for r in routes:
+                while self._two_opt(r):
+                    self.improvements += 1
+                    improved = True
+            if self._relocate(routes):
+                self.improvements += 1
+                improved = True
+                routes = [r for r in routes if r.stops]
+        return routes
+
+    def solve(self) -> VRPSolution:
+        t0 = time.perf_counter()
+        self._deadline = t0 + self.time_budget_s
+        self.improvements = 0
+
+        by_depot, unassigned = self._assign_depots()
+        routes: List[VehicleRoute] = []
+        for depot, stops in by_depot.items():
+            routes.extend(self._savings(depot, stops))
+        routes = self._improve(routes)
+
+        total = sum(self.route_distance(r.depot, r.stops) for r in routes)
+        return VRPSolution(routes, unassigned, total,
+                           time.perf_counter() - t0, self.improvements)
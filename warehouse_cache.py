@@ -0,0 +1,297 @@
+"""
+warehouse_cache.py
+
+Process-level snapshot of the warehouses table held as NumPy arrays:
+   [id, name, latitude, longitude, inventory]
+so /optimize and /warehouses don't open a session and build ORM objects per request.
+
+The snapshot is reloaded when it is older than the TTL (WAREHOUSE_CACHE_TTL
+seconds, default 30) or after invalidate() is called by code that writes
+warehouse rows. Writers that know the new values publish them without a
+reload: apply_inventory() for reservations, apply_rows() for bulk upserts.
+Each snapshot has an ETag (process tag + version) for conditional GET /warehouses.
+Every invalidation or published write bumps a generation counter; a reload
+whose rows were read under an older generation is returned to its caller but
+not installed, so it can't overwrite the newer state.
+"""
+
+import logging
+import os
+import threading
+import time
+import uuid
+import numpy as np
+from typing import Dict, List, Optional
+
+from database import SessionLocal
+from models import Warehouse
+from spatial_index import GridIndex
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = float(os.environ.get("WAREHOUSE_CACHE_TTL", "30"))
+# versions restart at 1 in every process, so ETags carry a per-process tag
+_PROCESS_TAG = uuid.uuid4().hex[:12]
+
+class WarehouseSnapshot:
+    """
+    Immutable columnar view of all warehouses, sorted by id.
+    version increases by one on every reload.
+    """
+    def __init__(self,
+                 ids: np.ndarray,
+                 names: List[str],
+                 latitudes: np.ndarray,
+                 longitudes: np.ndarray,
+                 inventories: np.ndarray,
+                 version: int,
+                 loaded_at: float):
+        self.ids = ids
+        self.names = names
+        self.latitudes = latitudes
+        self.longitudes = longitudes
+        self.inventories = inventories
+        self.version = version
+        self.loaded_at = loaded_at
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def etag(self) -> str:
+        return f'W/"{_PROCESS_TAG}-{self.version}"'
+
+    def to_dicts(self) -> List[Dict]:
+        """
+        Same layout as the /warehouses response.
+        """
+        return [
+            {"id": wid, "name": name, "latitude": lat, "longitude": lon, "inventory": inv}
+            for wid, name, lat, lon, inv in zip(
+                self.ids.tolist(),
+                self.names,
+                self.latitudes.tolist(),
+                self.longitudes.tolist(),
+                self.inventories.tolist()
+            )
+        ]
+
+    def subset(self, positions: np.ndarray) -> "WarehouseSnapshot":
+        """
+        Snapshot restricted to the given row positions (same version).
+        """
+        return WarehouseSnapshot(
+            ids=self.ids[positions],
+            names=[self.names[p] for p in np.asarray(positions).tolist()],
+            latitudes=self.latitudes[positions],
+            longitudes=self.longitudes[positions],
+            inventories=self.inventories[positions],
+            version=self.version,
+            loaded_at=self.loaded_at
+        )
+
+def load_rows(session_factory=SessionLocal) -> list:
+    """
+    Reads the five warehouse columns as plain rows (no ORM objects).
+    """
+    session = session_factory()
+    try:
+        return (session.query(Warehouse.id,
+                              Warehouse.name,
+                              Warehouse.latitude,
+                              Warehouse.longitude,
+                              Warehouse.inventory)
+                .order_by(Warehouse.id)
+                .all())
+    finally:
+        session.close()
+
+def snapshot_from_rows(rows, version: int = 0) -> WarehouseSnapshot:
+    """
+    rows: (id, name, latitude, longitude, inventory) tuples sorted by id.
+    """
+    return WarehouseSnapshot(
+        ids=np.array([r[0] for r in rows], dtype=np.int64),
+        names=[r[1] for r in rows],
+        latitudes=np.array([r[2] for r in rows], dtype=float),
+        longitudes=np.array([r[3] for r in rows], dtype=float),
+        inventories=np.array([r[4] or 0.0 for r in rows], dtype=float),
+        version=version,
+        loaded_at=time.time()
+    )
+
+def load_snapshot(session_factory=SessionLocal, version: int = 0) -> WarehouseSnapshot:
+    return snapshot_from_rows(load_rows(session_factory), version=version)
+
+class WarehouseCache:
+    """
+    Holds the current WarehouseSnapshot and reloads it on TTL expiry or invalidation.
+    index is a GridIndex kept in sync with every reload.
+      hits      -> get() served from memory
+      misses    -> get() found no valid snapshot
+      refreshes -> snapshots loaded from the DB
+    """
+    def __init__(self, session_factory=SessionLocal, ttl_seconds: Optional[float] = None):
+        self.session_factory = session_factory
+        self.ttl_seconds = DEFAULT_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self._snapshot: Optional[WarehouseSnapshot] = None
+        self._version = 0
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.index = GridIndex()
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.invalidations = 0
+        self.inventory_updates = 0
+        self.row_updates = 0
+
+    def _is_fresh(self, snap: Optional[WarehouseSnapshot]) -> bool:
+        return snap is not None and (time.time() - snap.loaded_at) < self.ttl_seconds
+
+    def get(self) -> WarehouseSnapshot:
+        snap = self._snapshot
+        if self._is_fresh(snap):
+            self.hits += 1
+            return snap
+        self.misses += 1
+        with self._lock:
+            # another thread may have reloaded while we waited
+            snap = self._snapshot
+            if self._is_fresh(snap):
+                return snap
+            return self._refresh_locked()
+
+    def refresh(self) -> WarehouseSnapshot:
+        with self._lock:
+            return self._refresh_locked()
+
+    def _refresh_locked(self) -> WarehouseSnapshot:
+        return self._install_locked(load_rows(self.session_factory), self._generation)
+
+    def _install_locked(self, rows, generation: int) -> WarehouseSnapshot:
+        """
+        Publishes freshly loaded rows as the next snapshot version; caller holds _lock.
+        generation is self._generation from before the rows were read; if a
+        write or invalidate() came in since, the snapshot is only returned.
+        """
+        self._version += 1
+        snap = snapshot_from_rows(rows, version=self._version)
+        if generation != self._generation:
+            logger.debug("Discarded warehouse snapshot v%d read before generation %d.",
+                         snap.version, self._generation)
+            return snap
+        changed = self.index.sync(snap)
+        self._snapshot = snap
+        self.refreshes += 1
+        logger.debug("Loaded warehouse snapshot v%d (%d rows, %d index updates).",
+                     snap.version, len(snap), changed)
+        return snap
+
+    def apply_inventory(self, inventories: Dict[int, float]) -> None:
+        """
+        Publishes known new inventory values (e.g. returned by a reservation)
+        as a new snapshot version without a DB reload. Unknown ids invalidate
+        the snapshot instead.
+        """
+        with self._lock:
+            snap = self._snapshot
+            if snap is None or not inventories:
+                return
+            ids = np.fromiter(inventories.keys(), dtype=np.int64, count=len(inventories))
+            values = np.fromiter(inventories.values(), dtype=float, count=len(inventories))
+            pos = np.searchsorted(snap.ids, ids)
+            if (pos >= len(snap)).any() or (snap.ids[np.minimum(pos, len(snap) - 1)] != ids).any():
+                self._snapshot = None
+                self._generation += 1
+                self.invalidations += 1
+                return
+            new_inventories = snap.inventories.copy()
+            new_inventories[pos] = values
+            self._version += 1
+            self._generation += 1
+            self._snapshot = WarehouseSnapshot(snap.ids, snap.names, snap.latitudes,
+                                               snap.longitudes, new_inventories,
+                                               version=self._version,
+                                               loaded_at=snap.loaded_at)
+            self.index.upsert_many(
+                ((int(snap.ids[p]), float(snap.latitudes[p]), float(snap.longitudes[p]), inv)
+                 for p, inv in zip(pos.tolist(), values.tolist())),
+                version=self._version)
+            self.inventory_updates += 1
+
+    def apply_rows(self, rows) -> None:
+        """
+        Publishes written warehouse rows (id, name, latitude, longitude,
+        inventory), new or existing, as a new snapshot version without a DB
+        reload; only those rows' index entries change.
+        """
+        with self._lock:
+            snap = self._snapshot
+            if snap is None or not rows:
+                return
+            ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+            lats = np.fromiter((r[2] for r in rows), dtype=float, count=len(rows))
+            lons = np.fromiter((r[3] for r in rows), dtype=float, count=len(rows))
+            invs = np.fromiter((r[4] or 0.0 for r in rows), dtype=float, count=len(rows))
+            pos = np.searchsorted(snap.ids, ids)
+            known = pos < len(snap)
+            known[known] = snap.ids[pos[known]] == ids[known]
+
+            names = list(snap.names)
+            latitudes = snap.latitudes.copy()
+            longitudes = snap.longitudes.copy()
+            inventories = snap.inventories.copy()
+            latitudes[pos[known]] = lats[known]
+            longitudes[pos[known]] = lons[known]
+            inventories[pos[known]] = invs[known]
+            for i in np.flatnonzero(known).tolist():
+                names[pos[i]] = rows[i][1]
+            new_ids = snap.ids
+            added = ~known
+            if added.any():
+                new_ids = np.concatenate([snap.ids, ids[added]])
+                order = np.argsort(new_ids, kind="stable")
+                names += [rows[i][1] for i in np.flatnonzero(added).tolist()]
+                names = [names[i] for i in order.tolist()]
+                new_ids = new_ids[order]
+                latitudes = np.concatenate([latitudes, lats[added]])[order]
+                longitudes = np.concatenate([longitudes, lons[added]])[order]
+                inventories = np.concatenate([inventories, invs[added]])[order]
+
+            self._version += 1
+            self._generation += 1
+            self._snapshot = WarehouseSnapshot(new_ids, names, latitudes, longitudes,
+                                               inventories, version=self._version,
+                                               loaded_at=snap.loaded_at)
+            self.index.upsert_many(zip(ids.tolist(), lats.tolist(), lons.tolist(), invs.tolist()),
+                                   version=self._version)
+            self.row_updates += 1
+
+    def invalidate(self) -> None:
+        """
+        Drops the snapshot; call after writing warehouse rows.
+        """
+        with self._lock:
+            self._snapshot = None
+            self._generation += 1
+            self.invalidations += 1
+
+    def stats(self) -> Dict:
+        snap = self._snapshot
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "invalidations": self.invalidations,
+            "inventory_updates": self.inventory_updates,
+            "row_updates": self.row_updates,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "ttl_seconds": self.ttl_seconds,
+            "version": snap.version if snap is not None else None,
+            "size": len(snap) if snap is not None else 0,
+            "age_seconds": (time.time() - snap.loaded_at) if snap is not None else None
+        }
+
+warehouse_cache = WarehouseCache()
@@ -0,0 +1,189 @@
+"""
+warehouse_upsert.py
+
+Bulk warehouse / inventory upserts for stock feeds (POST /warehouses/bulk).
+Rows are keyed on the unique warehouse name:
+   name, latitude, longitude, inventory, inventory_delta
+latitude/longitude are required for new warehouses. inventory sets the stock
+and inventory_delta adjusts it (never below 0); a row carries at most one of them.
+Later rows for the same name override earlier ones and their deltas add up.
+
+upsert_warehouses() applies a whole feed in one transaction:
+  1. read the current rows for the feed's names (IN query, or one table scan
+     for feeds over _IN_CHUNK names)
+  2. diff the feed against them; rows that would change nothing are skipped
+  3. one executemany INSERT for new warehouses and up to three executemany
+     UPDATEs by id (set inventory / add delta / move only). Deltas are applied
+     in SQL as inventory + :delta, so concurrent reservations aren't lost
+  4. re-read the changed rows inside the transaction, commit, and publish
+     exactly those rows to the warehouse cache (WarehouseCache.apply_rows)
+"""
+
+import csv
+import io
+import logging
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import bindparam, case, insert, select, update
+
+from database import SessionLocal
+from models import Warehouse
+from schemas import WarehouseUpsert
+from warehouse_cache import WarehouseCache
+
+logger = logging.getLogger(__name__)
+
+MAX_UPSERT_ROWS = 200_000
+# feeds with more names than this read the whole table instead of IN (...)
+_IN_CHUNK = 1000
+
+class UpsertError(ValueError):
+    """
+    The feed has invalid rows; errors is a list of {"index", ...} dicts.
+    Nothing was written.
+    """
+    def __init__(self, errors: List[Dict]):
+        super().__init__(f"{len(errors)} invalid row(s)")
+        self.errors = errors
+
+def rows_from_csv(text: str) -> List[Dict]:
+    """
+    CSV with a header row of field names; empty cells are omitted.
+    """
+    reader = csv.DictReader(io.StringIO(text))
+    return [{k.strip(): v for k, v in row.items() if k and v not in (None, "")}
+            for row in reader]
+
+def _merge(raw_rows: Iterable) -> Tuple[Dict[str, Dict], List[Dict]]:
+    """
+    name -> merged change, plus per-row validation errors.
+    """
+    merged: Dict[str, Dict] = {}
+    errors = []
+    for i, raw in enumerate(raw_rows):
+        if not isinstance(raw, dict):
+            errors.append({"index": i, "error": "Expected an object per row."})
+            continue
+        try:
+            row = WarehouseUpsert(**raw)
+        except ValidationError as e:
+            errors.append({"index": i, "validation_error": e.errors(include_url=False)})
+            continue
+        change = merged.setdefault(row.name, {"index": i, "latitude": None, "longitude": None,
+                                              "inventory": None, "delta": 0.0})
+        if row.latitude is not None:
+            change["latitude"] = row.latitude
+            change["longitude"] = row.longitude
+        if row.inventory is not None:
+            change["inventory"] = row.inventory
+            change["delta"] = 0.0
+        elif row.inventory_delta is not None:
+            if change["inventory"] is not None:
+                change["inventory"] = max(change["inventory"] + row.inventory_delta, 0.0)
+            else:
+                change["delta"] += row.inventory_delta
+    return merged, errors
+
+def _read_by_name(conn, names: List[str]) -> List[Tuple]:
+    """
+    (id, name, latitude, longitude, inventory) of the named warehouses; big
+    feeds read the whole table once instead of many IN (...) queries.
+    """
+    table = Warehouse.__table__
+    query = select(table.c.id, table.c.name, table.c.latitude, table.c.longitude,
+                   table.c.inventory)
+    if len(names) > _IN_CHUNK:
+        wanted = set(names)
+        return [tuple(r) for r in conn.execute(query) if r[1] in wanted]
+    return [tuple(r) for r in conn.execute(query.where(table.c.name.in_(names)))]
+
+def _statements():
+    table = Warehouse.__table__
+    by_id = update(table).where(table.c.id == bindparam("_id"))
+    position = {"latitude": bindparam("_lat"), "longitude": bindparam("_lon")}
+    new_inventory = table.c.inventory + bindparam("_delta")
+    return {
+        "set": by_id.values(inventory=bindparam("_inv"), **position),
+        "delta": by_id.values(inventory=case((new_inventory < 0, 0.0), else_=new_inventory),
+                              **position),
+        "move": by_id.values(**position),
+    }
+
+def upsert_warehouses(raw_rows: List,
+                      session_factory=SessionLocal,
+                      cache: Optional[WarehouseCache] = None) -> Dict:
+    """
+    Applies a feed of warehouse rows in one transaction and returns
+    {rows, inserted, updated, unchanged, seconds, rows_per_sec}.
+    Raises UpsertError (nothing written) if any row is invalid.
+    """
+    t0 = time.perf_counter()
+    merged, errors = _merge(raw_rows)
+
+    session = session_factory()
+    try:
+        conn = session.connection()
+        existing = {r[1]: r for r in _read_by_name(conn, list(merged))}
+        inserts, updates = [], {"set": [], "delta": [], "move": []}
+        updated_names = []
+        for name, change in merged.items():
+            current = existing.get(name)
+            if current is None:
+                if change["latitude"] is None:
+                    errors.append({"index": change["index"],
+                                   "error": f"New warehouse {name!r} needs latitude and longitude."})
+                    continue
+                inventory = change["inventory"] if change["inventory"] is not None else change["delta"]
+                inserts.append({"name": name, "latitude": change["latitude"],
+                                "longitude": change["longitude"], "inventory": max(inventory, 0.0)})
+                continue
+
+            wid, _, lat, lon, inv = current
+            params = {"_id": wid,
+                      "_lat": change["latitude"] if change["latitude"] is not None else lat,
+                      "_lon": change["longitude"] if change["longitude"] is not None else lon}
+            moved = (params["_lat"], params["_lon"]) != (lat, lon)
+            if change["inventory"] is not None and change["inventory"] != inv:
+                updates["set"].append(dict(params, _inv=change["inventory"]))
+            elif change["inventory"] is None and change["delta"] != 0.0:
+                updates["delta"].append(dict(params, _delta=change["delta"]))
+            elif moved:
+                updates["move"].append(params)
+            else:
+                continue
+            updated_names.append(name)
+
+        if errors:
+            raise UpsertError(sorted(errors, key=lambda e: e["index"]))
+
+        if inserts:
+            conn.execute(insert(Warehouse.__table__), inserts)
+        for kind, stmt in _statements().items():
+            if updates[kind]:
+                conn.execute(stmt, updates[kind])
+
+        changed_names = [r["name"] for r in inserts] + updated_names
+        changed = sorted(_read_by_name(conn, changed_names)) if changed_names else []
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+    if cache is not None and changed:
+        cache.apply_rows(changed)
+
+    elapsed = time.perf_counter() - t0
+    result = {
+        "rows": len(raw_rows),
+        "inserted": len(inserts),
+        "updated": len(updated_names),
+        "unchanged": len(merged) - len(inserts) - len(updated_names),
+        "seconds": round(elapsed, 4),
+        "rows_per_sec": round(len(raw_rows) / elapsed, 1) if elapsed > 0 else 0.0
+    }
+    logger.info("Warehouse upsert: %s", result)
+    return result